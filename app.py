@@ -6,12 +6,20 @@
 ╚══════════════════════════════════════════════════════════════════════════════╝
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, Literal, Optional, Set
+import asyncio
+import csv
+import io
+import json
+import os
 import database_manager as db
+from response_cache import ResponseCache, etag_matches
 
 # Initialize FastAPI
 app = FastAPI(
@@ -20,7 +28,24 @@ app = FastAPI(
     version="3.0.0"
 )
 
-# CORS (allow frontend to access API)
+# Optional rate limiting, e.g. API_RATE_LIMIT=120/60 (120 requests per 60 s
+# per X-API-Key or client IP). Applied as ASGI middleware: no extra request,
+# no body parsing. Added before CORS so CORS wraps it: 429s carry the CORS
+# headers and preflight OPTIONS requests are answered without spending tokens.
+API_RATE_LIMIT = os.getenv("API_RATE_LIMIT")
+if API_RATE_LIMIT:
+    from rate_limiter import AsyncTokenBucket, RateLimitMiddleware
+
+    capacity, seconds = API_RATE_LIMIT.split("/")
+    app.add_middleware(
+        RateLimitMiddleware,
+        limitador=AsyncTokenBucket(
+            int(capacity), float(seconds), motor="recarga", max_usuarios=100_000
+        ),
+        excluir={"/"},
+    )
+
+# CORS (allow frontend to access API); added last, so it is the outermost layer
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify exact origins
@@ -29,6 +54,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response cache for the read endpoints: entries live until the next scan
+# (database generation) or API_CACHE_TTL seconds (0 disables the cache);
+# at most API_CACHE_SIZE entries, least recently used evicted first.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("API_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("API_CACHE_TTL", "60")),
+)
+
+# Database calls run off the event loop: API_DB_THREADS reader threads
+# (0 = inline, blocking the loop) and at most API_MAX_PENDING_WRITES queued
+# writes before POST /api/scan answers 503.
+database = db.AsyncDatabase(
+    read_workers=int(os.getenv("API_DB_THREADS", "8")),
+    max_pending_writes=int(os.getenv("API_MAX_PENDING_WRITES", "4")),
+)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
@@ -37,6 +78,13 @@ async def startup_event():
     print("✅ Database initialized")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the database threads and close pooled connections on server stop."""
+    database.close()
+    db.close_manager()
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 🏠 FRONTEND
 # ══════════════════════════════════════════════════════════════════════════════
@@ -58,31 +106,73 @@ async def dashboard():
     return HTMLResponse(content=html_content)
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# 🧊 RESPONSE CACHE
+# ══════════════════════════════════════════════════════════════════════════════
+
+async def cached_json(request: Request, key: Hashable, build: Callable[[], Awaitable[Dict]]) -> Response:
+    """
+    JSON response for ``key``, built by ``await build()`` only on a cache miss.
+
+    Responses carry an ETag and ``Cache-Control: no-cache``, so browsers
+    revalidate every poll with ``If-None-Match``; a matching ETag gets an
+    empty 304 (from the cache, without touching the database).
+    """
+    generation = db.data_generation()  # Read first: a write during build() invalidates the entry
+    entry = response_cache.get(key, generation)
+    if entry is None:
+        try:
+            payload = await build()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        body = json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        entry = response_cache.put(key, generation, body)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    """Response cache counters (hits, misses, 304s, evictions) and size."""
+    return {
+        "success": True,
+        "generation": db.data_generation(),
+        "cache": response_cache.stats(),
+        "database": database.stats()
+    }
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 📊 API ENDPOINTS
 # ══════════════════════════════════════════════════════════════════════════════
 
 @app.get("/api/latest")
-async def get_latest_articles(limit: int = 20):
+async def get_latest_articles(request: Request, limit: int = 20):
     """
     Get latest articles.
     
     Query params:
     - limit: Number of articles to return (default: 20)
     """
-    try:
-        articles = db.get_latest(limit)
+    async def build():
+        articles = await database.read(db.get_latest, limit)
         return {
             "success": True,
             "count": len(articles),
             "articles": articles
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    return await cached_json(request, ("latest", limit), build)
 
 
 @app.get("/api/trends")
-async def get_trending_keywords(days: int = 7, limit: int = 10):
+async def get_trending_keywords(request: Request, days: int = 7, limit: int = 10):
     """
     Get trending keywords from last N days.
     
@@ -90,59 +180,90 @@ async def get_trending_keywords(days: int = 7, limit: int = 10):
     - days: Number of days to look back (default: 7)
     - limit: Number of keywords to return (default: 10)
     """
-    try:
-        trends = db.get_trends(days, limit)
+    async def build():
+        trends = await database.read(db.get_trends, days, limit)
         return {
             "success": True,
             "period_days": days,
             "count": len(trends),
             "trends": trends
         }
+
+    return await cached_json(request, ("trends", days, limit), build)
+
+
+@app.get("/api/search")
+async def search_articles(q: str, days: Optional[int] = None, limit: int = 20):
+    """
+    Full-text search over story titles (FTS5, BM25 ranking).
+    
+    Query params:
+    - q: Search text; every word must match
+    - days: Only stories seen in the last N days (default: all history)
+    - limit: Number of results to return (default: 20)
+    
+    Each result includes a ``snippet`` with matches wrapped in ``<mark>``
+    (the rest of the title is HTML-escaped).
+    """
+    try:
+        results = await database.read(db.search_articles, q, days, limit)
+        return {
+            "success": True,
+            "query": q,
+            "count": len(results),
+            "results": results
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/history")
-async def get_scan_history(days: int = 30):
+async def get_scan_history(request: Request, days: int = 30):
     """
     Get scan history from last N days.
     
     Query params:
     - days: Number of days to look back (default: 30)
     """
-    try:
-        history = db.get_history(days)
+    async def build():
+        history = await database.read(db.get_history, days)
         return {
             "success": True,
             "period_days": days,
             "count": len(history),
             "scans": history
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    return await cached_json(request, ("history", days), build)
 
 
 @app.get("/api/stats")
-async def get_statistics():
+async def get_statistics(request: Request):
     """Get general database statistics."""
-    try:
-        stats = db.get_stats()
+    async def build():
+        stats = await database.read(db.get_stats)
         return {
             "success": True,
             "stats": stats
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    return await cached_json(request, ("stats",), build)
 
 
 @app.post("/api/scan")
 async def save_new_scan():
     """
     Trigger saving a new scan from intelligence_report.json.
+
+    Committing the scan bumps the database generation, which invalidates
+    every cached response and pushes an update to /api/events subscribers.
+    Answers 503 (Retry-After) when too many writes
+    are already pending.
     """
     try:
-        scan_id = db.save_scan()
+        scan_id = await database.write(db.save_scan)
         if scan_id:
+            scan_events.notify()
             return {
                 "success": True,
                 "scan_id": scan_id,
@@ -150,10 +271,273 @@ async def save_new_scan():
             }
         else:
             raise HTTPException(status_code=404, detail="intelligence_report.json not found")
+    except db.WriteQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# 📡 LIVE UPDATES (SSE)
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ScanEvents:
+    """
+    Server-sent events hub: one database refresh per new scan, fanned out
+    to every open dashboard.
+
+    A watcher task runs while at least one client is subscribed. It wakes
+    on ``notify()`` (POST /api/scan) or every ``poll_interval`` seconds,
+    and only when ``db.data_generation()`` has moved does it call ``load``
+    (a single stats/trends/latest query set, whatever the number of
+    clients). Each client then receives only the sections that differ
+    from what it was last sent.
+
+    Event ids are generations: a reconnecting EventSource sends
+    ``Last-Event-ID`` and gets no initial event if it is already current.
+    Writes from other processes are picked up only if they go through this
+    process's database generation (same limitation as the response cache).
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[Dict]],
+        poll_interval: float = 2.0,
+        keepalive: float = 15.0
+    ):
+        self.load = load
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.generation: Optional[int] = None
+        self.sections: Dict = {}
+        self.refreshes = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def notify(self):
+        """Check for new data now instead of at the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_watcher(self):
+        loop = asyncio.get_running_loop()
+        if self._watcher is None or self._watcher.done() or self._watcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._refresh_lock = asyncio.Lock()
+            self._watcher = loop.create_task(self._watch())
+
+    async def _refresh(self):
+        async with self._refresh_lock:
+            generation = db.data_generation()  # Read first: a write during load() triggers another refresh
+            if generation == self.generation:
+                return
+            self.sections = await self.load()
+            self.generation = generation
+            self.refreshes += 1
+        for queue in self._subscribers:
+            if queue.empty():
+                queue.put_nowait(generation)
+
+    async def _watch(self):
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._refresh()
+            except Exception as e:
+                print(f"⚠️ Live update refresh failed: {e}")
+
+    def _event(self, sent: Dict) -> Optional[str]:
+        """SSE frame with the sections that changed since ``sent`` (updated in place)."""
+        changed = {name: value for name, value in self.sections.items() if sent.get(name) != value}
+        if not changed:
+            return None
+        if "latest" in changed:
+            known = {article["url"] for article in sent.get("latest", [])}
+            changed["new_articles"] = [a["url"] for a in changed["latest"] if a["url"] not in known] if sent else []
+        sent.update((name, self.sections[name]) for name in self.sections)
+        data = json.dumps({"generation": self.generation, **changed}, ensure_ascii=False)
+        return f"id: {self.generation}\nevent: update\ndata: {data}\n\n"
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """One client's event stream (ends when the client disconnects)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)  # Only "something changed" matters
+        self._subscribers.add(queue)
+        self._ensure_watcher()
+        try:
+            await self._refresh()
+            yield f"retry: {int(self.poll_interval * 1000)}\n\n"
+            # A reconnecting client that is already up to date gets no first event
+            sent: Dict = dict(self.sections) if last_event_id == str(self.generation) else {}
+            while True:
+                event = self._event(sent)
+                if event:
+                    yield event
+                try:
+                    await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # Keeps proxies from closing an idle stream
+        finally:
+            self._subscribers.discard(queue)
+
+
+# What the dashboard shows: the same queries as its former 30 s polls
+LIVE_TRENDS_DAYS = 7
+LIVE_LIMIT = 10
+
+
+async def _live_sections() -> Dict:
+    return {
+        "stats": await database.read(db.get_stats),
+        "trends": await database.read(db.get_trends, LIVE_TRENDS_DAYS, LIVE_LIMIT),
+        "latest": await database.read(db.get_latest, LIVE_LIMIT),
+    }
+
+
+scan_events = ScanEvents(_live_sections)
+
+
+@app.get("/api/events")
+async def live_updates(request: Request):
+    """
+    Server-sent events: ``update`` events with the dashboard's stats,
+    trends and latest articles, pushed only when a scan is saved.
+    
+    The first event carries every section; later ones only the sections
+    that changed, plus ``new_articles`` (URLs that entered the latest list).
+    """
+    return StreamingResponse(
+        scan_events.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 📤 PAGINATION & EXPORT
+# ══════════════════════════════════════════════════════════════════════════════
+
+MAX_PAGE_SIZE = 1000
+
+DATASETS = {
+    "articles": (db.get_articles_page, db.ARTICLE_FIELDS),
+    "keywords": (db.get_keywords_page, db.KEYWORD_FIELDS),
+}
+
+
+async def _page(dataset: str, cursor: Optional[int], limit: int) -> Dict:
+    get_page, _ = DATASETS[dataset]
+    try:
+        items, next_cursor = await database.read(
+            db.history_page, get_page, cursor, min(max(limit, 1), MAX_PAGE_SIZE)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "success": True,
+        "count": len(items),
+        dataset: items,
+        "next_cursor": next_cursor
+    }
+
+
+@app.get("/api/articles")
+async def get_articles_history(cursor: Optional[int] = None, limit: int = 100):
+    """
+    Full article history, newest first, keyset-paginated.
+    
+    Archived months are included: the cursor walks the hot database and
+    the archives as one id sequence.
+    
+    Query params:
+    - cursor: ``next_cursor`` from the previous page (omit for the first page)
+    - limit: Page size (default: 100, max: 1000)
+    
+    ``next_cursor`` is null on the last page.
+    """
+    return await _page("articles", cursor, limit)
+
+
+@app.get("/api/keywords")
+async def get_keywords_history(cursor: Optional[int] = None, limit: int = 100):
+    """
+    Per-scan keyword history, newest first, keyset-paginated (see /api/articles).
+    """
+    return await _page("keywords", cursor, limit)
+
+
+def _format_rows(rows, fields, fmt: str, header: bool) -> bytes:
+    """One page as NDJSON lines or CSV records."""
+    if fmt == "ndjson":
+        return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def _export_chunks(dataset: str, fmt: str, after: Optional[int]) -> AsyncIterator[bytes]:
+    """
+    Pull one page at a time on the DB threads and yield it formatted.
+    
+    Pages come from ``db.iter_pages``: archives and the hot database in one
+    ascending id order, so ``after`` resumes wherever the last row lives.
+    """
+    get_page, fields = DATASETS[dataset]
+    pages = db.iter_pages(get_page, after)
+    first = True
+    while True:
+        rows = await database.read(next, pages, None)
+        if rows is None:
+            break
+        yield _format_rows(rows, fields, fmt, header=first)
+        first = False
+    if first and fmt == "csv":
+        yield _format_rows([], fields, fmt, header=True)
+
+
+@app.get("/api/export/{dataset}")
+async def export_history(
+    dataset: Literal["articles", "keywords"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    after: Optional[int] = None
+):
+    """
+    Stream the whole article or keyword history, oldest first.
+    
+    Path params:
+    - dataset: ``articles`` or ``keywords``
+    
+    Query params:
+    - format: ``ndjson`` (default) or ``csv``
+    - after: Only rows with a larger id (resume an interrupted export with
+      the last id received)
+    
+    Archived months (see ``database_manager.archive_scans``) are included;
+    rows are sent in id order across archives and the hot database.
+    
+    Rows are read in keyset pages of ``EXPORT_BATCH_SIZE`` and sent as they
+    are read, so memory stays constant however many rows are exported.
+    """
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        _export_chunks(dataset, format, after),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'}
+    )
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 🎯 MAIN
 # ══════════════════════════════════════════════════════════════════════════════
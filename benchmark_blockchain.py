@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+📈 NEO-TOKYO DEV - Benchmarks de la Mini-Blockchain
+
+Uso:
+    python benchmark_blockchain.py minado [--hashes N] [--procesos 1,2,4]
+    python benchmark_blockchain.py almacen [--bloques 1000,10000,100000]
+    python benchmark_blockchain.py validacion [--bloques 10000,1000000] [--procesos 1,4]
+
+Todos los subcomandos aceptan ``--salida`` para guardar los resultados en
+JSON (``benchmark_resultados.py``, el mismo formato que
+``benchmark_rate_limiter.py``, comparable con su subcomando ``comparar``).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmark_resultados import guardar_resultados
+from mini_blockchain import Block, Blockchain, ParallelMiner, find_nonce
+
+
+def _bloque_de_prueba(difficulty: int = 1) -> Block:
+    """Bloque real (dificultad mínima para crearlo al instante)."""
+    return Block(index=1, data="Alice envía 10 BTC a Bob", previous_hash="0" * 64, difficulty=difficulty)
+
+
+# ══════════════════════════════════════════════════════════════
+# MINADO: HASHES POR SEGUNDO SEGÚN NÚMERO DE PROCESOS
+# ══════════════════════════════════════════════════════════════
+
+def medir_serie(bloque: Block, hashes: int) -> float:
+    """Hashes/s del bucle original (``Block._calculate_hash`` nonce a nonce)."""
+    inicio = time.perf_counter()
+    for nonce in range(hashes):
+        bloque.nonce = nonce
+        bloque._calculate_hash()
+    return hashes / (time.perf_counter() - inicio)
+
+
+def medir_midstate(bloque: Block, hashes: int) -> float:
+    """Hashes/s de ``find_nonce`` (midstate + digest crudo) en este proceso."""
+    prefijo = bloque._hash_prefix().encode()
+    inicio = time.perf_counter()
+    find_nonce(prefijo, 64, 0, hashes)
+    return hashes / (time.perf_counter() - inicio)
+
+
+def medir_paralelo(bloque: Block, hashes: int, procesos: int) -> float:
+    """
+    Hashes/s de ``ParallelMiner`` recorriendo ``hashes`` nonces.
+
+    Se pide una dificultad imposible (64 ceros), así que se prueba cada
+    nonce del rango exactamente una vez. El arranque del pool no cuenta.
+    """
+    prefijo = bloque._hash_prefix().encode()
+    with ParallelMiner(workers=procesos) as minero:
+        minero.search(prefijo, 64, 0, procesos * minero.chunk_size)  # Calentar el pool
+        inicio = time.perf_counter()
+        minero.search(prefijo, 64, 0, hashes)
+        return hashes / (time.perf_counter() - inicio)
+
+
+def benchmark_minado(hashes: int = 2_000_000, procesos: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Hashes/s del bucle original, de ``find_nonce`` y de ``ParallelMiner``
+    con 1..N procesos (por defecto 1, 2, 4 y un proceso por núcleo).
+    """
+    nucleos = os.cpu_count() or 1
+    procesos = procesos or sorted({1, 2, 4, nucleos})
+    bloque = _bloque_de_prueba()
+    resultados = []
+    print(f"⛏️  Minado ({hashes:,} hashes, {nucleos} núcleos)")
+    print("=" * 60)
+
+    serie = medir_serie(bloque, hashes)
+    resultados.append({"escenario": "serie", "procesos": 1, "hashes_por_segundo": serie, "aceleracion": 1.0})
+    print(f"   {'serie (_calculate_hash)':<24} {serie:>14,.0f} H/s")
+
+    midstate = medir_midstate(bloque, hashes)
+    resultados.append({"escenario": "serie/midstate", "procesos": 1,
+                       "hashes_por_segundo": midstate, "aceleracion": midstate / serie})
+    print(f"   {'serie (find_nonce)':<24} {midstate:>14,.0f} H/s  x{midstate / serie:.2f}")
+
+    for num_procesos in procesos:
+        hps = medir_paralelo(bloque, hashes, num_procesos)
+        resultados.append({"escenario": f"paralelo/{num_procesos}", "procesos": num_procesos,
+                           "hashes_por_segundo": hps, "aceleracion": hps / serie})
+        print(f"   {'ParallelMiner':<16} procesos={num_procesos:<3} {hps:>14,.0f} H/s  x{hps / serie:.2f}")
+    return resultados
+
+
+# ══════════════════════════════════════════════════════════════
+# ALMACÉN EN DISCO: ARRANQUE Y LECTURAS SEGÚN LONGITUD DE CADENA
+# ══════════════════════════════════════════════════════════════
+
+def crear_cadena(ruta: str, bloques: int) -> List[str]:
+    """Cadena en disco de ``bloques`` bloques (dificultad 0); devuelve sus hashes."""
+    with contextlib.redirect_stdout(io.StringIO()):  # Una línea de "Minando" por bloque
+        cadena = Blockchain.open(ruta, difficulty=0)
+        hashes = [cadena.get_latest_block().hash]
+        for i in range(1, bloques):
+            hashes.append(cadena.add_block(f"Transacción {i}").hash)
+    cadena.close()
+    return hashes
+
+
+def benchmark_almacen(longitudes: List[int] = (1_000, 10_000, 100_000), lecturas: int = 10_000) -> List[Dict]:
+    """Tiempo de ``Blockchain.open`` y latencia de lectura por altura y por hash."""
+    rng = random.Random(1234)
+    resultados = []
+    print(f"💾 BlockStore ({lecturas:,} lecturas aleatorias por tamaño)")
+    print("=" * 60)
+    for bloques in longitudes:
+        with tempfile.TemporaryDirectory() as directorio:
+            inicio = time.perf_counter()
+            hashes = crear_cadena(directorio, bloques)
+            append_por_segundo = bloques / (time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            cadena = Blockchain.open(directorio)
+            apertura_ms = (time.perf_counter() - inicio) * 1000
+
+            alturas = [rng.randrange(bloques) for _ in range(lecturas)]
+            inicio = time.perf_counter()
+            for altura in alturas:
+                cadena.store.get(altura)
+            por_altura_us = (time.perf_counter() - inicio) / lecturas * 1e6
+
+            inicio = time.perf_counter()
+            for altura in alturas:
+                cadena.store.get_by_hash(hashes[altura])
+            por_hash_us = (time.perf_counter() - inicio) / lecturas * 1e6
+            cadena.close()
+
+        resultados.append({
+            "escenario": f"bloques/{bloques}",
+            "bloques": bloques,
+            "apertura_ms": apertura_ms,
+            "get_altura_us": por_altura_us,
+            "get_hash_us": por_hash_us,
+            "add_block_por_segundo": append_por_segundo,
+        })
+        print(
+            f"   {bloques:>9,} bloques  open={apertura_ms:>6.2f} ms  "
+            f"get={por_altura_us:>5.1f} µs  get_by_hash={por_hash_us:>5.1f} µs  "
+            f"add_block={append_por_segundo:>8,.0f}/s"
+        )
+    return resultados
+
+
+# ══════════════════════════════════════════════════════════════
+# VALIDACIÓN: COMPLETA, INCREMENTAL Y AUDITORÍA PARALELA
+# ══════════════════════════════════════════════════════════════
+
+def _cronometrar(funcion) -> float:
+    """Segundos que tarda ``funcion()`` (sin su salida por pantalla); falla si no es válida."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        valida = funcion()
+        duracion = time.perf_counter() - inicio
+    assert valida, "la cadena del benchmark debería ser válida"
+    return duracion
+
+
+def benchmark_validacion(
+    longitudes: List[int] = (10_000, 1_000_000),
+    procesos: Optional[List[int]] = None,
+    nuevos: int = 100
+) -> List[Dict]:
+    """
+    Por longitud de cadena (en un BlockStore):
+
+    - ``is_valid()``: validación completa en serie
+    - ``is_valid(incremental=True)`` tras añadir ``nuevos`` bloques: solo desde el checkpoint
+    - ``audit`` con 1..N procesos
+    """
+    nucleos = os.cpu_count() or 1
+    procesos = procesos or sorted({1, nucleos})
+    resultados = []
+    print(f"🔍 Validación ({nucleos} núcleos, {nuevos} bloques nuevos para la incremental)")
+    print("=" * 60)
+
+    def registrar(bloques: int, modo: str, segundos: float) -> None:
+        resultados.append({"escenario": f"{modo}/{bloques}", "bloques": bloques,
+                           "segundos": segundos, "bloques_por_segundo": bloques / segundos})
+        print(f"   {bloques:>9,} bloques  {modo:<20} {segundos:>9.3f} s  {bloques / segundos:>12,.0f} bloques/s")
+
+    for bloques in longitudes:
+        with tempfile.TemporaryDirectory() as directorio:
+            crear_cadena(directorio, bloques)
+            cadena = Blockchain.open(directorio)
+
+            registrar(bloques, "completa (serie)", _cronometrar(cadena.is_valid))
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(nuevos):
+                    cadena.add_block(f"Nueva {i}")
+            incremental = _cronometrar(lambda: cadena.is_valid(incremental=True))
+            resultados.append({"escenario": f"incremental/{bloques}", "bloques": nuevos, "segundos": incremental})
+            print(f"   {bloques:>9,} bloques  {'incremental':<20} {incremental:>9.4f} s  ({nuevos} bloques nuevos)")
+
+            for num_procesos in procesos:
+                registrar(bloques, f"audit/{num_procesos} procesos",
+                          _cronometrar(lambda: cadena.audit(workers=num_procesos)))
+            cadena.close()
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks de la mini-blockchain")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    minado = sub.add_parser("minado", help="hashes/s: bucle original, midstate y ParallelMiner con 1..N procesos")
+    minado.add_argument("--hashes", type=int, default=2_000_000)
+    minado.add_argument("--procesos", help="lista separada por comas (por defecto 1,2,4,núcleos)")
+
+    almacen = sub.add_parser("almacen", help="BlockStore: apertura y lecturas según longitud de cadena")
+    almacen.add_argument("--bloques", default="1000,10000,100000", help="longitudes separadas por comas")
+    almacen.add_argument("--lecturas", type=int, default=10_000)
+
+    validacion = sub.add_parser("validacion", help="is_valid completa vs incremental vs audit paralela")
+    validacion.add_argument("--bloques", default="10000,1000000", help="longitudes separadas por comas")
+    validacion.add_argument("--procesos", help="lista separada por comas (por defecto 1,núcleos)")
+    validacion.add_argument("--nuevos", type=int, default=100, help="bloques añadidos antes de la incremental")
+
+    for subparser in (minado, almacen, validacion):
+        subparser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+
+    args = parser.parse_args()
+    if args.comando == "minado":
+        procesos = [int(n) for n in args.procesos.split(",")] if args.procesos else None
+        resultados = benchmark_minado(args.hashes, procesos)
+    elif args.comando == "almacen":
+        resultados = benchmark_almacen([int(n) for n in args.bloques.split(",")], args.lecturas)
+    else:
+        procesos = [int(n) for n in args.procesos.split(",")] if args.procesos else None
+        resultados = benchmark_validacion([int(n) for n in args.bloques.split(",")], procesos, args.nuevos)
+
+    if args.salida:
+        parametros = {k: v for k, v in vars(args).items() if k not in ("comando", "salida")}
+        guardar_resultados(args.salida, args.comando, parametros, resultados)
+
+
+if __name__ == "__main__":
+    main()
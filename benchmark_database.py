@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║  ⏱️ DATABASE BENCHMARKS - Intelligence Dashboard storage                     ║
+║  Synthetic intelligence.db + in-process API load                            ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Usage:
+    python benchmark_database.py api [--scans N] [--articles N] [--requests N]
+    python benchmark_database.py ingest [--articles N]
+    python benchmark_database.py search [--articles N] [--queries N]
+    python benchmark_database.py concurrency [--scans N] [--articles N] [--clients 1,4,16]
+    python benchmark_database.py export [--articles N]
+
+Runs against a temporary database; the real intelligence.db is never touched.
+Add ``--output results.json`` to keep the numbers for later comparison.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import database_manager as db
+
+
+WORDS = (
+    "python rust llama model agent vector database sqlite kernel compiler "
+    "startup funding security breach quantum chip cloud gpu open source "
+    "release framework benchmark latency privacy robot browser protocol"
+).split()
+
+# Long tail of rarer words (names, products...) with Zipf-like frequencies,
+# so full-text posting lists have realistic lengths
+TAIL_WORDS = [f"term{i}" for i in range(50_000)]
+TAIL_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(TAIL_WORDS) + 1)))
+
+
+def make_title(rng: random.Random) -> str:
+    """2-4 common words plus 2-6 long-tail words."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(2, 4))]
+    words += rng.choices(TAIL_WORDS, cum_weights=TAIL_WEIGHTS, k=rng.randint(2, 6))
+    rng.shuffle(words)
+    return " ".join(words).title()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🧪 SYNTHETIC DATA
+# ══════════════════════════════════════════════════════════════════════════════
+
+def make_report(rng: random.Random, articles: int, harvested_at: datetime) -> Dict:
+    """One intelligence_report.json-shaped document with random titles."""
+    return {
+        "metadata": {
+            "harvested_at": harvested_at.isoformat(),
+            "sources": ["Hacker News", "TechCrunch"],
+            "total_articles": articles,
+        },
+        "articles": [
+            {
+                "title": make_title(rng),
+                "url": f"https://example.com/{harvested_at:%Y%m%d%H%M}/{i}",
+                "score": rng.randint(0, 500),
+                "source": rng.choice(["Hacker News", "TechCrunch"]),
+                "timestamp": (harvested_at + timedelta(seconds=i)).isoformat(),
+            }
+            for i in range(articles)
+        ],
+    }
+
+
+def build_database(path: str, scans: int, articles: int, seed: int = 42):
+    """Point database_manager at ``path`` and fill it with ``scans`` reports."""
+    db.DATABASE_PATH = path
+    db.init_db()
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "report.json")
+        for i in range(scans):
+            harvested_at = now - timedelta(days=30) * (i / max(scans, 1))
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(make_report(rng, articles, harvested_at), f)
+            db.save_scan(report_path)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🔌 BASELINE: ONE CONNECTION PER CALL
+# ══════════════════════════════════════════════════════════════════════════════
+
+class PerCallConnections:
+    """
+    Drop-in for ConnectionManager reproducing the old behaviour: every
+    call opens a fresh ``sqlite3.connect`` with default settings and closes it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def read(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def write(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+@contextmanager
+def connection_mode(mode: str):
+    """Temporarily swap database_manager onto the baseline connections."""
+    if mode == "pooled":
+        yield
+        return
+    original = db.get_manager
+    baseline = PerCallConnections(db.DATABASE_PATH)
+    db.get_manager = lambda: baseline
+    try:
+        yield
+    finally:
+        db.get_manager = original
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🌐 API THROUGHPUT
+# ══════════════════════════════════════════════════════════════════════════════
+
+ENDPOINTS = ("/api/latest", "/api/trends", "/api/history", "/api/stats")
+
+
+async def _drive(client, endpoint: str, requests: int, revalidate: bool = False) -> float:
+    """Time ``requests`` GETs; with ``revalidate`` each one sends the last ETag (like a browser)."""
+    headers = {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(endpoint, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        if revalidate:
+            headers = {"If-None-Match": response.headers["etag"]}
+    return time.perf_counter() - start
+
+
+# mode -> (connections, response cache on, If-None-Match polling)
+API_MODES = {
+    "per-call": ("per-call", False, False),
+    "pooled": ("pooled", False, False),
+    "cached": ("pooled", True, False),
+    "cached-304": ("pooled", True, True),
+}
+
+
+def benchmark_api(requests: int = 500) -> List[Dict]:
+    """Requests/second per endpoint through an in-process ASGI client."""
+    import httpx
+    import app as dashboard
+    from response_cache import ResponseCache
+
+    async def run(mode: str, revalidate: bool) -> List[Dict]:
+        transport = httpx.ASGITransport(app=dashboard.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await _drive(client, ENDPOINTS[0], 10)  # Warm-up
+            results = []
+            for endpoint in ENDPOINTS:
+                elapsed = await _drive(client, endpoint, requests, revalidate)
+                results.append({
+                    "mode": mode,
+                    "endpoint": endpoint,
+                    "requests": requests,
+                    "req_per_s": requests / elapsed,
+                    "mean_ms": elapsed / requests * 1000,
+                })
+                print(f"   {mode:<10} {endpoint:<14} {requests / elapsed:>9,.0f} req/s"
+                      f"  {elapsed / requests * 1000:>7.3f} ms/req")
+            return results
+
+    results = []
+    original_cache = dashboard.response_cache
+    try:
+        for mode, (connections, cache, revalidate) in API_MODES.items():
+            dashboard.response_cache = ResponseCache(ttl=60 if cache else 0)
+            with connection_mode(connections):
+                results.extend(asyncio.run(run(mode, revalidate)))
+    finally:
+        dashboard.response_cache = original_cache
+
+    baseline = {r["endpoint"]: r["req_per_s"] for r in results if r["mode"] == "per-call"}
+    print()
+    for r in results:
+        if r["mode"] != "per-call":
+            print(f"   {r['mode']:<10} {r['endpoint']:<14} x{r['req_per_s'] / baseline[r['endpoint']]:.2f}")
+    return results
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🔀 CONCURRENT CLIENTS
+# ══════════════════════════════════════════════════════════════════════════════
+
+# Uncached read mix: one full-text search and one trends query per round
+CONCURRENCY_ENDPOINTS = ("/api/search?q=python+model&days=30", "/api/trends?days=30&limit=20")
+
+
+def benchmark_concurrency(clients: List[int], duration: float = 3.0) -> List[Dict]:
+    """
+    Total req/s with N simultaneous clients: DB calls inline on the event
+    loop (old handlers) vs offloaded to AsyncDatabase's thread pool.
+
+    A probe polls /api/cache (no database work) alongside the clients: its
+    latency is how long a cheap request waits behind database work.
+    Throughput can only scale with the number of CPU cores.
+    """
+    import httpx
+    import app as dashboard
+    from response_cache import ResponseCache
+
+    async def client_loop(client, deadline: float, latencies: List[float]):
+        for endpoint in itertools.cycle(CONCURRENCY_ENDPOINTS):
+            if time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            response = await client.get(endpoint)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async def probe_loop(client, start: float, deadline: float, latencies: List[float]):
+        # Latency counts from the scheduled send time (every 10 ms), so time
+        # spent waiting for a blocked event loop is included
+        for tick in itertools.count(1):
+            scheduled = start + tick * 0.01
+            if scheduled >= deadline:
+                return
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            (await client.get("/api/cache")).raise_for_status()
+            latencies.append(time.perf_counter() - scheduled)
+
+    def percentile(samples: List[float], fraction: float) -> float:
+        return sorted(samples)[int(len(samples) * fraction)] * 1000
+
+    async def run(count: int) -> Dict:
+        transport = httpx.ASGITransport(app=dashboard.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get(CONCURRENCY_ENDPOINTS[0])  # Warm-up
+            latencies: List[float] = []
+            probes: List[float] = []
+            start = time.perf_counter()
+            await asyncio.gather(
+                probe_loop(client, start, start + duration, probes),
+                *(client_loop(client, start + duration, latencies) for _ in range(count))
+            )
+            elapsed = time.perf_counter() - start
+        return {"requests": len(latencies), "req_per_s": len(latencies) / elapsed,
+                "p50_ms": percentile(latencies, 0.5), "p99_ms": percentile(latencies, 0.99),
+                "probe_p50_ms": percentile(probes, 0.5), "probe_p99_ms": percentile(probes, 0.99)}
+
+    original_cache, original_database = dashboard.response_cache, dashboard.database
+    dashboard.response_cache = ResponseCache(ttl=0)  # Every request reaches SQLite
+    print(f"   CPU cores: {os.cpu_count()}")
+    results = []
+    try:
+        for mode, workers in (("inline", 0), ("threads", db.get_manager().pool_size)):
+            dashboard.database = db.AsyncDatabase(read_workers=workers)
+            for count in clients:
+                result = {"mode": mode, "clients": count, **asyncio.run(run(count))}
+                results.append(result)
+                print(f"   {mode:<8} {count:>3} clients {result['req_per_s']:>7,.0f} req/s"
+                      f"  p50={result['p50_ms']:>7.2f} ms  p99={result['p99_ms']:>7.2f} ms"
+                      f"  probe p99={result['probe_p99_ms']:>7.2f} ms")
+            dashboard.database.close()
+    finally:
+        dashboard.response_cache, dashboard.database = original_cache, original_database
+    return results
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 📥 INGEST THROUGHPUT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def ingest_row_by_row(report: Dict) -> int:
+    """Baseline: the original save_scan loop (executes per row, regex per title)."""
+    import re
+    from collections import Counter
+
+    stopwords = set(db.STOPWORDS)
+    with db.get_manager().write() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO scans (timestamp, source, total_articles) VALUES (?, ?, ?)",
+            (report["metadata"]["harvested_at"], "bench", report["metadata"]["total_articles"])
+        )
+        scan_id = cursor.lastrowid
+        all_words = []
+        for article in report["articles"]:
+            key = db.story_hash(article["url"], article["title"])
+            cursor.execute(db._STORY_INSERT, (key, article["url"], article["title"], article["source"],
+                                              scan_id, scan_id, article["score"], article["timestamp"], None))
+            cursor.execute(db._OBSERVATION_INSERT, (scan_id, article["score"], article["timestamp"], key))
+            words = re.findall(r'\b\w{3,}\b', article["title"].lower())
+            all_words.extend(w for w in words if w not in stopwords)
+        for keyword, frequency in Counter(all_words).most_common(db.TOP_KEYWORDS):
+            cursor.execute(
+                "INSERT INTO keywords (scan_id, keyword, frequency) VALUES (?, ?, ?)",
+                (scan_id, keyword, frequency)
+            )
+    return scan_id
+
+
+def benchmark_ingest(articles: int, rounds: int = 3) -> List[Dict]:
+    """Articles/second: row-by-row loop vs ingest_articles (batched executemany)."""
+    rng = random.Random(7)
+    report = make_report(rng, articles, datetime.now())
+    methods = {
+        "row-by-row": lambda: ingest_row_by_row(report),
+        "bulk": lambda: db.ingest_articles(iter(report["articles"]), report["metadata"]),
+    }
+
+    results = []
+    for name, ingest in methods.items():
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            ingest()
+            best = min(best, time.perf_counter() - start)
+        results.append({"method": name, "articles": articles,
+                        "seconds": best, "articles_per_s": articles / best})
+        print(f"   {name:<12} {articles / best:>12,.0f} articles/s  ({best * 1000:.1f} ms)")
+    return results
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🔎 FULL-TEXT SEARCH LATENCY
+# ══════════════════════════════════════════════════════════════════════════════
+
+SEARCH_QUERIES = ("python", "rust compiler", "gpu cloud", "term42", "quantum chip", "term9000 security")
+
+
+def benchmark_search(articles: int, queries: int = 200, chunk: int = 100_000) -> List[Dict]:
+    """search_articles latency (ms) over ``articles`` indexed titles."""
+    rng = random.Random(11)
+    now = datetime.now()
+    for start in range(0, articles, chunk):
+        report = make_report(rng, min(chunk, articles - start), now - timedelta(hours=start // chunk))
+        db.ingest_articles(iter(report["articles"]), report["metadata"])
+
+    results = []
+    for query in SEARCH_QUERIES:
+        samples = []
+        for _ in range(queries):
+            start = time.perf_counter()
+            found = db.search_articles(query, days=30, limit=20)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        results.append({"query": query, "articles": articles, "results": len(found),
+                        "p50_ms": samples[len(samples) // 2], "p99_ms": samples[int(len(samples) * 0.99)]})
+        print(f"   {query!r:<20} p50={results[-1]['p50_ms']:>8.2f} ms  p99={results[-1]['p99_ms']:>8.2f} ms")
+    return results
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 📤 EXPORT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_export(articles: int, chunk: int = 100_000) -> List[Dict]:
+    """Rows/s and peak Python memory of a full NDJSON export (keyset pages)."""
+    import tracemalloc
+    from app import _format_rows
+
+    rng = random.Random(13)
+    now = datetime.now()
+    for start in range(0, articles, chunk):
+        report = make_report(rng, min(chunk, articles - start), now - timedelta(hours=start // chunk))
+        db.ingest_articles(iter(report["articles"]), report["metadata"])
+
+    def export() -> tuple:
+        rows = size = 0
+        for page in db.iter_pages(db.get_articles_page):
+            size += len(_format_rows(page, db.ARTICLE_FIELDS, "ndjson", header=False))
+            rows += len(page)
+        return rows, size
+
+    start = time.perf_counter()
+    rows, size = export()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()  # Separate pass: tracing slows Python down several times
+    export()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"   {rows:,} rows  {rows / elapsed:>10,.0f} rows/s  {size / 1e6:,.1f} MB NDJSON"
+          f"  peak Python memory {peak / 1e6:.1f} MB")
+    return [{"rows": rows, "rows_per_s": rows / elapsed, "bytes": size, "peak_bytes": peak}]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🎯 MAIN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description="Database benchmarks for the Intelligence Dashboard")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    api = sub.add_parser("api", help="API req/s: connection per call vs pooled WAL vs response cache")
+    api.add_argument("--requests", type=int, default=500)
+
+    ingest = sub.add_parser("ingest", help="articles/s: row-by-row vs bulk executemany")
+    ingest.add_argument("--articles", type=int, default=20_000, help="articles in the scan")
+    ingest.set_defaults(scans=0)
+
+    search = sub.add_parser("search", help="FTS5 search latency at scale")
+    search.add_argument("--articles", type=int, default=500_000, help="articles to index")
+    search.add_argument("--queries", type=int, default=200, help="repetitions per query")
+    search.set_defaults(scans=0)
+
+    export = sub.add_parser("export", help="full NDJSON export: rows/s and peak memory")
+    export.add_argument("--articles", type=int, default=1_000_000, help="articles to export")
+    export.set_defaults(scans=0)
+
+    concurrency = sub.add_parser("concurrency", help="req/s vs simultaneous clients: inline vs thread pool")
+    concurrency.add_argument("--clients", default="1,2,4,8,16,32", help="comma-separated client counts")
+    concurrency.add_argument("--duration", type=float, default=3.0, help="seconds per client count")
+    concurrency.add_argument("--scans", type=int, default=200)
+    concurrency.add_argument("--articles", type=int, default=500, help="articles per scan")
+
+    api.add_argument("--scans", type=int, default=60)
+    api.add_argument("--articles", type=int, default=100, help="articles per scan")
+    for subparser in (api, ingest, search, concurrency, export):
+        subparser.add_argument("--output", help="write results as JSON")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.scans:
+            print(f"🗄️ Building synthetic database ({args.scans} scans x {args.articles} articles)...")
+        build_database(os.path.join(tmp, "bench.db"), args.scans, args.articles)
+        print()
+
+        if args.command == "api":
+            results = benchmark_api(args.requests)
+        elif args.command == "ingest":
+            results = benchmark_ingest(args.articles)
+        elif args.command == "search":
+            results = benchmark_search(args.articles, args.queries)
+        elif args.command == "export":
+            results = benchmark_export(args.articles)
+        elif args.command == "concurrency":
+            results = benchmark_concurrency([int(n) for n in args.clients.split(",")], args.duration)
+
+        db.close_manager()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"command": args.command, "params": vars(args), "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+📈 NEO-TOKYO DEV - Benchmarks del Rate Limiter
+
+Uso:
+    python benchmark_rate_limiter.py contencion [--peticiones N] [--motor recarga]
+    python benchmark_rate_limiter.py backends [--peticiones N] [--redis host:puerto]
+    python benchmark_rate_limiter.py carga [--peticiones N] [--semilla S] [--salida r.json]
+    python benchmark_rate_limiter.py comparar base.json nuevo.json
+
+Todos los subcomandos aceptan ``--salida`` para guardar los resultados en
+JSON y poder compararlos entre versiones con ``comparar``.
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmark_resultados import comparar_resultados, guardar_resultados
+from rate_limiter import (
+    AsyncTokenBucket,
+    BackendMmap,
+    BackendRedis,
+    ShardedTokenBucket,
+    TokenBucket,
+)
+
+
+# ══════════════════════════════════════════════════════════════
+# CONTENCIÓN DE LOCKS (1 / 4 / 16 hilos)
+# ══════════════════════════════════════════════════════════════
+
+def _crear_limitadores(motor: str) -> Dict[str, Callable[[], object]]:
+    """Fábricas de los limitadores a comparar (capacidad alta: siempre permite)."""
+    return {
+        "TokenBucket (1 lock)": lambda: TokenBucket(
+            capacidad=10**9, tiempo_token=60.0, motor=motor
+        ),
+        "ShardedTokenBucket (16 shards)": lambda: ShardedTokenBucket(
+            capacidad=10**9, tiempo_token=60.0, motor=motor, num_shards=16
+        ),
+    }
+
+
+def medir_contencion(limitador, num_hilos: int, peticiones_por_hilo: int) -> float:
+    """
+    Lanza ``num_hilos`` hilos que llaman a ``tomar_token_sync`` con usuarios
+    disjuntos y devuelve el throughput total en peticiones/segundo.
+    """
+    barrera = threading.Barrier(num_hilos + 1)
+
+    def trabajador(hilo: int) -> None:
+        usuarios = [hilo * 1_000_000 + i for i in range(1024)]
+        tomar = limitador.tomar_token_sync
+        barrera.wait()
+        for i in range(peticiones_por_hilo):
+            tomar(usuarios[i & 1023])
+
+    hilos = [threading.Thread(target=trabajador, args=(h,)) for h in range(num_hilos)]
+    for hilo in hilos:
+        hilo.start()
+
+    barrera.wait()
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    return num_hilos * peticiones_por_hilo / duracion
+
+
+def benchmark_contencion(
+    peticiones_por_hilo: int = 50_000,
+    motor: str = "recarga",
+    hilos: List[int] = (1, 4, 16)
+) -> List[Dict]:
+    """
+    Compara 1 lock global contra lock striping con 1, 4 y 16 hilos.
+
+    Con el GIL de CPython no cabe esperar mejora de los shards: ambos
+    limitadores dan cifras equivalentes dentro del ruido entre ejecuciones.
+    """
+    resultados = []
+    print(f"🔒 Contención de locks (motor={motor}, {peticiones_por_hilo:,} peticiones/hilo)")
+    print("=" * 60)
+    for nombre, fabrica in _crear_limitadores(motor).items():
+        for num_hilos in hilos:
+            ops = medir_contencion(fabrica(), num_hilos, peticiones_por_hilo)
+            resultados.append({"limitador": nombre, "hilos": num_hilos, "ops_por_segundo": ops})
+            print(f"   {nombre:<32} hilos={num_hilos:<3} {ops:>12,.0f} ops/s")
+    return resultados
+
+
+# ══════════════════════════════════════════════════════════════
+# BACKENDS DE ESTADO (dict en proceso vs mmap vs Redis)
+# ══════════════════════════════════════════════════════════════
+
+def _percentiles(muestras_ns: List[int]) -> Dict[str, float]:
+    """Media, p50 y p99 en microsegundos."""
+    muestras_ns.sort()
+    return {
+        "media_us": statistics.fmean(muestras_ns) / 1000,
+        "p50_us": muestras_ns[len(muestras_ns) // 2] / 1000,
+        "p99_us": muestras_ns[int(len(muestras_ns) * 0.99)] / 1000,
+    }
+
+
+def medir_latencia(limitador, peticiones: int, num_usuarios: int = 10_000) -> Dict[str, float]:
+    """Latencia por comprobación (µs) de ``tomar_token_sync`` en un solo hilo."""
+    tomar = limitador.tomar_token_sync
+    reloj = time.perf_counter_ns
+    muestras = []
+    for i in range(peticiones):
+        inicio = reloj()
+        tomar(i % num_usuarios)
+        muestras.append(reloj() - inicio)
+    return _percentiles(muestras)
+
+
+def benchmark_backends(peticiones: int = 100_000, redis: Optional[str] = None) -> List[Dict]:
+    """
+    Compara el dict en proceso con los backends compartidos.
+    
+    Sin ``redis`` se levanta el servidor RESP local de ``redis_standin``
+    (mide el protocolo y el round trip, no el rendimiento de Redis real).
+    """
+    resultados = []
+    print(f"🗄️  Backends de estado (motor=recarga, {peticiones:,} peticiones)")
+    print("=" * 60)
+
+    def registrar(nombre: str, limitador) -> None:
+        metricas = medir_latencia(limitador, peticiones)
+        resultados.append({"backend": nombre, **metricas})
+        print(
+            f"   {nombre:<24} media={metricas['media_us']:>7.2f} µs  "
+            f"p50={metricas['p50_us']:>7.2f} µs  p99={metricas['p99_us']:>7.2f} µs"
+        )
+
+    def bucket(backend=None) -> TokenBucket:
+        return TokenBucket(capacidad=10**9, tiempo_token=60.0, motor="recarga", backend=backend)
+
+    registrar("dict (en proceso)", bucket())
+
+    with tempfile.TemporaryDirectory() as directorio:
+        backend = BackendMmap(os.path.join(directorio, "rate_limiter.bin"), num_slots=1 << 16)
+        registrar("mmap (mismo host)", bucket(backend))
+        backend.cerrar()
+
+    if redis:
+        host, _, puerto = redis.partition(":")
+        backend = BackendRedis(host, int(puerto or 6379))
+        registrar(f"redis ({redis})", bucket(backend))
+        backend.cerrar()
+    else:
+        from redis_standin import ServidorRESPLocal
+        with ServidorRESPLocal() as servidor:
+            backend = BackendRedis(port=servidor.port)
+            registrar("redis (servidor local)", bucket(backend))
+            backend.cerrar()
+
+    return resultados
+
+
+# ══════════════════════════════════════════════════════════════
+# CARGA: DISTRIBUCIONES REALISTAS, DIRECTO Y VÍA ASGI
+# ══════════════════════════════════════════════════════════════
+
+def _rss_mb() -> float:
+    """RSS actual del proceso en MB (/proc en Linux, pico de getrusage si no)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 2**20 if sys.platform == "darwin" else pico / 2**10
+
+
+def generar_claves(distribucion: str, peticiones: int, semilla: int, usuarios: int) -> List[int]:
+    """
+    Secuencia reproducible de IDs de usuario.
+    
+    - ``uniforme``: ``usuarios`` claves equiprobables
+    - ``zipf``: pocas claves calientes (s=1.1), cola larga de ``usuarios``
+    - ``frios``: cada petición es de un usuario nuevo (millones de claves frías)
+    """
+    rng = random.Random(semilla)
+    if distribucion == "uniforme":
+        return [rng.randrange(usuarios) for _ in range(peticiones)]
+    if distribucion == "zipf":
+        acumulados = list(itertools.accumulate(1 / (rango ** 1.1) for rango in range(1, usuarios + 1)))
+        total = acumulados[-1]
+        return [bisect.bisect_left(acumulados, rng.random() * total) for _ in range(peticiones)]
+    if distribucion == "frios":
+        return list(range(peticiones))
+    raise ValueError(f"Distribución desconocida: {distribucion!r}")
+
+
+DISTRIBUCIONES = ("uniforme", "zipf", "frios")
+
+
+def _medir_escenario(nombre: str, ejecutar: Callable[[], List[int]], permitidas: Callable[[], int]) -> Dict:
+    """Ejecuta un escenario y reúne latencia, throughput y crecimiento de RSS."""
+    rss_inicio = _rss_mb()
+    inicio = time.perf_counter()
+    muestras = ejecutar()
+    duracion = time.perf_counter() - inicio
+    rss_fin = _rss_mb()
+
+    resultado = {
+        "escenario": nombre,
+        "peticiones": len(muestras),
+        "permitidas": permitidas(),
+        "throughput_rps": len(muestras) / duracion,
+        **_percentiles(muestras),
+        "rss_inicio_mb": rss_inicio,
+        "rss_fin_mb": rss_fin,
+        "rss_delta_mb": rss_fin - rss_inicio,
+    }
+    print(
+        f"   {nombre:<30} {resultado['throughput_rps']:>11,.0f} req/s  "
+        f"p50={resultado['p50_us']:>7.2f} µs  p99={resultado['p99_us']:>8.2f} µs  "
+        f"ΔRSS={resultado['rss_delta_mb']:>7.1f} MB"
+    )
+    return resultado
+
+
+def escenario_directo(motor: str, claves: List[int], capacidad: int) -> tuple:
+    """``TokenBucket.tomar_token_sync`` sin HTTP de por medio."""
+    bucket = TokenBucket(capacidad=capacidad, tiempo_token=60.0, motor=motor)
+    contador = {"permitidas": 0}
+
+    def ejecutar() -> List[int]:
+        tomar, reloj = bucket.tomar_token_sync, time.perf_counter_ns
+        muestras, permitidas = [], 0
+        for clave in claves:
+            inicio = reloj()
+            permitidas += tomar(clave)
+            muestras.append(reloj() - inicio)
+        contador["permitidas"] = permitidas
+        return muestras
+
+    return ejecutar, lambda: contador["permitidas"]
+
+
+def escenario_asgi(motor: str, claves: List[int], capacidad: int) -> Optional[tuple]:
+    """``POST /rate-limited`` de la app FastAPI con un cliente ASGI en proceso."""
+    try:
+        import httpx
+    except ImportError:
+        print("   ⚠️  httpx no está instalado: se omite el escenario ASGI")
+        return None
+    from rate_limiter import app, get_rate_limiter
+
+    bucket = AsyncTokenBucket(capacidad=capacidad, tiempo_token=60.0, motor=motor)
+    contador = {"permitidas": 0}
+
+    async def recorrer() -> List[int]:
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            reloj, muestras, permitidas = time.perf_counter_ns, [], 0
+            for clave in claves:
+                inicio = reloj()
+                respuesta = await cliente.post("/rate-limited", json={"id_usuario": clave})
+                muestras.append(reloj() - inicio)
+                permitidas += respuesta.status_code == 200
+            contador["permitidas"] = permitidas
+            return muestras
+
+    def ejecutar() -> List[int]:
+        app.dependency_overrides[get_rate_limiter] = lambda: bucket
+        try:
+            return asyncio.run(recorrer())
+        finally:
+            app.dependency_overrides.pop(get_rate_limiter, None)
+
+    return ejecutar, lambda: contador["permitidas"]
+
+
+def benchmark_carga(
+    peticiones: int = 200_000,
+    peticiones_asgi: int = 5_000,
+    usuarios: int = 10_000,
+    capacidad: int = 100,
+    semilla: int = 1234,
+    motores: List[str] = list(TokenBucket.MOTORES)
+) -> List[Dict]:
+    """
+    Matriz motor × distribución, directo y a través de la app ASGI.
+    
+    En ``frios`` las peticiones directas son todas de usuarios nuevos, así
+    que ``peticiones`` controla cuántos millones de claves frías se crean.
+    """
+    resultados = []
+    print(f"🚦 Carga (semilla={semilla}, capacidad={capacidad}/60 s, {usuarios:,} usuarios)")
+    print("=" * 60)
+    for motor in motores:
+        for distribucion in DISTRIBUCIONES:
+            claves = generar_claves(distribucion, peticiones, semilla, usuarios)
+            resultados.append(_medir_escenario(
+                f"directo/{motor}/{distribucion}", *escenario_directo(motor, claves, capacidad)
+            ))
+            del claves
+
+            escenario = escenario_asgi(
+                motor, generar_claves(distribucion, peticiones_asgi, semilla, usuarios), capacidad
+            )
+            if escenario is not None:
+                resultados.append(_medir_escenario(f"asgi/{motor}/{distribucion}", *escenario))
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks del rate limiter")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    contencion = sub.add_parser("contencion", help="1 lock vs shards con 1/4/16 hilos")
+    contencion.add_argument("--peticiones", type=int, default=50_000)
+    contencion.add_argument("--motor", choices=TokenBucket.MOTORES, default="recarga")
+
+    backends = sub.add_parser("backends", help="dict en proceso vs mmap vs Redis")
+    backends.add_argument("--peticiones", type=int, default=100_000)
+    backends.add_argument("--redis", help="host:puerto de un Redis real (por defecto, servidor local)")
+
+    carga = sub.add_parser("carga", help="uniforme / zipf / fríos, directo y vía ASGI")
+    carga.add_argument("--peticiones", type=int, default=200_000)
+    carga.add_argument("--peticiones-asgi", type=int, default=5_000)
+    carga.add_argument("--usuarios", type=int, default=10_000)
+    carga.add_argument("--capacidad", type=int, default=100)
+    carga.add_argument("--semilla", type=int, default=1234)
+    carga.add_argument("--motor", choices=TokenBucket.MOTORES, action="append")
+
+    comparar = sub.add_parser("comparar", help="diferencias entre dos ficheros de resultados")
+    comparar.add_argument("base")
+    comparar.add_argument("nuevo")
+
+    for subparser in (contencion, backends, carga):
+        subparser.add_argument("--salida", help="fichero JSON donde guardar los resultados")
+
+    args = parser.parse_args()
+    if args.comando == "comparar":
+        comparar_resultados(args.base, args.nuevo)
+        return
+
+    if args.comando == "contencion":
+        resultados = benchmark_contencion(args.peticiones, args.motor)
+    elif args.comando == "backends":
+        resultados = benchmark_backends(args.peticiones, args.redis)
+    else:
+        resultados = benchmark_carga(
+            args.peticiones, args.peticiones_asgi, args.usuarios,
+            args.capacidad, args.semilla, args.motor or list(TokenBucket.MOTORES)
+        )
+
+    if args.salida:
+        parametros = {k: v for k, v in vars(args).items() if k not in ("comando", "salida")}
+        guardar_resultados(args.salida, args.comando, parametros, resultados)
+
+
+if __name__ == "__main__":
+    main()
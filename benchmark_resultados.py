@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+📈 NEO-TOKYO DEV - Resultados de los benchmarks en JSON
+
+Funciones compartidas por ``benchmark_rate_limiter.py`` y
+``benchmark_blockchain.py``: guardar los resultados con metadatos del
+entorno y compararlos entre versiones.
+"""
+
+import json
+import os
+import platform
+from datetime import datetime
+from typing import Dict, List
+
+
+def guardar_resultados(ruta: str, comando: str, parametros: Dict, resultados: List[Dict]) -> None:
+    """Escribe los resultados con metadatos del entorno (JSON estable para diff)."""
+    documento = {
+        "meta": {
+            "comando": comando,
+            "parametros": parametros,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "resultados": resultados,
+    }
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(documento, f, indent=2, sort_keys=True, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {ruta}")
+
+
+def _clave_resultado(resultado: Dict) -> str:
+    """Identificador del escenario, sea cual sea el subcomando."""
+    partes = [str(resultado[c]) for c in ("escenario", "limitador", "backend", "hilos") if c in resultado]
+    return "/".join(partes)
+
+
+def comparar_resultados(ruta_base: str, ruta_nueva: str) -> List[Dict]:
+    """Imprime la variación porcentual de cada métrica numérica por escenario."""
+    with open(ruta_base, encoding="utf-8") as f:
+        base = {_clave_resultado(r): r for r in json.load(f)["resultados"]}
+    with open(ruta_nueva, encoding="utf-8") as f:
+        nuevos = {_clave_resultado(r): r for r in json.load(f)["resultados"]}
+
+    diferencias = []
+    print(f"📊 {ruta_base} → {ruta_nueva}")
+    print("=" * 60)
+    for clave in sorted(base.keys() & nuevos.keys()):
+        print(f"   {clave}")
+        for metrica, anterior in sorted(base[clave].items()):
+            actual = nuevos[clave].get(metrica)
+            if not isinstance(anterior, (int, float)) or not isinstance(actual, (int, float)):
+                continue
+            cambio = (actual - anterior) / anterior * 100 if anterior else 0.0
+            diferencias.append({"escenario": clave, "metrica": metrica,
+                                "base": anterior, "nuevo": actual, "cambio_pct": cambio})
+            print(f"      {metrica:<16} {anterior:>14,.2f} → {actual:>14,.2f}  ({cambio:+.1f}%)")
+    for clave in sorted(base.keys() ^ nuevos.keys()):
+        print(f"   {clave}: solo en {'base' if clave in base else 'nuevo'}")
+    return diferencias
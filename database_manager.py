@@ -7,24 +7,182 @@
 """
 
 import sqlite3
+import asyncio
+import functools
+import hashlib
+import heapq
+import html
 import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import chain, islice
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 
 
 DATABASE_PATH = "intelligence.db"
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# 🔌 CONNECTION MANAGER
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections for one database file.
+
+    - Readers borrow from a thread-safe pool of up to ``pool_size``
+      connections (blocking when all of them are busy).
+    - Writes go through a single connection behind a lock, so SQLite never
+      sees two writers competing for the database lock.
+    - WAL journal mode lets readers keep reading while the writer commits.
+
+    Connections are reused, so each one keeps its schema and its prepared
+    statement cache (``cached_statements``) warm across requests.
+    """
+
+    PRAGMAS = {
+        "synchronous": "NORMAL",   # Durable at checkpoints; safe with WAL
+        "cache_size": -16000,      # 16 MB page cache per connection
+        "mmap_size": 268435456,    # 256 MB memory-mapped reads
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,      # ms to wait on a locked database
+    }
+
+    def __init__(self, path: str, pool_size: int = 8, cached_statements: int = 128):
+        self.path = path
+        self.pool_size = pool_size
+        self.cached_statements = cached_statements
+        self._idle: List[sqlite3.Connection] = []
+        self._idle_lock = threading.Lock()
+        self._readers = threading.BoundedSemaphore(pool_size)
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,  # Pooled: used by whichever thread borrows it
+            cached_statements=self.cached_statements
+        )
+        for pragma, value in self.PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection from the pool."""
+        with self._readers:
+            with self._idle_lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect(read_only=True)
+            try:
+                yield conn
+            finally:
+                with self._idle_lock:
+                    self._idle.append(conn)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Serialized write transaction: commit on success, rollback on error.
+
+        Every commit bumps the data generation (see ``data_generation``).
+        """
+        global _generation
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            _generation += 1
+
+    def close(self):
+        """Close every pooled connection and the writer."""
+        with self._write_lock, self._idle_lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+            self._writer.close()
+
+
+_manager: Optional[ConnectionManager] = None
+_manager_lock = threading.Lock()
+_generation = 0
+
+
+def data_generation() -> int:
+    """
+    Counter bumped by every committed write (save_scan, ingest, rollups...).
+
+    Readers can cache anything derived from the database and reuse it for
+    as long as the generation has not changed. Only writes made through
+    this process's ConnectionManager are seen.
+    """
+    return _generation
+
+
+def get_manager() -> ConnectionManager:
+    """
+    Shared ConnectionManager for ``DATABASE_PATH``.
+
+    Recreated when ``DATABASE_PATH`` changes (e.g. tests or benchmarks
+    pointing at a temporary file).
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None or _manager.path != DATABASE_PATH:
+            if _manager is not None:
+                _manager.close()
+            _manager = ConnectionManager(DATABASE_PATH)
+        return _manager
+
+
+def close_manager():
+    """Close the shared ConnectionManager (e.g. on server shutdown)."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 🗄️ DATABASE SCHEMA
 # ══════════════════════════════════════════════════════════════════════════════
 
 def init_db():
-    """Initialize SQLite database with schema."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
+    """Initialize SQLite database with schema and apply pending migrations."""
+    with get_manager().write() as conn:
+        if not conn.in_transaction:
+            conn.execute('BEGIN')  # Schema + migrations are all-or-nothing
+        cursor = conn.cursor()
+        if cursor.execute('PRAGMA user_version').fetchone()[0] == 0:
+            _create_base_schema(cursor)
+        version = _migrate(cursor)
+
+    print(f"✅ Database initialized: {DATABASE_PATH} (schema v{version})")
+
+
+def _create_base_schema(cursor: sqlite3.Cursor):
+    """
+    Original (v0) schema; every later change is a migration.
+
+    Also run on legacy databases (user_version 0), where the tables already
+    exist and each statement is a no-op.
+    """
     # Table: scans (each harvest run)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS scans (
@@ -34,7 +192,7 @@ def init_db():
             total_articles INTEGER NOT NULL
         )
     ''')
-    
+
     # Table: articles
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS articles (
@@ -48,7 +206,7 @@ def init_db():
             FOREIGN KEY (scan_id) REFERENCES scans (id)
         )
     ''')
-    
+
     # Table: keywords
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS keywords (
@@ -59,112 +217,552 @@ def init_db():
             FOREIGN KEY (scan_id) REFERENCES scans (id)
         )
     ''')
-    
+
     # Indices for performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_scan ON articles(scan_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_keywords_scan ON keywords(scan_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_timestamp ON scans(timestamp)')
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"✅ Database initialized: {DATABASE_PATH}")
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-# 💾 DATA OPERATIONS
+# 🔁 MIGRATIONS
 # ══════════════════════════════════════════════════════════════════════════════
 
-def save_scan(json_path: str = "output/intelligence_report.json") -> int:
+def to_epoch(timestamp: Optional[str]) -> Optional[int]:
     """
-    Save intelligence report to database.
-    Returns scan_id.
+    ISO-8601 string -> integer Unix epoch (UTC).
+
+    Naive timestamps are local time, as written by ``datetime.now()``.
+    Unparseable values return None, which keeps them out of every range
+    query (the old ``datetime(timestamp)`` filter returned NULL for them too).
     """
-    # Read JSON
+    if not timestamp:
+        return None
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"❌ File not found: {json_path}")
+        return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp())
+    except (TypeError, ValueError):
         return None
-    
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Insert scan
-    metadata = data.get('metadata', {})
+
+
+def _days_ago(days: int) -> int:
+    """Epoch lower bound for "last N days" queries."""
+    return int(time.time()) - days * 86400
+
+
+def _migration_epoch_timestamps(cursor: sqlite3.Cursor):
+    """
+    v1: integer ``scans.scanned_at`` + (scanned_at, id) index.
+
+    Why: the old filters wrapped the column in ``datetime()``, so
+    ``idx_scans_timestamp`` could never be used and every query scanned the
+    whole table. Comparing a plain integer column is an index range scan,
+    and (scanned_at, id) covers the scan side of the keyword/article joins.
+    ``timestamp`` is kept as-is for display.
+    """
+    cursor.execute('ALTER TABLE scans ADD COLUMN scanned_at INTEGER')
+    cursor.connection.create_function('to_epoch', 1, to_epoch, deterministic=True)
+    cursor.execute('UPDATE scans SET scanned_at = to_epoch(timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scans_scanned_at ON scans(scanned_at, id)')
+    cursor.execute('DROP INDEX IF EXISTS idx_scans_timestamp')
+
+
+def _migration_keyword_rollups(cursor: sqlite3.Cursor):
+    """
+    v2: ``keyword_daily`` rollup, one row per (UTC day, keyword).
+
+    Why: /api/trends is polled every 30 s and re-summed every keyword row
+    of every scan in the window. The rollup is kept up to date by
+    ``save_scan`` so a trend query reads at most one row per day per keyword.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS keyword_daily (
+            day INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            frequency INTEGER NOT NULL,
+            PRIMARY KEY (day, keyword)
+        ) WITHOUT ROWID
+    ''')
+    _fill_rollups(cursor)
+
+
+def _migration_articles_fts(cursor: sqlite3.Cursor):
+    """
+    v3: ``articles_fts`` FTS5 index over article titles.
+
+    External-content table (the text lives only in ``articles``) kept in
+    sync by triggers, so every write path - save_scan, bulk ingest, manual
+    SQL - updates it inside the same transaction.
+    """
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, content='articles', content_rowid='id', tokenize='porter unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts (rowid, title) VALUES (new.id, new.title);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            INSERT INTO articles_fts (rowid, title) VALUES (new.id, new.title);
+        END
+    ''')
+    cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+
+
+def story_hash(url: str, title: str = '') -> int:
+    """
+    Identity of a story across scans: signed 64-bit BLAKE2b of its URL
+    (of its title when the URL is empty, e.g. items without a link).
+
+    An INTEGER key keeps the unique index at 8 bytes per story instead of
+    a copy of every URL.
+    """
+    key = url.strip() if url and url.strip() else 'title:' + (title or '').strip().lower()
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+# Newer observations win; an older report ingested late never rewinds a story
+_STORY_UPSERT_SET = '''
+    ON CONFLICT (url_hash) DO UPDATE SET
+        title = excluded.title,
+        last_scan_id = excluded.last_scan_id,
+        last_score = excluded.last_score,
+        last_seen = excluded.last_seen,
+        last_seen_at = excluded.last_seen_at
+    WHERE coalesce(excluded.last_seen_at, 0) >= coalesce(stories.last_seen_at, 0)
+'''
+
+
+def _create_stories_fts(cursor: sqlite3.Cursor):
+    """``stories_fts`` over story titles (external content, trigger-synced)."""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS stories_fts USING fts5(
+            title, content='stories', content_rowid='id', tokenize='porter unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stories_fts_insert AFTER INSERT ON stories BEGIN
+            INSERT INTO stories_fts (rowid, title) VALUES (new.id, new.title);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stories_fts_delete AFTER DELETE ON stories BEGIN
+            INSERT INTO stories_fts (stories_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        END
+    ''')
+    # Re-observing a story rewrites its title; only real edits touch the index
     cursor.execute('''
-        INSERT INTO scans (timestamp, source, total_articles)
+        CREATE TRIGGER IF NOT EXISTS stories_fts_update AFTER UPDATE OF title ON stories
+        WHEN old.title IS NOT new.title BEGIN
+            INSERT INTO stories_fts (stories_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            INSERT INTO stories_fts (rowid, title) VALUES (new.id, new.title);
+        END
+    ''')
+    cursor.execute("INSERT INTO stories_fts (stories_fts) VALUES ('rebuild')")
+
+
+def _migration_stories(cursor: sqlite3.Cursor):
+    """
+    v4: canonical ``stories`` + ``articles`` reduced to per-scan observations.
+
+    Why: every harvest re-inserted the same stories with their full title,
+    URL and source, so ``articles`` (and its FTS index) grew with scan
+    frequency and ``get_latest`` returned the same story several times.
+    Now each story is stored once, keyed by a unique URL hash, and carries
+    its newest observation (``last_*``); ``articles`` keeps only
+    (scan, story, score, timestamp), one row per story per scan.
+
+    Existing duplicates are collapsed: the story takes the title/score of
+    its newest scan, and repeats inside one scan keep their best score.
+    Article ids are preserved. Full-text search moves to ``stories_fts``.
+    """
+    cursor.connection.create_function('story_hash', 2, story_hash, deterministic=True)
+    cursor.execute('''
+        CREATE TABLE stories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url_hash INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            source TEXT NOT NULL,
+            first_scan_id INTEGER NOT NULL,
+            last_scan_id INTEGER NOT NULL,
+            last_score INTEGER,
+            last_seen DATETIME,
+            last_seen_at INTEGER,
+            FOREIGN KEY (first_scan_id) REFERENCES scans (id),
+            FOREIGN KEY (last_scan_id) REFERENCES scans (id)
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX idx_stories_url_hash ON stories(url_hash)')
+    cursor.execute('CREATE INDEX idx_stories_latest ON stories(last_seen_at, last_score)')
+
+    # Oldest first, so the upsert leaves each story at its newest observation
+    cursor.execute(f'''
+        INSERT INTO stories (url_hash, url, title, source, first_scan_id,
+                             last_scan_id, last_score, last_seen, last_seen_at)
+        SELECT story_hash(a.url, a.title), a.url, a.title, a.source, a.scan_id,
+               a.scan_id, a.score, a.timestamp, s.scanned_at
+        FROM articles a
+        JOIN scans s ON s.id = a.scan_id
+        WHERE true
+        ORDER BY coalesce(s.scanned_at, 0), a.scan_id, a.id
+        {_STORY_UPSERT_SET}
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE articles_v4 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER NOT NULL,
+            story_id INTEGER NOT NULL,
+            score INTEGER,
+            timestamp DATETIME NOT NULL,
+            FOREIGN KEY (scan_id) REFERENCES scans (id),
+            FOREIGN KEY (story_id) REFERENCES stories (id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO articles_v4 (id, scan_id, story_id, score, timestamp)
+        SELECT MIN(a.id), a.scan_id, st.id, MAX(a.score), MIN(a.timestamp)
+        FROM articles a
+        JOIN stories st ON st.url_hash = story_hash(a.url, a.title)
+        GROUP BY a.scan_id, st.id
+    ''')
+
+    cursor.execute('DROP TABLE IF EXISTS articles_fts')  # Its triggers go with articles
+    cursor.execute('DROP TABLE articles')
+    cursor.execute('ALTER TABLE articles_v4 RENAME TO articles')
+    cursor.execute('CREATE UNIQUE INDEX idx_articles_scan_story ON articles(scan_id, story_id)')
+    cursor.execute('CREATE INDEX idx_articles_story ON articles(story_id)')
+
+    _create_stories_fts(cursor)
+
+
+def _migration_archives(cursor: sqlite3.Cursor):
+    """
+    v5: ``archives`` catalog of monthly archive databases (see ``archive_scans``).
+
+    Row counts are kept here so totals never have to open the archives.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archives (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            scans INTEGER NOT NULL,
+            articles INTEGER NOT NULL,
+            keywords INTEGER NOT NULL,
+            first_scanned_at INTEGER NOT NULL,
+            last_scanned_at INTEGER NOT NULL,
+            archived_at INTEGER NOT NULL
+        )
+    ''')
+
+
+# Applied in order; ``PRAGMA user_version`` records how many have run
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _migration_epoch_timestamps,
+    _migration_keyword_rollups,
+    _migration_articles_fts,
+    _migration_stories,
+    _migration_archives,
+]
+
+
+def _migrate(cursor: sqlite3.Cursor) -> int:
+    """Run pending migrations inside the caller's transaction; returns the schema version."""
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(cursor)
+        cursor.execute(f'PRAGMA user_version = {number}')
+        print(f"🔁 Migration v{number} applied: {migration.__name__}")
+    return len(MIGRATIONS)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 📈 KEYWORD ROLLUPS
+# ══════════════════════════════════════════════════════════════════════════════
+
+SECONDS_PER_DAY = 86400
+
+
+def _fill_rollups(cursor: sqlite3.Cursor):
+    """(Re)compute keyword_daily from the raw keywords table."""
+    cursor.execute('DELETE FROM keyword_daily')
+    cursor.execute(f'''
+        INSERT INTO keyword_daily (day, keyword, frequency)
+        SELECT s.scanned_at / {SECONDS_PER_DAY}, k.keyword, SUM(k.frequency)
+        FROM keywords k
+        JOIN scans s ON k.scan_id = s.id
+        WHERE s.scanned_at IS NOT NULL
+        GROUP BY 1, 2
+    ''')
+
+
+def _add_to_rollups(cursor: sqlite3.Cursor, scanned_at: Optional[int], keywords: List[Tuple[str, int]]):
+    """Fold one scan's keywords into its day (inside the caller's transaction)."""
+    if scanned_at is None:
+        return  # Never matched a date range before either
+    day = scanned_at // SECONDS_PER_DAY
+    cursor.executemany('''
+        INSERT INTO keyword_daily (day, keyword, frequency)
         VALUES (?, ?, ?)
+        ON CONFLICT (day, keyword) DO UPDATE SET frequency = frequency + excluded.frequency
+    ''', [(day, keyword, frequency) for keyword, frequency in keywords])
+
+
+def rebuild_rollups() -> int:
+    """
+    Rebuild keyword_daily from historical data (e.g. after manual edits or
+    imports that bypassed ``save_scan``), archived months included.
+
+    Returns:
+        Number of (day, keyword) rows
+    """
+    archived = []
+    with get_manager().read() as conn:
+        for archive in _archive_paths(conn):
+            with _attached(conn, [archive]) as (schema,):
+                archived += conn.execute(f'''
+                    SELECT s.scanned_at / {SECONDS_PER_DAY}, k.keyword, SUM(k.frequency)
+                    FROM {schema}.keywords k
+                    JOIN {schema}.scans s ON k.scan_id = s.id
+                    WHERE s.scanned_at IS NOT NULL
+                    GROUP BY 1, 2
+                ''').fetchall()
+
+    with get_manager().write() as conn:
+        cursor = conn.cursor()
+        _fill_rollups(cursor)
+        cursor.executemany('''
+            INSERT INTO keyword_daily (day, keyword, frequency)
+            VALUES (?, ?, ?)
+            ON CONFLICT (day, keyword) DO UPDATE SET frequency = frequency + excluded.frequency
+        ''', archived)
+        rows = cursor.execute('SELECT COUNT(*) FROM keyword_daily').fetchone()[0]
+
+    print(f"✅ Keyword rollups rebuilt: {rows} (day, keyword) rows")
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 💾 DATA OPERATIONS
+# ══════════════════════════════════════════════════════════════════════════════
+
+KEYWORD_PATTERN = re.compile(r'\b\w{3,}\b')  # Words with 3+ chars
+STOPWORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+TOP_KEYWORDS = 20
+INGEST_BATCH_SIZE = 1000
+
+
+def count_keywords(titles: Iterable[str]) -> Counter:
+    """
+    Keyword frequencies for a batch of titles in one pass.
+
+    The titles are joined and scanned by a single ``findall`` (one C-level
+    loop instead of one regex call per title); stopwords are dropped from
+    the counter afterwards instead of being tested word by word.
+    """
+    word_freq = Counter(KEYWORD_PATTERN.findall('\n'.join(titles).lower()))
+    for stopword in STOPWORDS:
+        word_freq.pop(stopword, None)
+    return word_freq
+
+
+_STORY_INSERT = f'''
+    INSERT INTO stories (url_hash, url, title, source, first_scan_id,
+                         last_scan_id, last_score, last_seen, last_seen_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    {_STORY_UPSERT_SET}
+'''
+
+# One observation per story per scan; a story listed twice keeps its best score
+_OBSERVATION_INSERT = '''
+    INSERT INTO articles (scan_id, story_id, score, timestamp)
+    SELECT ?, id, ?, ? FROM stories WHERE url_hash = ?
+    ON CONFLICT (scan_id, story_id) DO UPDATE SET score = max(score, excluded.score)
+'''
+
+
+def _insert_report(
+    cursor: sqlite3.Cursor,
+    metadata: Dict,
+    articles: Iterable[Dict],
+    batch_size: int = INGEST_BATCH_SIZE
+) -> Tuple[int, int, Counter]:
+    """
+    Insert one scan inside the caller's transaction.
+
+    Articles are streamed in ``executemany`` batches, so an iterator of any
+    length is never materialized; keyword counts are accumulated per batch.
+    Each article upserts its story (by URL hash) and records one score
+    observation for this scan.
+
+    Returns:
+        (scan_id, articles inserted, keyword frequencies)
+    """
+    now = datetime.now().isoformat()
+    harvested_at = metadata.get('harvested_at', now)
+    scanned_at = to_epoch(harvested_at)
+    cursor.execute('''
+        INSERT INTO scans (timestamp, scanned_at, source, total_articles)
+        VALUES (?, ?, ?, ?)
     ''', (
-        metadata.get('harvested_at', datetime.now().isoformat()),
+        harvested_at,
+        scanned_at,
         ', '.join(metadata.get('sources', ['Unknown'])),
         metadata.get('total_articles', 0)
     ))
-    
     scan_id = cursor.lastrowid
-    
-    # Insert articles
-    articles = data.get('articles', [])
-    for article in articles:
-        cursor.execute('''
-            INSERT INTO articles (scan_id, title, url, score, source, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            scan_id,
-            article.get('title', 'Unknown'),
-            article.get('url', ''),
-            article.get('score', 0),
-            article.get('source', 'Unknown'),
-            article.get('timestamp', datetime.now().isoformat())
-        ))
-    
-    # Calculate and insert keywords (basic frequency analysis)
-    from collections import Counter
-    import re
-    
-    # Extract words from titles
-    all_words = []
-    stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-    
-    for article in articles:
-        title = article.get('title', '').lower()
-        words = re.findall(r'\b\w{3,}\b', title)  # Words with 3+ chars
-        words = [w for w in words if w not in stopwords]
-        all_words.extend(words)
-    
-    word_freq = Counter(all_words)
-    
-    # Insert top 20 keywords
-    for keyword, frequency in word_freq.most_common(20):
-        cursor.execute('''
-            INSERT INTO keywords (scan_id, keyword, frequency)
-            VALUES (?, ?, ?)
-        ''', (scan_id, keyword, frequency))
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"✅ Scan saved: ID={scan_id}, Articles={len(articles)}, Keywords={len(word_freq)}")
-    
+
+    inserted = 0
+    word_freq = Counter()
+    iterator = iter(articles)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            break
+        rows = []
+        for article in batch:
+            title = article.get('title', 'Unknown')
+            url = article.get('url', '')
+            rows.append((
+                story_hash(url, title),
+                url,
+                title,
+                article.get('source', 'Unknown'),
+                article.get('score', 0),
+                article.get('timestamp', now)
+            ))
+        cursor.executemany(_STORY_INSERT, [
+            (key, url, title, source, scan_id, scan_id, score, timestamp, scanned_at)
+            for key, url, title, source, score, timestamp in rows
+        ])
+        cursor.executemany(_OBSERVATION_INSERT, [
+            (scan_id, score, timestamp, key)
+            for key, _, _, _, score, timestamp in rows
+        ])
+        word_freq.update(count_keywords(article.get('title', '') for article in batch))
+        inserted += len(batch)
+
+    if 'total_articles' not in metadata:
+        cursor.execute('UPDATE scans SET total_articles = ? WHERE id = ?', (inserted, scan_id))
+
+    # Insert top keywords (and fold them into the daily rollup)
+    top_keywords = word_freq.most_common(TOP_KEYWORDS)
+    cursor.executemany('''
+        INSERT INTO keywords (scan_id, keyword, frequency)
+        VALUES (?, ?, ?)
+    ''', [(scan_id, keyword, frequency) for keyword, frequency in top_keywords])
+    _add_to_rollups(cursor, scanned_at, top_keywords)
+
+    return scan_id, inserted, word_freq
+
+
+def _load_report(json_path: str) -> Optional[Dict]:
+    """Read an intelligence report JSON (None if the file does not exist)."""
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"❌ File not found: {json_path}")
+        return None
+
+
+def save_scan(json_path: str = "output/intelligence_report.json") -> int:
+    """
+    Save intelligence report to database.
+    Returns scan_id.
+    """
+    data = _load_report(json_path)
+    if data is None:
+        return None
+
+    with get_manager().write() as conn:
+        scan_id, inserted, word_freq = _insert_report(
+            conn.cursor(), data.get('metadata', {}), data.get('articles', [])
+        )
+
+    print(f"✅ Scan saved: ID={scan_id}, Articles={inserted}, Keywords={len(word_freq)}")
+
+    return scan_id
+
+
+def ingest_articles(
+    articles: Iterable[Dict],
+    metadata: Optional[Dict] = None,
+    batch_size: int = INGEST_BATCH_SIZE
+) -> int:
+    """
+    Bulk-ingest a stream of articles as one scan, in a single transaction.
+
+    Args:
+        articles: Any iterable of article dicts (generators are streamed)
+        metadata: Scan metadata (``harvested_at``, ``sources``, ``total_articles``);
+            ``total_articles`` defaults to the number of articles ingested
+        batch_size: Rows per ``executemany`` call
+
+    Returns:
+        scan_id
+    """
+    with get_manager().write() as conn:
+        scan_id, inserted, word_freq = _insert_report(
+            conn.cursor(), metadata or {}, articles, batch_size
+        )
+
+    print(f"✅ Scan ingested: ID={scan_id}, Articles={inserted}, Keywords={len(word_freq)}")
     return scan_id
 
 
+def ingest_reports(json_paths: Iterable[str], batch_size: int = INGEST_BATCH_SIZE) -> List[int]:
+    """
+    Ingest many report JSON files in one transaction (all or nothing).
+
+    Missing files are reported and skipped. Files are read one at a time,
+    so only one report is in memory at once.
+
+    Returns:
+        scan_ids of the ingested reports, in order
+    """
+    scan_ids = []
+    total_articles = 0
+    with get_manager().write() as conn:
+        cursor = conn.cursor()
+        for json_path in json_paths:
+            data = _load_report(json_path)
+            if data is None:
+                continue
+            scan_id, inserted, _ = _insert_report(
+                cursor, data.get('metadata', {}), data.get('articles', []), batch_size
+            )
+            scan_ids.append(scan_id)
+            total_articles += inserted
+
+    print(f"✅ Reports ingested: {len(scan_ids)} scans, {total_articles} articles")
+    return scan_ids
+
+
 def get_latest(limit: int = 10) -> List[Dict]:
-    """Get latest articles."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT a.title, a.url, a.score, a.source, a.timestamp
-        FROM articles a
-        JOIN scans s ON a.scan_id = s.id
-        ORDER BY s.timestamp DESC, a.score DESC
-        LIMIT ?
-    ''', (limit,))
-    
+    """
+    Get latest articles: each story once, most recently seen first, with
+    the score of its newest observation.
+    """
+    with get_manager().read() as conn:
+        cursor = conn.execute('''
+            SELECT title, url, last_score, source, last_seen
+            FROM stories
+            ORDER BY last_seen_at DESC, last_score DESC  -- Walks idx_stories_latest backwards
+            LIMIT ?
+        ''', (limit,))
+        rows = cursor.fetchall()
+
     articles = []
-    for row in cursor.fetchall():
+    for row in rows:
         articles.append({
             'title': row[0],
             'url': row[1],
@@ -172,117 +770,770 @@ def get_latest(limit: int = 10) -> List[Dict]:
             'source': row[3],
             'timestamp': row[4]
         })
-    
-    conn.close()
+
     return articles
 
 
 def get_trends(days: int = 7, limit: int = 10) -> List[Dict]:
-    """Get trending keywords from last N days."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT k.keyword, SUM(k.frequency) as total_freq
-        FROM keywords k
-        JOIN scans s ON k.scan_id = s.id
-        WHERE datetime(s.timestamp) >= datetime('now', '-' || ? || ' days')
-        GROUP BY k.keyword
-        ORDER BY total_freq DESC
-        LIMIT ?
-    ''', (days, limit))
-    
+    """
+    Get trending keywords from last N days.
+
+    Reads the daily rollup, so the window is whole UTC days: it includes
+    the full day in which "N days ago" falls.
+    """
+    with get_manager().read() as conn:
+        cursor = conn.execute('''
+            SELECT keyword, SUM(frequency) as total_freq
+            FROM keyword_daily
+            WHERE day >= ?
+            GROUP BY keyword
+            ORDER BY total_freq DESC
+            LIMIT ?
+        ''', (_days_ago(days) // SECONDS_PER_DAY, limit))
+        rows = cursor.fetchall()
+
     trends = []
-    for row in cursor.fetchall():
+    for row in rows:
         trends.append({
             'keyword': row[0],
             'frequency': row[1]
         })
-    
-    conn.close()
+
     return trends
 
 
 def get_history(days: int = 30) -> List[Dict]:
-    """Get scan history."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, timestamp, source, total_articles
-        FROM scans
-        WHERE datetime(timestamp) >= datetime('now', '-' || ? || ' days')
-        ORDER BY timestamp DESC
-    ''', (days,))
-    
+    """
+    Get scan history.
+
+    Monthly archives overlapping the window are read too (one at a time),
+    so the result does not depend on what has been archived.
+    """
+    since = _days_ago(days)
+    rows = []
+    with get_manager().read() as conn:
+        for archive in [None] + _archive_paths(conn, since):
+            with _attached(conn, [archive] if archive else []) as schemas:
+                rows += conn.execute(f'''
+                    SELECT id, timestamp, source, total_articles, scanned_at
+                    FROM {schemas[0] if schemas else 'main'}.scans
+                    WHERE scanned_at >= ?
+                ''', (since,)).fetchall()
+    rows.sort(key=lambda row: (row[4], row[0]), reverse=True)
+
     history = []
-    for row in cursor.fetchall():
+    for row in rows:
         history.append({
             'id': row[0],
             'timestamp': row[1],
             'source': row[2],
             'total_articles': row[3]
         })
-    
-    conn.close()
+
     return history
 
 
+# Private-use sentinels: snippet() marks matches with these, and they are
+# swapped for <mark> only after the title has been HTML-escaped
+_MARK_OPEN, _MARK_CLOSE = '\ue000', '\ue001'
+
+
+# BM25 is computed for every candidate row, so very common terms would
+# cost O(matches); only the newest matches are ranked
+SEARCH_RANK_WINDOW = 2000
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query.
+
+    Every word becomes a quoted term, so ``-``, ``:``, ``*`` or unbalanced
+    quotes from users can never be parsed as FTS syntax; all terms must
+    match (the porter tokenizer already matches plurals and verb forms).
+    """
+    terms = re.findall(r'\w+', query.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escape a snippet and turn the match sentinels into <mark> tags."""
+    return html.escape(snippet).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def search_articles(query: str, days: Optional[int] = None, limit: int = 20) -> List[Dict]:
+    """
+    Full-text search over story titles, best matches first (BM25).
+
+    Args:
+        query: Free text; all words must match
+        days: Only stories seen in the last N days (None = all history)
+        limit: Maximum results
+
+    Returns:
+        Stories (newest score and timestamp) with ``snippet`` (HTML-escaped, matches in ``<mark>``) and
+        ``rank`` (BM25; lower is better)
+
+    Terms with more than ``SEARCH_RANK_WINDOW`` matches are ranked among
+    their newest ``SEARCH_RANK_WINDOW`` matches only: the window's lower
+    rowid bound is a cheap rowid-ordered FTS lookup, and it keeps latency
+    flat however large the history grows.
+    """
+    match = _fts_query(query)
+    if match is None:
+        return []
+
+    with get_manager().read() as conn:
+        cursor = conn.execute(f'''
+            SELECT st.id, st.title, st.url, st.last_score, st.source, st.last_seen,
+                   snippet(stories_fts, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', 16),
+                   bm25(stories_fts) AS rank
+            FROM stories_fts
+            JOIN stories st ON st.id = stories_fts.rowid
+            WHERE stories_fts MATCH ?1
+              AND stories_fts.rowid >= coalesce((
+                  SELECT rowid FROM stories_fts WHERE stories_fts MATCH ?1
+                  ORDER BY rowid DESC LIMIT 1 OFFSET {SEARCH_RANK_WINDOW - 1}
+              ), 0)
+              AND (?2 IS NULL OR st.last_seen_at >= ?2)
+            ORDER BY rank
+            LIMIT ?3
+        ''', (match, None if days is None else _days_ago(days), limit))
+        rows = cursor.fetchall()
+
+    results = []
+    for row in rows:
+        results.append({
+            'id': row[0],
+            'title': row[1],
+            'url': row[2],
+            'score': row[3],
+            'source': row[4],
+            'timestamp': row[5],
+            'snippet': _highlight(row[6]),
+            'rank': row[7]
+        })
+
+    return results
+
+
 def get_stats() -> Dict:
     """Get general statistics."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Total scans
-    cursor.execute('SELECT COUNT(*) FROM scans')
-    total_scans = cursor.fetchone()[0]
-    
-    # Total articles
-    cursor.execute('SELECT COUNT(*) FROM articles')
-    total_articles = cursor.fetchone()[0]
-    
-    # Unique keywords
-    cursor.execute('SELECT COUNT(DISTINCT keyword) FROM keywords')
-    total_keywords = cursor.fetchone()[0]
-    
-    # Last scan time
-    cursor.execute('SELECT MAX(timestamp) FROM scans')
-    last_scan = cursor.fetchone()[0]
-    
-    conn.close()
-    
+    with get_manager().read() as conn:
+        # Archived scans/articles are counted from the archive catalog
+        # (stories always stay in the hot database)
+        archived_scans, archived_articles, archives = conn.execute(
+            'SELECT coalesce(SUM(scans), 0), coalesce(SUM(articles), 0), COUNT(*) FROM archives'
+        ).fetchone()
+
+        # Total scans
+        total_scans = conn.execute('SELECT COUNT(*) FROM scans').fetchone()[0] + archived_scans
+
+        # Total articles (one per story per scan) and distinct stories
+        total_articles = conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0] + archived_articles
+        total_stories = conn.execute('SELECT COUNT(*) FROM stories').fetchone()[0]
+
+        # Unique keywords (keyword_daily also covers archived days)
+        total_keywords = conn.execute(
+            'SELECT COUNT(*) FROM (SELECT keyword FROM keywords UNION SELECT keyword FROM keyword_daily)'
+        ).fetchone()[0]
+
+        # Last scan time (from the newest archive if everything is archived)
+        newest = _archive_paths(conn)[-1:]
+        with _attached(conn, newest if total_scans == archived_scans else []) as schemas:
+            last_scan = conn.execute(
+                f'SELECT timestamp FROM {schemas[0] if schemas else "main"}.scans '
+                'ORDER BY scanned_at DESC, id DESC LIMIT 1'
+            ).fetchone()
+        last_scan = last_scan[0] if last_scan else None
+
     return {
         'total_scans': total_scans,
         'total_articles': total_articles,
+        'total_stories': total_stories,
         'total_keywords': total_keywords,
+        'archives': archives,
         'last_scan': last_scan
     }
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# 📤 KEYSET PAGINATION & EXPORT
+# ══════════════════════════════════════════════════════════════════════════════
+
+ARTICLE_FIELDS = ('id', 'scan_id', 'scan_timestamp', 'story_id', 'title', 'url', 'score', 'source', 'timestamp')
+KEYWORD_FIELDS = ('id', 'scan_id', 'scan_timestamp', 'keyword', 'frequency')
+EXPORT_BATCH_SIZE = 5000
+
+# {schema}/{op}/{order} are filled from fixed values; the cursor is always a parameter
+_ARTICLES_KEYSET = '''
+    SELECT a.id, a.scan_id, sc.timestamp, st.id, st.title, st.url, a.score, st.source, a.timestamp
+    FROM {schema}.articles a
+    JOIN {schema}.stories st ON st.id = a.story_id
+    JOIN {schema}.scans sc ON sc.id = a.scan_id
+    WHERE a.id {op} ?
+    ORDER BY a.id {order}
+    LIMIT ?
+'''
+
+_KEYWORDS_KEYSET = '''
+    SELECT k.id, k.scan_id, sc.timestamp, k.keyword, k.frequency
+    FROM {schema}.keywords k
+    JOIN {schema}.scans sc ON sc.id = k.scan_id
+    WHERE k.id {op} ?
+    ORDER BY k.id {order}
+    LIMIT ?
+'''
+
+
+def _keyset_page(
+    query: str,
+    fields: Tuple[str, ...],
+    cursor: Optional[int],
+    limit: int,
+    newest_first: bool,
+    archive: Optional[str] = None
+) -> Tuple[List[Dict], Optional[int]]:
+    """
+    One page of ``query`` after ``cursor`` (an id), walking the rowid.
+
+    Every page is an index range seek (``id < ?`` / ``id > ?``), so page
+    1000 costs the same as page 1; nothing is skipped with OFFSET.
+    ``archive`` (a path from ``archive_paths``) reads that archive instead
+    of the hot database.
+
+    Returns:
+        (rows, cursor for the next page or None on the last page)
+    """
+    if newest_first:
+        op, order, bound = '<', 'DESC', cursor if cursor is not None else 2 ** 63 - 1
+    else:
+        op, order, bound = '>', 'ASC', cursor if cursor is not None else 0
+    with get_manager().read() as conn, _attached(conn, [archive] if archive else []) as schemas:
+        sql = query.format(schema=schemas[0] if schemas else 'main', op=op, order=order)
+        rows = conn.execute(sql, (bound, limit)).fetchall()
+
+    items = [dict(zip(fields, row)) for row in rows]
+    next_cursor = items[-1]['id'] if len(items) == limit else None
+    return items, next_cursor
+
+
+def get_articles_page(
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    newest_first: bool = True,
+    archive: Optional[str] = None
+) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Article observations (one per story per scan) with their story, by id.
+
+    Args:
+        cursor: ``next_cursor`` of the previous page (None = first page)
+        limit: Page size
+        newest_first: Descending ids (browsing) or ascending (export)
+        archive: Read this monthly archive instead of the hot database
+    """
+    return _keyset_page(_ARTICLES_KEYSET, ARTICLE_FIELDS, cursor, limit, newest_first, archive)
+
+
+def get_keywords_page(
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    newest_first: bool = True,
+    archive: Optional[str] = None
+) -> Tuple[List[Dict], Optional[int]]:
+    """Per-scan top keywords by id; see ``get_articles_page``."""
+    return _keyset_page(_KEYWORDS_KEYSET, KEYWORD_FIELDS, cursor, limit, newest_first, archive)
+
+
+def iter_pages(
+    get_page: Callable[..., Tuple[List[Dict], Optional[int]]],
+    after: Optional[int] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    include_archives: bool = True
+) -> Iterator[List[Dict]]:
+    """
+    Stream a whole table by ascending id, one page of ``batch_size`` rows at a time.
+
+    Memory stays at one page however long the history is, and no read
+    connection is held between pages (a long export never pins the pool
+    or a WAL snapshot). Rows appended meanwhile are included.
+
+    Monthly archives and the hot database are read as one id sequence:
+    ids are AUTOINCREMENT and archived rows keep theirs, so ``after`` (the
+    last id received) resumes an interrupted export exactly, wherever that
+    row lives now, even if ``archive_scans`` ran in between. Sources whose
+    id ranges don't overlap (the usual case: older months hold older ids)
+    are read one after the other; overlapping ones (a backfilled report
+    archived into an old month) are merged by id.
+
+    Example:
+        for rows in iter_pages(get_articles_page):
+            ...
+    """
+    sources = (archive_paths() if include_archives else []) + [None]
+    for run in _id_runs(get_page, sources, after):
+        if len(run) == 1:
+            yield from _source_pages(get_page, run[0], after, batch_size)
+            continue
+        merged = heapq.merge(
+            *(chain.from_iterable(_source_pages(get_page, source, after, batch_size))
+              for source in run),
+            key=itemgetter('id')
+        )
+        while True:
+            rows = list(islice(merged, batch_size))
+            if not rows:
+                break
+            yield rows
+
+
+def history_page(
+    get_page: Callable[..., Tuple[List[Dict], Optional[int]]],
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    include_archives: bool = True
+) -> Tuple[List[Dict], Optional[int]]:
+    """
+    One newest-first page across the hot database and the monthly archives.
+
+    The browsing counterpart of ``iter_pages``: ids are unique across all
+    sources, so ``cursor`` (the last id of the previous page) works the
+    same whether the rows live in hot or in an archive. Each source is
+    probed for its newest id below ``cursor`` (a one-row index seek) and
+    read newest source first; sources that can't reach the page are not
+    read.
+
+    Returns:
+        (rows, cursor for the next page or None on the last page)
+    """
+    sources = [None] + (archive_paths()[::-1] if include_archives else [])
+    tops = []
+    for source in sources:
+        top, _ = get_page(cursor, 1, newest_first=True, archive=source)
+        if top:
+            tops.append((top[0]['id'], source))
+
+    items: List[Dict] = []
+    for top_id, source in sorted(tops, key=itemgetter(0), reverse=True):
+        if len(items) == limit and top_id < items[-1]['id']:
+            break
+        rows, _ = get_page(cursor, limit, newest_first=True, archive=source)
+        items = list(islice(heapq.merge(items, rows, key=itemgetter('id'), reverse=True), limit))
+    next_cursor = items[-1]['id'] if len(items) == limit else None
+    return items, next_cursor
+
+
+def _source_pages(
+    get_page: Callable[..., Tuple[List[Dict], Optional[int]]],
+    archive: Optional[str],
+    after: Optional[int],
+    batch_size: int
+) -> Iterator[List[Dict]]:
+    """Pages of one source (an archive path, or None for hot) with ids above ``after``."""
+    cursor = after
+    while True:
+        rows, cursor = get_page(cursor, batch_size, newest_first=False, archive=archive)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+def _id_runs(
+    get_page: Callable[..., Tuple[List[Dict], Optional[int]]],
+    sources: List[Optional[str]],
+    after: Optional[int]
+) -> List[List[Optional[str]]]:
+    """
+    Group ``sources`` into runs to export in id order.
+
+    Runs are ordered by their lowest id above ``after``; sources whose id
+    ranges overlap share a run. The hot database is open-ended (it keeps
+    growing during the export), so everything starting above its first id
+    joins its run. Sources with nothing above ``after`` are left out.
+    """
+    ranges = []
+    for source in sources:
+        first, _ = get_page(after, 1, newest_first=False, archive=source)
+        if not first:
+            continue
+        if source is None:
+            last_id = float('inf')
+        else:
+            last_id = get_page(None, 1, newest_first=True, archive=source)[0][0]['id']
+        ranges.append((first[0]['id'], last_id, source))
+
+    runs: List[Tuple[float, List[Optional[str]]]] = []
+    for first_id, last_id, source in sorted(ranges, key=itemgetter(0)):
+        if runs and first_id <= runs[-1][0]:
+            runs[-1] = (max(runs[-1][0], last_id), runs[-1][1] + [source])
+        else:
+            runs.append((last_id, [source]))
+    return [run for _, run in runs]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🗃️ ARCHIVAL
+# ══════════════════════════════════════════════════════════════════════════════
+
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_DIR = "archive"  # Relative to the directory of DATABASE_PATH
+
+# Same columns and ids as the hot tables, so archived rows read like hot ones
+_ARCHIVE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS {schema}.scans (
+        id INTEGER PRIMARY KEY, timestamp DATETIME NOT NULL, source TEXT NOT NULL,
+        total_articles INTEGER NOT NULL, scanned_at INTEGER
+    )''',
+    '''CREATE TABLE IF NOT EXISTS {schema}.stories (
+        id INTEGER PRIMARY KEY, url_hash INTEGER NOT NULL, url TEXT NOT NULL,
+        title TEXT NOT NULL, source TEXT NOT NULL, first_scan_id INTEGER NOT NULL,
+        last_scan_id INTEGER NOT NULL, last_score INTEGER, last_seen DATETIME,
+        last_seen_at INTEGER
+    )''',
+    '''CREATE TABLE IF NOT EXISTS {schema}.articles (
+        id INTEGER PRIMARY KEY, scan_id INTEGER NOT NULL, story_id INTEGER NOT NULL,
+        score INTEGER, timestamp DATETIME NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS {schema}.keywords (
+        id INTEGER PRIMARY KEY, scan_id INTEGER NOT NULL, keyword TEXT NOT NULL,
+        frequency INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_scans_scanned_at ON scans(scanned_at, id)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_articles_scan ON articles(scan_id)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_keywords_scan ON keywords(scan_id)',
+)
+
+# Scans of one month (scanned_at in [?, ?)) still in the hot database
+_MONTH_SCANS = 'SELECT id FROM main.scans WHERE scanned_at >= ? AND scanned_at < ?'
+
+# INSERT OR IGNORE/REPLACE on the original ids: copying a month twice is a no-op
+_ARCHIVE_COPY = (
+    f'''INSERT OR IGNORE INTO archive.scans
+        SELECT id, timestamp, source, total_articles, scanned_at
+        FROM main.scans WHERE id IN ({_MONTH_SCANS})''',
+    f'''INSERT OR IGNORE INTO archive.articles
+        SELECT id, scan_id, story_id, score, timestamp
+        FROM main.articles WHERE scan_id IN ({_MONTH_SCANS})''',
+    f'''INSERT OR IGNORE INTO archive.keywords
+        SELECT id, scan_id, keyword, frequency
+        FROM main.keywords WHERE scan_id IN ({_MONTH_SCANS})''',
+    f'''INSERT OR REPLACE INTO archive.stories
+        SELECT id, url_hash, url, title, source, first_scan_id, last_scan_id,
+               last_score, last_seen, last_seen_at
+        FROM main.stories
+        WHERE id IN (SELECT story_id FROM main.articles WHERE scan_id IN ({_MONTH_SCANS}))''',
+)
+
+# Only rows already in the archive are removed: a scan committed by another
+# process between the copy and the purge stays hot until the next run
+_ARCHIVE_PURGE = (
+    'DELETE FROM main.articles WHERE id IN (SELECT id FROM archive.articles)',
+    'DELETE FROM main.keywords WHERE id IN (SELECT id FROM archive.keywords)',
+    'DELETE FROM main.scans WHERE id IN (SELECT id FROM archive.scans)',
+)
+
+# Catalog counts are taken from the archive itself, so they stay exact when
+# a month is archived again (late reports with old timestamps)
+_ARCHIVE_CATALOG = '''
+    INSERT INTO archives (month, path, scans, articles, keywords,
+                          first_scanned_at, last_scanned_at, archived_at)
+    SELECT ?, ?,
+           (SELECT COUNT(*) FROM archive.scans),
+           (SELECT COUNT(*) FROM archive.articles),
+           (SELECT COUNT(*) FROM archive.keywords),
+           (SELECT MIN(scanned_at) FROM archive.scans),
+           (SELECT MAX(scanned_at) FROM archive.scans),
+           ?
+    WHERE true
+    ON CONFLICT (month) DO UPDATE SET
+        path = excluded.path,
+        scans = excluded.scans,
+        articles = excluded.articles,
+        keywords = excluded.keywords,
+        first_scanned_at = excluded.first_scanned_at,
+        last_scanned_at = excluded.last_scanned_at,
+        archived_at = excluded.archived_at
+'''
+
+
+def _archive_paths(conn: sqlite3.Connection, since: Optional[int] = None) -> List[str]:
+    """Catalogued archive files, oldest month first (see ``archive_paths``)."""
+    rows = conn.execute(
+        'SELECT path FROM archives WHERE last_scanned_at >= ? ORDER BY month',
+        (since if since is not None else -2 ** 63,)
+    ).fetchall()
+    base = Path(DATABASE_PATH).parent
+    return [str(base / row[0]) for row in rows]
+
+
+def archive_paths(since: Optional[int] = None) -> List[str]:
+    """
+    Paths of the monthly archive databases, oldest month first.
+
+    Args:
+        since: Only archives holding scans at or after this epoch
+    """
+    with get_manager().read() as conn:
+        return _archive_paths(conn, since)
+
+
+@contextmanager
+def _attached(conn: sqlite3.Connection, paths: List[str]) -> Iterator[List[str]]:
+    """
+    ATTACH ``paths`` to ``conn`` for the duration of the block.
+
+    Yields the schema names to qualify tables with (``archive0``...).
+    Missing files raise instead of being created empty by ATTACH.
+    """
+    schemas = []
+    try:
+        for path in paths:
+            if not Path(path).exists():
+                raise FileNotFoundError(f"Archive database not found: {path}")
+            schema = f'archive{len(schemas)}'
+            conn.execute('ATTACH DATABASE ? AS ' + schema, (path,))
+            schemas.append(schema)
+        yield schemas
+    finally:
+        for schema in schemas:
+            conn.execute('DETACH DATABASE ' + schema)
+
+
+def _month_bounds(month: str, cutoff: int) -> Tuple[int, int]:
+    """Epoch range [start, end) of a ``YYYY-MM`` month (UTC), capped at ``cutoff``."""
+    year, number = map(int, month.split('-'))
+    start = datetime(year, number, 1, tzinfo=timezone.utc)
+    end = datetime(year + number // 12, number % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp()), min(int(end.timestamp()), cutoff)
+
+
+def archive_scans(older_than_days: int = ARCHIVE_AFTER_DAYS, vacuum: bool = False) -> List[Dict]:
+    """
+    Move scans older than ``older_than_days`` (with their articles and
+    keywords) into one archive database per month.
+
+    Archives are plain SQLite files next to the database
+    (``archive/<name>-YYYY-MM.db``), listed in the ``archives`` table.
+    Stories and the keyword_daily rollups stay in the hot database, so
+    get_latest, get_trends and search_articles are unaffected; get_history,
+    get_stats, rebuild_rollups and iter_pages read the archives too.
+
+    Each month is copied in one transaction and removed from the hot
+    database in a second one, so an interruption never loses rows and
+    running it again finishes the job. The purge removes exactly the rows
+    present in the archive, never a scan written in between. Scans without a parseable timestamp
+    are never archived.
+
+    Args:
+        older_than_days: Age (whole UTC days) after which scans are archived
+        vacuum: VACUUM the hot database afterwards to give the space back
+
+    Returns:
+        Catalog rows of the months written
+    """
+    cutoff = _days_ago(older_than_days) // SECONDS_PER_DAY * SECONDS_PER_DAY
+    manager = get_manager()
+    with manager.read() as conn:
+        months = [row[0] for row in conn.execute('''
+            SELECT DISTINCT strftime('%Y-%m', scanned_at, 'unixepoch')
+            FROM scans WHERE scanned_at < ? ORDER BY 1
+        ''', (cutoff,))]
+
+    database = Path(DATABASE_PATH)
+    archived = []
+    for month in months:
+        relative = f'{ARCHIVE_DIR}/{database.stem}-{month}.db'
+        (database.parent / ARCHIVE_DIR).mkdir(exist_ok=True)
+        bounds = _month_bounds(month, cutoff)
+        with manager.write() as conn:
+            conn.execute('ATTACH DATABASE ? AS archive', (str(database.parent / relative),))
+            try:
+                for statement in _ARCHIVE_SCHEMA:
+                    conn.execute(statement.format(schema='archive'))
+                for statement in _ARCHIVE_COPY:
+                    conn.execute(statement, bounds)
+                conn.commit()
+                for statement in _ARCHIVE_PURGE:
+                    conn.execute(statement)
+                conn.execute(_ARCHIVE_CATALOG, (month, relative, int(time.time())))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('DETACH DATABASE archive')
+            row = conn.execute('SELECT * FROM archives WHERE month = ?', (month,)).fetchone()
+        archived.append(dict(zip(
+            ('month', 'path', 'scans', 'articles', 'keywords',
+             'first_scanned_at', 'last_scanned_at', 'archived_at'), row
+        )))
+
+    if vacuum and archived:
+        with manager.write() as conn:
+            conn.execute('VACUUM')
+
+    print(f"✅ Archived {len(archived)} month(s) older than {older_than_days} days")
+    return archived
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ⚡ ASYNC ACCESS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class WriteQueueFull(RuntimeError):
+    """Raised when ``max_pending_writes`` writes are already queued or running."""
+
+
+class AsyncDatabase:
+    """
+    Awaitable access to the functions in this module for async servers.
+
+    The functions above are blocking; calling them from an ``async def``
+    handler stalls the event loop for the whole query, so concurrent
+    requests are served one at a time. Here:
+
+    - Reads run on a pool of ``read_workers`` threads (sized like the
+      ConnectionManager read pool, so a thread never waits for a
+      connection). sqlite3 releases the GIL while SQLite executes, so
+      reads really overlap.
+    - Writes run on one dedicated thread (there is a single writer
+      connection anyway), so a long ``save_scan`` never occupies the
+      readers' threads.
+    - Write backpressure: at most ``max_pending_writes`` writes may be
+      queued or running; beyond that ``write`` raises ``WriteQueueFull``
+      at once instead of growing an unbounded queue (HTTP 503).
+
+    ``read_workers=0`` runs every call inline on the event loop (the old
+    behaviour; useful as a benchmark baseline).
+
+    Thread pools are created on first use, so an instance can be closed
+    on server shutdown and reused afterwards.
+    """
+
+    def __init__(self, read_workers: int = 8, max_pending_writes: int = 4):
+        self.read_workers = read_workers
+        self.max_pending_writes = max_pending_writes
+        self.pending_writes = 0
+        self.rejected_writes = 0
+        self._lock = threading.Lock()
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _executor(self, write: bool) -> ThreadPoolExecutor:
+        with self._lock:
+            if write:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(1, thread_name_prefix='db-write')
+                return self._writer
+            if self._readers is None:
+                self._readers = ThreadPoolExecutor(self.read_workers, thread_name_prefix='db-read')
+            return self._readers
+
+    async def read(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """``await read(get_trends, 7, 10)`` runs ``get_trends(7, 10)`` on a reader thread."""
+        if self.read_workers <= 0:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(False), functools.partial(func, *args, **kwargs))
+
+    async def write(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a writing function (``save_scan``, ``ingest_reports``...) on the
+        writer thread.
+
+        Raises:
+            WriteQueueFull: ``max_pending_writes`` writes are already pending
+        """
+        with self._lock:
+            if self.pending_writes >= self.max_pending_writes:
+                self.rejected_writes += 1
+                raise WriteQueueFull(f"{self.pending_writes} database writes already pending")
+            self.pending_writes += 1
+        try:
+            if self.read_workers <= 0:
+                return func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor(True), functools.partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.pending_writes -= 1
+
+    def stats(self) -> Dict:
+        """Pool sizes and write queue counters."""
+        with self._lock:
+            return {
+                'read_workers': self.read_workers,
+                'pending_writes': self.pending_writes,
+                'max_pending_writes': self.max_pending_writes,
+                'rejected_writes': self.rejected_writes
+            }
+
+    def close(self):
+        """Shut the thread pools down (running calls finish first)."""
+        with self._lock:
+            executors, self._readers, self._writer = (self._readers, self._writer), None, None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 🧪 MAIN (Testing)
 # ══════════════════════════════════════════════════════════════════════════════
 
-if __name__ == "__main__":
+def _demo():
+    """Save output/intelligence_report.json and print a summary."""
     print("🗄️ Initializing database...")
     init_db()
-    
+
     print("\n💾 Saving intelligence report...")
     scan_id = save_scan()
-    
+
     if scan_id:
         print(f"\n📊 Scan saved with ID: {scan_id}")
-        
+
         print("\n📰 Latest articles:")
         for i, article in enumerate(get_latest(5), 1):
             print(f"  {i}. {article['title'][:60]}...")
-        
+
         print("\n🔥 Trending keywords (last 7 days):")
         for i, trend in enumerate(get_trends(7, 5), 1):
             print(f"  {i}. {trend['keyword']} ({trend['frequency']})")
-        
+
         print("\n📈 Statistics:")
         stats = get_stats()
         for key, value in stats.items():
             print(f"  {key}: {value}")
 
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Intelligence database manager")
+    sub = parser.add_subparsers(dest="command")
+
+    ingest = sub.add_parser("ingest", help="bulk-ingest report JSON files in one transaction")
+    ingest.add_argument("json_paths", nargs="+")
+    ingest.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+
+    sub.add_parser("rebuild-rollups", help="recompute keyword_daily from historical scans")
+
+    archive = sub.add_parser("archive", help="move old scans into monthly archive databases")
+    archive.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS, metavar="DAYS")
+    archive.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        init_db()
+        ingest_reports(args.json_paths, args.batch_size)
+    elif args.command == "rebuild-rollups":
+        init_db()
+        rebuild_rollups()
+    elif args.command == "archive":
+        init_db()
+        archive_scans(args.older_than, args.vacuum)
+    else:
+        _demo()
@@ -7,7 +7,14 @@ Generado por: Neo-Tokyo Dev v3.0 Golden Stack
 
 import hashlib
 import datetime
-from typing import List, Optional
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -24,6 +31,76 @@ class Colors:
     BOLD = "\033[1m"
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# #️⃣ HASHING RÁPIDO (midstate)
+# ══════════════════════════════════════════════════════════════════════════════
+
+# Representación de los nonces 0..999 y de los tres últimos dígitos de
+# los nonces >= 1000 (str(123045) == "123" + "045")
+_SMALL_NONCES = [str(i).encode() for i in range(1000)]
+_NONCE_SUFFIXES = [f"{i:03d}".encode() for i in range(1000)]
+
+_NO_LIMIT = 2 ** 63
+
+
+def difficulty_target(difficulty: int) -> bytes:
+    """
+    Umbral del digest para ``difficulty`` ceros hexadecimales.
+    
+    Que el hex empiece por N ceros equivale a que los 4·N primeros bits del
+    digest sean cero, es decir, a ``digest < 2 ** (256 - 4·N)``. Como los
+    digests miden siempre 32 bytes, la comparación de bytes es la numérica.
+    """
+    bits = 256 - 4 * min(max(difficulty, 0), 64)
+    if bits == 256:
+        return b"\xff" * 32 + b"\x00"  # Mayor que cualquier digest
+    return (1 << bits).to_bytes(32, "big")
+
+
+def find_nonce(prefix: bytes, difficulty: int, start: int = 0,
+               stop: Optional[int] = None) -> Optional[int]:
+    """
+    Primer nonce de [start, stop) tal que sha256(prefix + str(nonce)) cumple
+    ``difficulty``; el mismo que encontraría el bucle con ``_calculate_hash``.
+    
+    El prefijo se hashea una sola vez y cada intento parte de una copia de
+    ese estado (midstate): para nonces >= 1000 se añade primero la parte
+    alta (una vez por cada mil nonces) y luego los tres últimos dígitos,
+    ya codificados. La dificultad se comprueba sobre el ``digest()`` crudo
+    con una comparación de bytes, sin pasar por ``hexdigest()``.
+    
+    Args:
+        prefix: ``Block._hash_prefix()`` codificado en UTF-8
+        difficulty: Ceros hexadecimales requeridos al inicio del hash
+        start: Primer nonce a probar
+        stop: Fin (excluido) del rango; None = sin límite
+        
+    Returns:
+        El nonce, o None si no hay ninguno en el rango
+    """
+    target = difficulty_target(difficulty)
+    midstate = hashlib.sha256(prefix)
+    stop = _NO_LIMIT if stop is None else stop
+    nonce = start
+    while nonce < stop:
+        high, low = divmod(nonce, 1000)
+        if high:
+            head = midstate.copy()
+            head.update(str(high).encode())
+            suffixes = _NONCE_SUFFIXES
+        else:
+            head = midstate
+            suffixes = _SMALL_NONCES
+        group_stop = min(stop - high * 1000, 1000)
+        for low in range(low, group_stop):
+            attempt = head.copy()
+            attempt.update(suffixes[low])
+            if attempt.digest() < target:
+                return high * 1000 + low
+        nonce = high * 1000 + group_stop
+    return None
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 🧱 BLOQUE (Block)
 # ══════════════════════════════════════════════════════════════════════════════
@@ -44,7 +121,8 @@ class Block:
         index: int,
         data: str,
         previous_hash: str,
-        difficulty: int = 4
+        difficulty: int = 4,
+        miner: Optional["ParallelMiner"] = None
     ):
         """
         Crea un nuevo bloque.
@@ -54,6 +132,7 @@ class Block:
             data: Información almacenada en el bloque
             previous_hash: Hash del bloque anterior (crea el enlace)
             difficulty: Número de ceros requeridos al inicio del hash
+            miner: Minero multiproceso (None = minar en este proceso)
         """
         self.index = index
         self.timestamp = datetime.datetime.now()
@@ -64,7 +143,41 @@ class Block:
         self.hash = ""
         
         # Minar el bloque (Proof of Work)
-        self._mine_block()
+        if miner is not None:
+            self._mine_parallel(miner)
+        else:
+            self._mine_block()
+    
+    @classmethod
+    def from_stored(
+        cls,
+        index: int,
+        timestamp: datetime.datetime,
+        data: str,
+        previous_hash: str,
+        difficulty: int,
+        nonce: int,
+        hash: str
+    ) -> "Block":
+        """Reconstruye un bloque ya minado (p. ej. leído de disco) sin volver a minarlo."""
+        block = cls.__new__(cls)
+        block.index = index
+        block.timestamp = timestamp
+        block.data = data
+        block.previous_hash = previous_hash
+        block.difficulty = difficulty
+        block.nonce = nonce
+        block.hash = hash
+        return block
+    
+    def _hash_prefix(self) -> str:
+        """Parte del texto hasheado que no depende del nonce."""
+        return (
+            str(self.index) +
+            str(self.timestamp) +
+            self.data +
+            self.previous_hash
+        )
     
     def _calculate_hash(self) -> str:
         """
@@ -74,13 +187,7 @@ class Block:
         Si cambias cualquier dato, el hash cambia completamente.
         Esto garantiza la inmutabilidad de la blockchain.
         """
-        block_string = (
-            str(self.index) +
-            str(self.timestamp) +
-            self.data +
-            self.previous_hash +
-            str(self.nonce)
-        )
+        block_string = self._hash_prefix() + str(self.nonce)
         return hashlib.sha256(block_string.encode()).hexdigest()
     
     def _mine_block(self) -> None:
@@ -98,25 +205,35 @@ class Block:
         - Difficulty 4: hash debe empezar con "0000..."
         - Más ceros = más difícil = más seguro
         """
-        target = "0" * self.difficulty
+        prefix = self._hash_prefix().encode()
         
         print(f"{Colors.YELLOW}⛏️  Minando bloque #{self.index}...{Colors.RESET}", end=" ")
         
         while True:
-            self.hash = self._calculate_hash()
+            # Probar los siguientes 100K nonces (ver find_nonce)
+            nonce = find_nonce(prefix, self.difficulty, self.nonce, self.nonce + 100000)
             
-            # ¿El hash cumple la dificultad?
-            if self.hash.startswith(target):
+            if nonce is not None:
                 # ¡Encontrado!
+                self.nonce = nonce
+                self.hash = self._calculate_hash()
                 print(f"{Colors.GREEN}✅ Nonce encontrado: {self.nonce}{Colors.RESET}")
                 break
             
-            # No cumple, probar siguiente nonce
-            self.nonce += 1
-            
             # Mostrar progreso cada 100K intentos
-            if self.nonce % 100000 == 0:
-                print(f"{self.nonce:,}", end="...", flush=True)
+            self.nonce += 100000
+            print(f"{self.nonce:,}", end="...", flush=True)
+    
+    def _mine_parallel(self, miner: "ParallelMiner") -> None:
+        """
+        Mina el bloque repartiendo los nonces entre los procesos de ``miner``.
+        
+        Encuentra el mismo nonce (y el mismo hash) que ``_mine_block``.
+        """
+        print(f"{Colors.YELLOW}⛏️  Minando bloque #{self.index} "
+              f"({miner.workers} procesos)...{Colors.RESET}", end=" ")
+        self.nonce, self.hash = miner.mine(self)
+        print(f"{Colors.GREEN}✅ Nonce encontrado: {self.nonce}{Colors.RESET}")
     
     def __str__(self) -> str:
         """Representación bonita del bloque."""
@@ -133,10 +250,603 @@ class Block:
 """
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# ⚙️ MINADO MULTIPROCESO
+# ══════════════════════════════════════════════════════════════════════════════
+
+NO_HIT = -1  # Valor de _best_nonce mientras nadie ha encontrado un nonce válido
+
+# Cada cuántos nonces mira un proceso si otro ya encontró uno menor
+CANCEL_CHECK_EVERY = 4096
+
+# Mejor nonce encontrado en la búsqueda actual, compartido por todo el pool
+# (lo fija _init_worker en cada proceso)
+_best_nonce = None
+
+
+def _init_worker(best_nonce) -> None:
+    """Inicializador de los procesos del pool."""
+    global _best_nonce
+    _best_nonce = best_nonce
+
+
+def _search_nonces(prefix: bytes, difficulty: int, start: int, stop: int) -> Optional[int]:
+    """
+    Primer nonce de [start, stop) cuyo hash empieza por ``difficulty`` ceros.
+    
+    Se ejecuta en un proceso del pool. Abandona el rango en cuanto otro
+    proceso publica en ``_best_nonce`` un nonce menor que los que quedan
+    por probar (ya no pueden ganar).
+    
+    Returns:
+        El nonce, o None si no hay ninguno válido (o se canceló)
+    """
+    for base in range(start, stop, CANCEL_CHECK_EVERY):
+        best = _best_nonce.value
+        if best != NO_HIT and best < base:
+            return None
+        nonce = find_nonce(prefix, difficulty, base, min(base + CANCEL_CHECK_EVERY, stop))
+        if nonce is not None:
+            with _best_nonce.get_lock():
+                if _best_nonce.value == NO_HIT or nonce < _best_nonce.value:
+                    _best_nonce.value = nonce
+            return nonce
+    return None
+
+
+class ParallelMiner:
+    """
+    Proof of Work repartido entre varios procesos.
+    
+    El espacio de nonces se divide en tramos de ``chunk_size`` que se
+    reparten en orden entre los procesos del pool. Cuando uno encuentra un
+    nonce válido lo publica en memoria compartida: los tramos posteriores
+    se abandonan y no se envían más, pero los anteriores terminan, así que
+    el resultado es siempre el nonce más bajo, el mismo que encontraría
+    ``Block._mine_block``.
+    
+    El pool se crea al primer uso y se reutiliza entre bloques; ciérralo
+    con ``close()`` o usando el minero como context manager.
+    
+    Ejemplo:
+        with ParallelMiner() as miner:
+            blockchain = Blockchain(difficulty=5, miner=miner)
+    """
+    
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 50_000):
+        """
+        Args:
+            workers: Número de procesos (None = uno por núcleo)
+            chunk_size: Nonces por tarea enviada a un proceso
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size debe ser al menos 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._best_nonce = multiprocessing.Value("q", NO_HIT)
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self._best_nonce,)
+            )
+        return self._pool
+    
+    def search(self, prefix: bytes, difficulty: int, start: int = 0,
+               stop: Optional[int] = None) -> Optional[int]:
+        """
+        Nonce más bajo de [start, stop) que cumple ``difficulty``.
+        
+        Args:
+            prefix: ``Block._hash_prefix()`` codificado en UTF-8
+            difficulty: Ceros hexadecimales requeridos al inicio del hash
+            start: Primer nonce a probar
+            stop: Fin (excluido) del rango; None = sin límite
+            
+        Returns:
+            El nonce, o None si no hay ninguno en el rango
+        """
+        pool = self._get_pool()
+        self._best_nonce.value = NO_HIT
+        starts = iter(range(start, stop, self.chunk_size)) if stop is not None \
+            else itertools.count(start, self.chunk_size)
+        pending = set()
+        found = None
+        
+        while True:
+            # Mantener dos tareas por proceso en cola para que nadie espere
+            while len(pending) < 2 * self.workers:
+                chunk_start = next(starts, None)
+                if chunk_start is None or (found is not None and chunk_start >= found):
+                    break
+                chunk_stop = chunk_start + self.chunk_size
+                if stop is not None:
+                    chunk_stop = min(chunk_stop, stop)
+                pending.add(pool.submit(_search_nonces, prefix, difficulty, chunk_start, chunk_stop))
+            
+            if not pending:
+                return found
+            
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                nonce = future.result()
+                if nonce is not None and (found is None or nonce < found):
+                    found = nonce
+    
+    def mine(self, block: "Block") -> Tuple[int, str]:
+        """
+        Proof of Work de ``block`` (no lo modifica).
+        
+        Returns:
+            (nonce, hash) tal como los calcularía el minado en serie
+        """
+        prefix = block._hash_prefix().encode()
+        nonce = self.search(prefix, block.difficulty)
+        return nonce, hashlib.sha256(prefix + str(nonce).encode()).hexdigest()
+    
+    def close(self) -> None:
+        """Termina los procesos del pool."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def __enter__(self) -> "ParallelMiner":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 💾 ALMACÉN EN DISCO (append-only + mmap)
+# ══════════════════════════════════════════════════════════════════════════════
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class BlockStore:
+    """
+    Almacén de bloques en disco, solo de escritura al final (append-only).
+    
+    Un directorio con tres tipos de fichero, todos leídos con mmap:
+    
+    - ``blocks-NNNNN.seg``: segmentos de ``segment_size`` bytes con los
+      bloques serializados uno tras otro. Un bloque nunca se parte: si no
+      cabe, empieza un segmento nuevo.
+    - ``blocks.idx``: cabecera + un registro de tamaño fijo por altura
+      ``(segmento, offset, longitud, hash)``; el bloque N está en
+      ``cabecera + N * registro``, así que leerlo es O(1).
+    - ``blocks.hix``: tabla hash de sondeo lineal ``hash -> altura + 1``
+      (0 = libre) para buscar por hash sin recorrer la cadena. Se duplica
+      cuando pasa del 50% de ocupación.
+    
+    Abrir solo lee las cabeceras: el coste no depende de la longitud de
+    la cadena. El contador de bloques de ``blocks.idx`` es el punto de
+    confirmación y solo se publica en ``flush()`` (o ``close()``), en este
+    orden: msync de los segmentos, msync de los registros del índice y
+    por último la cabecera con el contador nuevo. Un corte pierde los
+    bloques añadidos desde el último ``flush()``, nunca publica un registro
+    sin su bloque. Por si acaso, al abrir se comprueba el último bloque
+    publicado (legible y con el hash de su registro) y se descarta si no.
+    
+    Un solo proceso debe escribir en el almacén a la vez.
+    """
+    
+    _MAGIA_INDICE = b"NTBLKIX1"
+    _MAGIA_HASHES = b"NTBLKHT1"
+    _CABECERA_INDICE = struct.Struct("<8sqq")  # magia, bloques, segment_size
+    _REGISTRO = struct.Struct("<IQI32s")  # segmento, offset, longitud, hash
+    _CABECERA_HASHES = struct.Struct("<8sqq")  # magia, slots, bloques indexados
+    _SLOT = struct.Struct("<q")  # altura + 1 (0 = libre)
+    _BLOQUE = struct.Struct("<qqHH32s32s")  # index, nonce, difficulty, len(timestamp), previous_hash, hash
+    REGISTROS_INICIALES = 1024
+    SLOTS_INICIALES = 1024
+    
+    def __init__(self, path: str, segment_size: int = SEGMENT_SIZE):
+        """
+        Abre (o crea) el almacén del directorio ``path``.
+        
+        Args:
+            path: Directorio del almacén (se crea si no existe)
+            segment_size: Tamaño de los segmentos si el almacén es nuevo; si
+                ya existe se usa el de su cabecera
+            
+        Raises:
+            ValueError: Si los ficheros existen pero no son de un BlockStore
+        """
+        if segment_size < 1:
+            raise ValueError("segment_size debe ser >= 1")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._segmentos: Dict[int, mmap.mmap] = {}
+        
+        self._fd_indice, self._indice = self._abrir(
+            "blocks.idx", self._CABECERA_INDICE,
+            (self._MAGIA_INDICE, 0, segment_size), self.REGISTROS_INICIALES * self._REGISTRO.size
+        )
+        _, self._bloques, self.segment_size = self._CABECERA_INDICE.unpack_from(self._indice, 0)
+        
+        # Cola publicada sin su bloque en disco (no debería pasar tras flush)
+        if self._bloques and not self._bloque_integro(self._bloques - 1):
+            while self._bloques and not self._bloque_integro(self._bloques - 1):
+                self._bloques -= 1
+            self._publicar()
+        
+        self._fd_hashes, self._hashes = self._abrir(
+            "blocks.hix", self._CABECERA_HASHES,
+            (self._MAGIA_HASHES, self.SLOTS_INICIALES, 0), self.SLOTS_INICIALES * self._SLOT.size
+        )
+        _, self._slots, indexados = self._CABECERA_HASHES.unpack_from(self._hashes, 0)
+        
+        # Bloques confirmados en el índice pero no en la tabla hash (corte a medias)
+        if indexados > self._bloques:
+            self._redimensionar_hashes(self._slots)
+        else:
+            for altura in range(indexados, self._bloques):
+                self._insertar_hash(altura)
+        
+        if self._bloques:
+            segmento, offset, longitud, _ = self._registro(self._bloques - 1)
+            self._fin = (segmento, offset + longitud)
+        else:
+            self._fin = (0, 0)
+    
+    def _abrir(self, nombre: str, cabecera: struct.Struct, valores: tuple, cuerpo: int):
+        """Abre (o crea con ``valores`` en la cabecera) un fichero y lo mapea entero."""
+        ruta = os.path.join(self.path, nombre)
+        fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size == 0:
+            os.ftruncate(fd, cabecera.size + cuerpo)
+            os.pwrite(fd, cabecera.pack(*valores), 0)
+        leida = os.pread(fd, cabecera.size, 0)
+        if len(leida) != cabecera.size or cabecera.unpack(leida)[0] != valores[0]:
+            os.close(fd)
+            raise ValueError(f"{ruta} no es un fichero de BlockStore")
+        return fd, mmap.mmap(fd, os.fstat(fd).st_size)
+    
+    def _crecer(self, fd: int, mapa: mmap.mmap, tamano: int) -> mmap.mmap:
+        """Amplía un fichero mapeado a ``tamano`` bytes y lo vuelve a mapear."""
+        mapa.close()
+        os.ftruncate(fd, tamano)
+        return mmap.mmap(fd, tamano)
+    
+    def __len__(self) -> int:
+        return self._bloques
+    
+    # ── Índice y segmentos ────────────────────────────────────────
+    
+    def _registro(self, altura: int) -> Tuple[int, int, int, bytes]:
+        return self._REGISTRO.unpack_from(
+            self._indice, self._CABECERA_INDICE.size + altura * self._REGISTRO.size
+        )
+    
+    def _ruta_segmento(self, numero: int) -> str:
+        return os.path.join(self.path, f"blocks-{numero:05d}.seg")
+    
+    def _segmento(self, numero: int, tamano: int = 0) -> mmap.mmap:
+        """Mapa del segmento ``numero`` (se crea con ``tamano`` bytes si no existe)."""
+        mapa = self._segmentos.get(numero)
+        if mapa is None:
+            ruta = self._ruta_segmento(numero)
+            fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, tamano)
+                mapa = mmap.mmap(fd, os.fstat(fd).st_size)
+            finally:
+                os.close(fd)  # El mapa sigue siendo válido sin el descriptor
+            self._segmentos[numero] = mapa
+        return mapa
+    
+    def _bloque_integro(self, altura: int) -> bool:
+        """El registro ``altura`` apunta a un bloque completo cuyo hash coincide."""
+        segmento, offset, longitud, hash_bytes = self._registro(altura)
+        ruta = self._ruta_segmento(segmento)
+        if longitud < self._BLOQUE.size or not os.path.exists(ruta) or os.path.getsize(ruta) < offset + longitud:
+            return False
+        try:
+            bloque = self.get(altura)
+        except (ValueError, UnicodeDecodeError, struct.error):
+            return False
+        return bloque.index == altura and bloque.hash == hash_bytes.hex() == bloque._calculate_hash()
+    
+    def _publicar(self) -> None:
+        """Escribe el contador de bloques (punto de confirmación) y lo lleva a disco."""
+        self._CABECERA_INDICE.pack_into(self._indice, 0, self._MAGIA_INDICE, self._bloques, self.segment_size)
+        self._indice.flush(0, self._CABECERA_INDICE.size)
+    
+    # ── Tabla hash ────────────────────────────────────────────────
+    
+    def _sondear(self, hash_bytes: bytes) -> Tuple[int, int]:
+        """Offset del slot de ``hash_bytes`` (o del primer libre) y su altura (-1 si no está)."""
+        mascara = self._slots - 1
+        slot = int.from_bytes(hash_bytes[:8], "little") & mascara
+        while True:
+            offset = self._CABECERA_HASHES.size + slot * self._SLOT.size
+            valor = self._SLOT.unpack_from(self._hashes, offset)[0]
+            if valor == 0 or self._registro(valor - 1)[3] == hash_bytes:
+                return offset, valor - 1
+            slot = (slot + 1) & mascara
+    
+    def _insertar_hash(self, altura: int) -> None:
+        if (altura + 1) * 2 > self._slots:
+            self._redimensionar_hashes(self._slots * 2)
+            return  # La reconstrucción ya incluye ``altura``
+        offset, existente = self._sondear(self._registro(altura)[3])
+        if existente < 0:
+            self._SLOT.pack_into(self._hashes, offset, altura + 1)
+        self._CABECERA_HASHES.pack_into(self._hashes, 0, self._MAGIA_HASHES, self._slots, altura + 1)
+    
+    def _redimensionar_hashes(self, slots: int) -> None:
+        """Reconstruye la tabla hash con ``slots`` slots a partir del índice."""
+        while self._bloques * 2 > slots:
+            slots *= 2
+        self._hashes = self._crecer(self._fd_hashes, self._hashes, self._CABECERA_HASHES.size + slots * self._SLOT.size)
+        self._hashes[self._CABECERA_HASHES.size:] = bytes(slots * self._SLOT.size)
+        self._slots = slots
+        for altura in range(self._bloques):
+            offset, _ = self._sondear(self._registro(altura)[3])
+            self._SLOT.pack_into(self._hashes, offset, altura + 1)
+        self._CABECERA_HASHES.pack_into(self._hashes, 0, self._MAGIA_HASHES, slots, self._bloques)
+    
+    # ── API ───────────────────────────────────────────────────────
+    
+    def append(self, block: Block) -> int:
+        """
+        Añade ``block`` al final del almacén.
+        
+        Returns:
+            Altura del bloque
+            
+        Raises:
+            ValueError: Si ``block.index`` no es la siguiente altura
+        """
+        if block.index != self._bloques:
+            raise ValueError(f"Se esperaba el bloque #{self._bloques}, no el #{block.index}")
+        timestamp = str(block.timestamp).encode()
+        datos = self._BLOQUE.pack(
+            block.index, block.nonce, block.difficulty, len(timestamp),
+            bytes.fromhex(block.previous_hash), bytes.fromhex(block.hash)
+        ) + timestamp + block.data.encode()
+        
+        segmento, offset = self._fin
+        if offset and offset + len(datos) > len(self._segmento(segmento)):
+            segmento, offset = segmento + 1, 0
+        mapa = self._segmento(segmento, max(self.segment_size, len(datos)))
+        mapa[offset:offset + len(datos)] = datos
+        
+        fin_indice = self._CABECERA_INDICE.size + (self._bloques + 1) * self._REGISTRO.size
+        if fin_indice > len(self._indice):
+            self._indice = self._crecer(self._fd_indice, self._indice, 2 * len(self._indice))
+        self._REGISTRO.pack_into(
+            self._indice, fin_indice - self._REGISTRO.size,
+            segmento, offset, len(datos), bytes.fromhex(block.hash)
+        )
+        # El contador en disco no cambia hasta flush(): ver docstring de la clase
+        self._bloques += 1
+        
+        self._fin = (segmento, offset + len(datos))
+        self._insertar_hash(block.index)
+        return block.index
+    
+    def get(self, height: int) -> Block:
+        """
+        Bloque a la altura ``height`` (leído del mmap, sin cargar el resto).
+        
+        Raises:
+            IndexError: Si no hay bloque a esa altura
+        """
+        if not 0 <= height < self._bloques:
+            raise IndexError(f"No hay bloque #{height} (el almacén tiene {self._bloques})")
+        segmento, offset, longitud, _ = self._registro(height)
+        datos = self._segmento(segmento)[offset:offset + longitud]
+        index, nonce, difficulty, largo, previous_hash, hash_ = self._BLOQUE.unpack_from(datos, 0)
+        inicio = self._BLOQUE.size
+        return Block.from_stored(
+            index=index,
+            timestamp=datetime.datetime.fromisoformat(datos[inicio:inicio + largo].decode()),
+            data=datos[inicio + largo:].decode(),
+            previous_hash=previous_hash.hex(),
+            difficulty=difficulty,
+            nonce=nonce,
+            hash=hash_.hex()
+        )
+    
+    def height_of(self, hash: str) -> Optional[int]:
+        """Altura del bloque con ese hash (hex), o None si no está."""
+        try:
+            hash_bytes = bytes.fromhex(hash)
+        except ValueError:
+            return None
+        if len(hash_bytes) != 32:
+            return None
+        altura = self._sondear(hash_bytes)[1]
+        return altura if altura >= 0 else None
+    
+    def get_by_hash(self, hash: str) -> Optional[Block]:
+        """Bloque con ese hash (hex), o None si no está."""
+        altura = self.height_of(hash)
+        return None if altura is None else self.get(altura)
+    
+    def flush(self) -> None:
+        """
+        Lleva a disco todo lo escrito y confirma los bloques añadidos.
+        
+        Orden: segmentos, registros del índice, contador de bloques y por
+        último la tabla hash (que se repara al abrir si quedó atrás).
+        """
+        for mapa in self._segmentos.values():
+            mapa.flush()
+        self._indice.flush()
+        self._publicar()
+        self._hashes.flush()
+    
+    def close(self) -> None:
+        """``flush()`` y cierra los ficheros."""
+        if self._indice.closed:
+            return
+        self.flush()
+        for mapa in self._segmentos.values():
+            mapa.close()
+        self._segmentos.clear()
+        self._indice.close()
+        self._hashes.close()
+        os.close(self._fd_indice)
+        os.close(self._fd_hashes)
+    
+    def __enter__(self) -> "BlockStore":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class StoredChain(Sequence):
+    """
+    Vista de lista sobre un BlockStore (lo que ``Blockchain.chain`` es en disco).
+    
+    Cada acceso lee el bloque del mmap: los objetos devueltos son copias,
+    modificarlos no cambia lo guardado.
+    """
+    
+    def __init__(self, store: BlockStore):
+        self.store = store
+    
+    def __len__(self) -> int:
+        return len(self.store)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.get(i) for i in range(*index.indices(len(self.store)))]
+        if index < 0:
+            index += len(self.store)
+        return self.store.get(index)
+    
+    def append(self, block: Block) -> None:
+        self.store.append(block)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 🔍 VALIDACIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+AUDIT_CHUNK_SIZE = 10_000
+
+# Mensaje de is_valid para cada motivo de fallo
+_INVALID_MESSAGES = {
+    "link": "❌ Cadena rota en bloque #{}",
+    "hash": "❌ Bloque #{} ha sido manipulado",
+    "pow": "❌ Proof of work inválido en bloque #{}",
+}
+
+
+def _first_invalid(previous: Optional[Block], blocks: Iterable[Block]) -> Optional[Tuple[int, str]]:
+    """
+    Primer bloque de ``blocks`` que no pasa la validación.
+    
+    Verifica, en este orden, el enlace con el bloque anterior (el primero
+    se compara con ``previous``; sin él no se comprueba), el hash y el
+    proof of work.
+    
+    Returns:
+        (altura, motivo) con motivo "link", "hash" o "pow"; None si todos son válidos
+    """
+    for block in blocks:
+        if previous is not None and block.previous_hash != previous.hash:
+            return block.index, "link"
+        if block.hash != block._calculate_hash():
+            return block.index, "hash"
+        if not block.hash.startswith("0" * block.difficulty):
+            return block.index, "pow"
+        previous = block
+    return None
+
+
+def _audit_chunk(source: Union[str, List[Block]], start: int, stop: int):
+    """
+    Valida las alturas [start, stop) en un proceso del pool de auditoría.
+    
+    ``source`` es la ruta de un BlockStore (se abre aquí y se lee solo el
+    tramo) o la lista de bloques del tramo. El enlace del primer bloque con
+    el anterior lo comprueba quien reparte los tramos.
+    
+    Returns:
+        (primer fallo o None, previous_hash del primer bloque, hash del último)
+    """
+    if isinstance(source, str):
+        with BlockStore(source) as store:
+            failure = _first_invalid(None, (store.get(h) for h in range(start, stop)))
+            return failure, store.get(start).previous_hash, store.get(stop - 1).hash
+    return _first_invalid(None, source), source[0].previous_hash, source[-1].hash
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # ⛓️ BLOCKCHAIN (Chain)
 # ══════════════════════════════════════════════════════════════════════════════
 
+class BlockList(list):
+    """
+    Lista de bloques (``Blockchain.chain`` en memoria) que recuerda la altura
+    más baja cambiada por algo distinto de añadir al final.
+    
+    Así ``Blockchain.is_valid`` sabe desde dónde tiene que volver a validar
+    si se sustituye, inserta o borra un bloque ya validado.
+    """
+    
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.changed_from: Optional[int] = None  # None = solo se ha añadido al final
+    
+    def _changed(self, height: int) -> None:
+        height = max(height, 0)
+        if self.changed_from is None or height < self.changed_from:
+            self.changed_from = height
+    
+    def _height(self, index) -> int:
+        if isinstance(index, slice):
+            return index.indices(len(self))[0]
+        return index + len(self) if index < 0 else index
+    
+    def __setitem__(self, index, value) -> None:
+        self._changed(self._height(index))
+        super().__setitem__(index, value)
+    
+    def __delitem__(self, index) -> None:
+        self._changed(self._height(index))
+        super().__delitem__(index)
+    
+    def insert(self, index, value) -> None:
+        self._changed(min(self._height(index), len(self)))
+        super().insert(index, value)
+    
+    def pop(self, index=-1):
+        self._changed(self._height(index))
+        return super().pop(index)
+    
+    def remove(self, value) -> None:
+        self._changed(self.index(value))
+        super().remove(value)
+    
+    def clear(self) -> None:
+        self._changed(0)
+        super().clear()
+    
+    def sort(self, *args, **kwargs) -> None:
+        self._changed(0)
+        super().sort(*args, **kwargs)
+    
+    def reverse(self) -> None:
+        self._changed(0)
+        super().reverse()
+    
+    def __imul__(self, n):
+        self._changed(0)
+        return super().__imul__(n)
+
+
 class Blockchain:
     """
     La blockchain completa - una cadena de bloques enlazados.
@@ -147,18 +857,67 @@ class Blockchain:
     - Esto hace la blockchain inmutable
     """
     
-    def __init__(self, difficulty: int = 4):
+    def __init__(
+        self,
+        difficulty: int = 4,
+        miner: Optional[ParallelMiner] = None,
+        store: Optional[BlockStore] = None
+    ):
         """
         Inicializa la blockchain con el bloque génesis.
         
         Args:
             difficulty: Dificultad del Proof of Work (4 = 4 ceros al inicio)
+            miner: Minero multiproceso para los bloques nuevos (None = en serie)
+            store: Almacén en disco (None = cadena solo en memoria); ver ``open``
         """
-        self.chain: List[Block] = []
+        self.chain: Union[BlockList, StoredChain] = StoredChain(store) if store is not None else BlockList()
         self.difficulty = difficulty
+        self.miner = miner
+        self.store = store
+        self._checkpoint: Optional[Tuple[int, Union[BlockList, StoredChain]]] = None  # (altura, cadena)
+        
+        # Crear bloque génesis (el primero de la cadena) si la cadena está vacía
+        if not self.chain:
+            self._create_genesis_block()
+    
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        difficulty: Optional[int] = None,
+        miner: Optional[ParallelMiner] = None
+    ) -> "Blockchain":
+        """
+        Abre (o crea) una blockchain guardada en el directorio ``path``.
         
-        # Crear bloque génesis (el primero de la cadena)
-        self._create_genesis_block()
+        Los bloques no se cargan ni se vuelven a minar: se leen del disco al
+        acceder a ellos, así que abrir cuesta lo mismo sea cual sea la
+        longitud de la cadena. Llama a ``flush()`` (o ``close()``) para
+        asegurar en disco los bloques añadidos. Si el último bloque
+        publicado no se puede leer o su hash no cuadra (corte a medias),
+        se descarta al abrir.
+        
+        Args:
+            path: Directorio del BlockStore
+            difficulty: Dificultad de los bloques nuevos (None = la del
+                último bloque guardado, o 4 si la cadena es nueva)
+            miner: Minero multiproceso para los bloques nuevos
+        """
+        store = BlockStore(path)
+        if difficulty is None:
+            difficulty = store.get(len(store) - 1).difficulty if len(store) else 4
+        return cls(difficulty=difficulty, miner=miner, store=store)
+    
+    def flush(self) -> None:
+        """Asegura en disco los bloques añadidos (sin efecto en memoria)."""
+        if self.store is not None:
+            self.store.flush()
+    
+    def close(self) -> None:
+        """``flush()`` y cierra el almacén."""
+        if self.store is not None:
+            self.store.close()
     
     def _create_genesis_block(self) -> None:
         """
@@ -172,7 +931,8 @@ class Blockchain:
             index=0,
             data="Genesis Block - El Origen de Neo-Tokyo Chain",
             previous_hash="0" * 64,  # Hash ficticio (64 ceros)
-            difficulty=self.difficulty
+            difficulty=self.difficulty,
+            miner=self.miner
         )
         self.chain.append(genesis)
     
@@ -196,13 +956,43 @@ class Blockchain:
             index=len(self.chain),
             data=data,
             previous_hash=latest.hash,
-            difficulty=self.difficulty
+            difficulty=self.difficulty,
+            miner=self.miner
         )
         
         self.chain.append(new_block)
         return new_block
     
-    def is_valid(self) -> bool:
+    def _verified_height(self) -> int:
+        """
+        Altura hasta la que la cadena ya está validada (0 = solo el génesis).
+        
+        Si en la BlockList se sustituyó, insertó o borró un bloque, el
+        checkpoint retrocede hasta justo antes de esa altura. Si se asignó
+        otra lista a ``chain`` no vale nada. Un StoredChain solo crece.
+        """
+        if self._checkpoint is None:
+            return 0
+        height, chain = self._checkpoint
+        if chain is not self.chain:
+            return 0
+        if isinstance(chain, BlockList) and chain.changed_from is not None:
+            height = min(height, chain.changed_from - 1)
+        return max(0, min(height, len(chain) - 1))
+    
+    def _report(self, failure: Optional[Tuple[int, str]]) -> bool:
+        """Imprime el resultado de la validación y avanza el checkpoint si es válida."""
+        if failure is not None:
+            height, reason = failure
+            print(f"{Colors.RED}{_INVALID_MESSAGES[reason].format(height)}{Colors.RESET}")
+            return False
+        self._checkpoint = (len(self.chain) - 1, self.chain)
+        if isinstance(self.chain, BlockList):
+            self.chain.changed_from = None
+        print(f"{Colors.GREEN}✅ Blockchain válida - Ninguna manipulación detectada{Colors.RESET}")
+        return True
+    
+    def is_valid(self, incremental: bool = False) -> bool:
         """
         Valida la integridad de toda la blockchain.
         
@@ -211,31 +1001,67 @@ class Blockchain:
         2. Ningún bloque ha sido modificado (hash válido)
         3. Todos los bloques cumplen la dificultad
         
+        Cada validación recuerda la última altura validada (checkpoint). Con
+        ``incremental=True`` solo se comprueban los bloques nuevos, o desde
+        el primer bloque sustituido, insertado o borrado en ``chain``; los
+        campos de un bloque ya validado modificados en el sitio
+        (``chain[1].data = ...``) no se detectan así.
+        
+        Args:
+            incremental: Validar solo desde el checkpoint (para quien vuelve
+                a validar la misma cadena a menudo, como ``print_chain``)
+            
         Returns:
             True si la cadena es válida, False si hay manipulación
         """
-        for i in range(1, len(self.chain)):
-            current = self.chain[i]
-            previous = self.chain[i - 1]
-            
-            # Verificar que el previous_hash coincide
-            if current.previous_hash != previous.hash:
-                print(f"{Colors.RED}❌ Cadena rota en bloque #{i}{Colors.RESET}")
-                return False
-            
-            # Verificar que el hash es correcto
-            if current.hash != current._calculate_hash():
-                print(f"{Colors.RED}❌ Bloque #{i} ha sido manipulado{Colors.RESET}")
-                return False
-            
-            # Verificar proof of work
-            target = "0" * current.difficulty
-            if not current.hash.startswith(target):
-                print(f"{Colors.RED}❌ Proof of work inválido en bloque #{i}{Colors.RESET}")
-                return False
+        start = self._verified_height() if incremental else 0
+        blocks = (self.chain[i] for i in range(start + 1, len(self.chain)))
+        return self._report(_first_invalid(self.chain[start], blocks))
+    
+    def audit(self, workers: Optional[int] = None, chunk_size: int = AUDIT_CHUNK_SIZE) -> bool:
+        """
+        Validación completa repartida entre varios procesos.
         
-        print(f"{Colors.GREEN}✅ Blockchain válida - Ninguna manipulación detectada{Colors.RESET}")
-        return True
+        La cadena se divide en tramos de ``chunk_size`` bloques; cada proceso
+        recalcula los hashes y el proof of work de su tramo y los enlaces
+        dentro de él. Después se comprueban aquí los enlaces entre tramos.
+        El resultado (y el mensaje) es el mismo que el de ``is_valid()``.
+        
+        Con un BlockStore cada proceso abre el almacén y lee solo su tramo;
+        en memoria, los bloques de cada tramo se envían al proceso.
+        
+        Args:
+            workers: Número de procesos (None = uno por núcleo)
+            chunk_size: Bloques por tarea
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size debe ser al menos 1")
+        length = len(self.chain)
+        ranges = [(start, min(start + chunk_size, length)) for start in range(1, length, chunk_size)]
+        if self.store is not None:
+            self.store.flush()
+        
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            futures = [
+                pool.submit(
+                    _audit_chunk,
+                    self.store.path if self.store is not None else self.chain[start:stop],
+                    start, stop
+                )
+                for start, stop in ranges
+            ]
+            previous_hash = self.chain[0].hash
+            for (start, _), future in zip(ranges, futures):
+                failure, first_previous_hash, last_hash = future.result()
+                if first_previous_hash != previous_hash:
+                    failure = (start, "link")
+                if failure is not None:
+                    for pending in futures:
+                        pending.cancel()
+                    return self._report(failure)
+                previous_hash = last_hash
+        
+        return self._report(None)
     
     def print_chain(self) -> None:
         """Imprime toda la cadena de bloques."""
@@ -251,7 +1077,7 @@ class Blockchain:
         print(f"   • Total de bloques: {len(self.chain)}")
         print(f"   • Dificultad: {self.difficulty} ceros")
         print(f"   • Cadena válida: ", end="")
-        self.is_valid()
+        self.is_valid(incremental=True)
         print()
 
 
@@ -4,13 +4,30 @@
 Generado por: Llama 3.1 (Arquitecto) + Qwen 2.5 Coder (Implementador)
 """
 
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
 from datetime import datetime
+import abc
 import asyncio
+import bisect
+import contextlib
+import hashlib
+import math
+import mmap
+import os
+import socket
+import struct
+import time
+from collections import OrderedDict, deque
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 import threading
 
+try:
+    import fcntl  # POSIX: locks entre procesos para BackendMmap
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
 app = FastAPI(
     title="Rate Limiter API - Neo-Tokyo Dev",
     version="1.0.0",
@@ -24,7 +41,12 @@ app = FastAPI(
     - ✅ Thread-safe con locks
     - ✅ Limpieza automática de tokens expirados
     - ✅ Límite máximo configurable por usuario
+    - ✅ Motor de recarga O(1) opcional (contador + último refill)
+    - ✅ Cuotas compuestas: varias ventanas (segundo/minuto/día) y límites por tenant
+    - ✅ Estado compartido entre workers (mmap o Redis) vía `RATE_LIMITER_BACKEND`
+    - ✅ Middleware ASGI (`RateLimitMiddleware`) para proteger cualquier app FastAPI
     - ✅ Estadísticas en tiempo real
+    - ✅ Métricas Prometheus en `/metrics` (opcionales: `RATE_LIMITER_METRICAS=1`)
     
     ## Generado por Golden Stack
     - 🏛️ Arquitecto: Llama 3.1 (8B)
@@ -51,19 +73,648 @@ app = FastAPI(
 class Usuario(BaseModel):
     """Modelo de usuario para validación."""
     id_usuario: int
+    coste: int = 1  # Tokens que consume la petición
+
+
+class LoteUsuarios(BaseModel):
+    """Lote de comprobaciones: IDs sueltos o pares ``[id_usuario, coste]``."""
+    peticiones: List[Union[int, Tuple[int, int]]]
+
+
+# Máximo de comprobaciones por lote en POST /rate-limited/batch
+MAX_LOTE = 1000
+
+
+def _normalizar_lote(peticiones: Iterable[Union[int, Tuple[int, int]]]) -> List[Tuple[int, int]]:
+    """
+    Convierte un lote en pares ``(usuario_id, coste)``.
+    
+    Raises:
+        ValueError: Si algún coste es menor que 1
+    """
+    lote = []
+    for peticion in peticiones:
+        usuario_id, coste = (peticion, 1) if isinstance(peticion, int) else peticion
+        if coste < 1:
+            raise ValueError(f"Coste inválido para el usuario {usuario_id}: {coste}")
+        lote.append((usuario_id, coste))
+    return lote
+
+
+def _recargar(tokens: float, ultimo: float, capacidad: int, tasa: float, ahora: float) -> float:
+    """Tokens disponibles tras la recarga perezosa (nunca más que la capacidad)."""
+    disponibles = tokens + (ahora - ultimo) * tasa
+    return disponibles if disponibles < capacidad else float(capacidad)
+
+
+class BackendEstado(abc.ABC):
+    """
+    Interfaz de almacenamiento compartido para el estado del motor "recarga".
+    
+    Con varios workers uvicorn cada proceso tendría su propio diccionario y
+    el usuario obtendría N veces su cuota. Un backend guarda
+    ``[tokens, ultimo_refill]`` fuera del proceso y hace la recarga y el
+    consumo de forma atómica.
+    
+    Atributos de clase:
+        nombre: Identificador mostrado en ``get_stats``
+        reloj: Reloj compartido por todos los procesos que usan el backend
+    """
+
+    nombre = "base"
+    reloj = staticmethod(time.monotonic)
+
+    @abc.abstractmethod
+    def tomar(
+        self,
+        usuario_id: int,
+        capacidad: int,
+        tasa: float,
+        ahora: float,
+        umbral: int,
+        coste: int = 1
+    ) -> Tuple[bool, int]:
+        """
+        Recarga y, si ``usados + coste <= umbral``, consume ``coste`` tokens.
+        
+        Returns:
+            Tupla (permitido, tokens usados antes de consumir)
+        """
+
+    def tomar_lote(
+        self,
+        lote: List[Tuple[int, int]],
+        capacidad: int,
+        tasa: float,
+        ahora: float,
+        umbral: int
+    ) -> List[Tuple[bool, int]]:
+        """``tomar`` para cada par ``(usuario_id, coste)``; los backends lo agrupan."""
+        return [self.tomar(u, capacidad, tasa, ahora, umbral, coste) for u, coste in lote]
+
+    @abc.abstractmethod
+    def usados(self, usuario_id: int, capacidad: int, tasa: float, ahora: float) -> int:
+        """Tokens usados del usuario sin consumir (0 si no existe)."""
+
+    @abc.abstractmethod
+    def total_usuarios(self) -> int:
+        """Número de usuarios con estado guardado."""
+
+    def evicciones(self) -> Dict[str, int]:
+        """Contadores de expulsión propios del backend (si los tiene)."""
+        return {}
+
+    def cerrar(self) -> None:
+        """Libera los recursos del backend."""
+
+
+class BackendMmap(BackendEstado):
+    """
+    Backend en memoria compartida (mmap) para workers del mismo host.
+    
+    El fichero es una tabla hash de tamaño fijo con sondeo lineal:
+    cabecera + ``num_slots`` slots de ``(ocupado, usuario_id, tokens, ultimo)``.
+    Un ``flock`` exclusivo serializa a los procesos y un ``threading.Lock``
+    a los hilos de cada proceso (``flock`` es por descriptor, no por hilo).
+    
+    Los slots nunca se liberan, solo se reutilizan: si en la ventana de
+    sondeo no está el usuario, se ocupa un slot libre o uno cuyo bucket ya
+    está lleno (expirado). Así no hacen falta lápidas y la tabla no crece.
+    
+    Si los ``MAX_SONDEO`` slots de la ventana son de usuarios con tokens
+    gastados, la petición del usuario nuevo se rechaza (falla cerrado) y
+    se cuenta en ``rechazos_tabla_llena``: expulsar a uno de ellos le
+    regalaría un bucket lleno. Si el contador crece, hace falta un fichero
+    con más slots.
+    """
+
+    nombre = "mmap"
+    reloj = staticmethod(time.monotonic)  # CLOCK_MONOTONIC es global al host
+
+    _MAGIA = b"NTRLMM01"
+    _CABECERA = struct.Struct("<8sqqqq")  # magia, slots, ocupados, tabla_llena, expiradas
+    _SLOT = struct.Struct("<qqdd")  # ocupado, usuario_id, tokens, ultimo
+    MAX_SONDEO = 16
+
+    def __init__(self, ruta: str, num_slots: int = 1 << 20):
+        """
+        Abre (o crea) el fichero de estado compartido.
+        
+        Args:
+            ruta: Ruta del fichero (p. ej. en /dev/shm para no tocar disco)
+            num_slots: Número de slots si el fichero es nuevo; si ya existe
+                se usa el de su cabecera
+            
+        Raises:
+            RuntimeError: Si la plataforma no tiene fcntl
+            ValueError: Si el fichero existe pero no es un backend válido
+        """
+        if fcntl is None:
+            raise RuntimeError("BackendMmap requiere fcntl (solo POSIX)")
+        if num_slots < 1:
+            raise ValueError("num_slots debe ser >= 1")
+
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, self._CABECERA.size + num_slots * self._SLOT.size)
+                os.pwrite(self._fd, self._CABECERA.pack(self._MAGIA, num_slots, 0, 0, 0), 0)
+                magia = self._MAGIA
+            else:
+                cabecera = os.pread(self._fd, self._CABECERA.size, 0)
+                magia, num_slots = (None, 0)
+                if len(cabecera) == self._CABECERA.size:
+                    magia, num_slots = self._CABECERA.unpack(cabecera)[:2]
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        if magia != self._MAGIA:
+            os.close(self._fd)
+            raise ValueError(f"{ruta} no es un fichero de BackendMmap")
+
+        self.num_slots = num_slots
+        self._mm = mmap.mmap(self._fd, self._CABECERA.size + num_slots * self._SLOT.size)
+
+    @contextlib.contextmanager
+    def _exclusivo(self):
+        """Sección crítica entre hilos y entre procesos."""
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _buscar(self, usuario_id: int, capacidad: int, tasa: float, ahora: float, crear: bool):
+        """
+        Sondea la tabla y devuelve ``(offset, tokens, ultimo)``.
+        
+        ``tokens`` es None si el usuario no estaba. Devuelve None si el
+        usuario no está y no se puede (``crear=False``) o no hay sitio
+        para darlo de alta.
+        """
+        mm, slot, n = self._mm, self._SLOT, self.num_slots
+        inicio = hash(usuario_id) % n
+        libre = expirado = None
+
+        for i in range(min(self.MAX_SONDEO, n)):
+            offset = self._CABECERA.size + ((inicio + i) % n) * slot.size
+            ocupado, clave, tokens, ultimo = slot.unpack_from(mm, offset)
+            if not ocupado:
+                libre = offset
+                break
+            if clave == usuario_id:
+                return offset, tokens, ultimo
+            if expirado is None and _recargar(tokens, ultimo, capacidad, tasa, ahora) >= capacidad:
+                expirado = offset
+
+        if not crear:
+            return None
+        if expirado is not None:
+            self._sumar_cabecera(4)
+            return expirado, None, None
+        if libre is not None:
+            self._sumar_cabecera(2)
+            return libre, None, None
+        self._sumar_cabecera(3)  # Ventana llena de usuarios vivos
+        return None
+
+    def _sumar_cabecera(self, campo: int) -> None:
+        valores = list(self._CABECERA.unpack_from(self._mm, 0))
+        valores[campo] += 1
+        self._CABECERA.pack_into(self._mm, 0, *valores)
+
+    def tomar(self, usuario_id, capacidad, tasa, ahora, umbral, coste=1):
+        """Ver ``BackendEstado.tomar``."""
+        with self._exclusivo():
+            return self._tomar(usuario_id, capacidad, tasa, ahora, umbral, coste)
+
+    def tomar_lote(self, lote, capacidad, tasa, ahora, umbral):
+        """Todo el lote bajo un único ``flock``."""
+        with self._exclusivo():
+            return [self._tomar(u, capacidad, tasa, ahora, umbral, coste) for u, coste in lote]
+
+    def _tomar(self, usuario_id, capacidad, tasa, ahora, umbral, coste):
+        encontrado = self._buscar(usuario_id, capacidad, tasa, ahora, crear=True)
+        if encontrado is None:
+            return False, capacidad  # Sin slot: se rechaza como si no le quedaran tokens
+        offset, tokens, ultimo = encontrado
+        tokens = float(capacidad) if tokens is None else _recargar(
+            tokens, ultimo, capacidad, tasa, ahora
+        )
+        usados = capacidad - int(tokens)
+        permitido = usados + coste <= umbral
+        if permitido:
+            tokens -= coste
+        self._SLOT.pack_into(self._mm, offset, 1, usuario_id, tokens, ahora)
+        return permitido, usados
+
+    def usados(self, usuario_id, capacidad, tasa, ahora):
+        """Ver ``BackendEstado.usados``."""
+        with self._exclusivo():
+            encontrado = self._buscar(usuario_id, capacidad, tasa, ahora, crear=False)
+        if encontrado is None or encontrado[1] is None:
+            return 0
+        _, tokens, ultimo = encontrado
+        return capacidad - int(_recargar(tokens, ultimo, capacidad, tasa, ahora))
+
+    def total_usuarios(self) -> int:
+        """Slots ocupados (incluye usuarios expirados aún no reutilizados)."""
+        return self._CABECERA.unpack_from(self._mm, 0)[2]
+
+    def evicciones(self) -> Dict[str, int]:
+        """
+        Contadores guardados en la cabecera: slots expirados reutilizados y
+        peticiones rechazadas por no haber slot (nunca se expulsa a un
+        usuario vivo, así que ``evicciones_lru`` es siempre 0).
+        """
+        _, _, _, tabla_llena, expiradas = self._CABECERA.unpack_from(self._mm, 0)
+        return {"evicciones_lru": 0, "evicciones_expiradas": expiradas, "rechazos_tabla_llena": tabla_llena}
+
+    def cerrar(self) -> None:
+        """Cierra el mapa y el descriptor (el fichero se conserva)."""
+        self._mm.close()
+        os.close(self._fd)
+
+
+class ErrorRedis(Exception):
+    """Error devuelto por el servidor Redis (respuesta RESP ``-ERR ...``)."""
+
+
+class ClienteRESP:
+    """
+    Cliente mínimo del protocolo Redis (RESP2) sobre un socket TCP.
+    
+    Solo lo necesario para ``BackendRedis``: evita añadir la dependencia
+    ``redis`` y mantiene una única conexión con ``TCP_NODELAY``.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, timeout: float = 1.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lector = self._sock.makefile("rb")
+        self._lock = threading.Lock()
+
+    def comando(self, *args):
+        """Envía un comando y devuelve la respuesta decodificada."""
+        with self._lock:
+            self._sock.sendall(self._codificar(args))
+            return self._leer()
+
+    def pipeline(self, comandos: List[tuple]) -> list:
+        """
+        Envía varios comandos en una sola escritura y lee todas las respuestas.
+        
+        Los errores no se lanzan: se devuelven como instancias de ``ErrorRedis``
+        en su posición, para no dejar respuestas sin leer en el socket.
+        """
+        with self._lock:
+            self._sock.sendall(b"".join(self._codificar(args) for args in comandos))
+            return [self._leer(lanzar=False) for _ in comandos]
+
+    @staticmethod
+    def _codificar(args) -> bytes:
+        partes = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            dato = arg if isinstance(arg, bytes) else str(arg).encode()
+            partes.append(b"$%d\r\n%s\r\n" % (len(dato), dato))
+        return b"".join(partes)
+
+    def _leer(self, lanzar: bool = True):
+        linea = self._lector.readline()
+        if not linea:
+            raise ConnectionError("Conexión cerrada por el servidor Redis")
+        tipo, resto = linea[:1], linea[1:-2]
+        if tipo == b"+":
+            return resto.decode()
+        if tipo == b"-":
+            error = ErrorRedis(resto.decode())
+            if lanzar:
+                raise error
+            return error
+        if tipo == b":":
+            return int(resto)
+        if tipo == b"$":
+            longitud = int(resto)
+            return None if longitud == -1 else self._lector.read(longitud + 2)[:-2]
+        if tipo == b"*":
+            longitud = int(resto)
+            return None if longitud == -1 else [self._leer(lanzar) for _ in range(longitud)]
+        raise ConnectionError(f"Respuesta RESP inválida: {linea!r}")
+
+    def cerrar(self) -> None:
+        self._lector.close()
+        self._sock.close()
+
+
+class BackendRedis(BackendEstado):
+    """
+    Backend sobre cualquier servidor que hable el protocolo Redis.
+    
+    La recarga y el consumo se hacen en un script Lua (``EVALSHA``), así
+    que cada comprobación es un único round trip atómico. Cada clave lleva
+    un ``PEXPIRE`` igual al tiempo de recarga completa: los usuarios
+    inactivos desaparecen solos sin barrido.
+    """
+
+    nombre = "redis"
+    reloj = staticmethod(time.time)  # Compartido entre hosts (vía NTP)
+
+    SCRIPT_TOMAR = """
+local capacidad = tonumber(ARGV[1])
+local tasa = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local umbral = tonumber(ARGV[4])
+local coste = tonumber(ARGV[5])
+local ttl_ms = tonumber(ARGV[6])
+local estado = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(estado[1])
+if tokens == nil then
+    tokens = capacidad
+else
+    tokens = math.min(capacidad, tokens + (ahora - tonumber(estado[2])) * tasa)
+end
+local usados = capacidad - math.floor(tokens)
+local permitido = 0
+if usados + coste <= umbral then
+    permitido = 1
+    tokens = tokens - coste
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ttl_ms)
+return {permitido, usados}
+"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        prefijo: str = "rl:",
+        timeout: float = 1.0
+    ):
+        """
+        Conecta con el servidor y registra el script.
+        
+        Args:
+            host: Host del servidor Redis
+            port: Puerto del servidor Redis
+            prefijo: Prefijo de las claves por usuario
+            timeout: Timeout de conexión y lectura en segundos
+        """
+        self.prefijo = prefijo
+        self._cliente = ClienteRESP(host, port, timeout)
+        self._sha = self._cargar_script()
+
+    def _cargar_script(self) -> bytes:
+        return self._cliente.comando("SCRIPT", "LOAD", self.SCRIPT_TOMAR)
+
+    def _args(self, usuario_id, capacidad, tasa, ahora, umbral, coste) -> tuple:
+        ttl_ms = max(1, math.ceil(capacidad / tasa * 1000)) if tasa > 0 else 1
+        return (
+            f"{self.prefijo}{usuario_id}", capacidad, repr(tasa), repr(ahora),
+            umbral, coste, ttl_ms
+        )
+
+    def tomar(self, usuario_id, capacidad, tasa, ahora, umbral, coste=1):
+        """Ver ``BackendEstado.tomar``."""
+        return self.tomar_lote([(usuario_id, coste)], capacidad, tasa, ahora, umbral)[0]
+
+    def tomar_lote(self, lote, capacidad, tasa, ahora, umbral):
+        """Todo el lote en un único round trip (pipeline de ``EVALSHA``)."""
+        args = [self._args(u, capacidad, tasa, ahora, umbral, coste) for u, coste in lote]
+        respuestas = self._cliente.pipeline([("EVALSHA", self._sha, 1) + a for a in args])
+
+        pendientes = [
+            i for i, r in enumerate(respuestas)
+            if isinstance(r, ErrorRedis) and str(r).startswith("NOSCRIPT")
+        ]
+        if pendientes:
+            # El servidor se reinició y perdió la caché de scripts
+            self._sha = self._cargar_script()
+            reintentos = self._cliente.pipeline(
+                [("EVALSHA", self._sha, 1) + args[i] for i in pendientes]
+            )
+            for i, respuesta in zip(pendientes, reintentos):
+                respuestas[i] = respuesta
+
+        for respuesta in respuestas:
+            if isinstance(respuesta, ErrorRedis):
+                raise respuesta
+        return [(bool(permitido), usados) for permitido, usados in respuestas]
+
+    def usados(self, usuario_id, capacidad, tasa, ahora):
+        """Ver ``BackendEstado.usados``."""
+        tokens, ultimo = self._cliente.comando("HMGET", f"{self.prefijo}{usuario_id}", "t", "u")
+        if tokens is None:
+            return 0
+        return capacidad - int(_recargar(float(tokens), float(ultimo), capacidad, tasa, ahora))
+
+    def total_usuarios(self) -> int:
+        """Cuenta las claves con ``SCAN`` (O(N): solo para monitoring)."""
+        cursor, total = b"0", 0
+        while True:
+            cursor, claves = self._cliente.comando(
+                "SCAN", cursor, "MATCH", f"{self.prefijo}*", "COUNT", 1000
+            )
+            total += len(claves)
+            if cursor == b"0":
+                return total
+
+    def cerrar(self) -> None:
+        self._cliente.cerrar()
+
+
+def crear_backend(url: str) -> Optional[BackendEstado]:
+    """
+    Construye un backend desde una URL de configuración.
+    
+    Formatos:
+        ``memoria`` (o vacío): estado en el propio proceso (None)
+        ``mmap:///dev/shm/rate_limiter.bin``: memoria compartida del host
+        ``redis://host:puerto``: servidor Redis (o compatible)
+        
+    Raises:
+        ValueError: Si el esquema no es reconocido
+    """
+    if not url or url == "memoria":
+        return None
+    if url.startswith("mmap://"):
+        return BackendMmap(url[len("mmap://"):])
+    if url.startswith("redis://"):
+        host, _, puerto = url[len("redis://"):].rstrip("/").partition(":")
+        return BackendRedis(host or "127.0.0.1", int(puerto or 6379))
+    raise ValueError(f"Backend desconocido: {url!r}")
+
+
+# ══════════════════════════════════════════════════════════════
+# MÉTRICAS (CONTADORES + HISTOGRAMAS DE CUBETAS FIJAS)
+# ══════════════════════════════════════════════════════════════
+
+class Histograma:
+    """
+    Histograma de cubetas fijas al estilo Prometheus.
+    
+    Las cubetas se reservan al construirlo: ``observar`` solo hace un
+    ``bisect`` y suma enteros, sin crear objetos por petición.
+    """
+
+    # Segundos: de 1 µs a 100 ms, donde cae una comprobación o una espera de lock
+    LIMITES_SEGUNDOS = (
+        1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5,
+        1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 1e-1
+    )
+
+    def __init__(self, limites: Tuple[float, ...] = LIMITES_SEGUNDOS):
+        self.limites = tuple(limites)
+        self.cubetas = [0] * (len(self.limites) + 1)  # La última es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor: float) -> None:
+        self.cubetas[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cuenta += 1
+
+    def sumar(self, otro: "Histograma") -> None:
+        """Acumula otro histograma con los mismos límites (agregación de shards)."""
+        for indice, valor in enumerate(otro.cubetas):
+            self.cubetas[indice] += valor
+        self.suma += otro.suma
+        self.cuenta += otro.cuenta
+
+    def lineas(self, nombre: str) -> List[str]:
+        """Serie ``_bucket`` acumulada, ``_sum`` y ``_count`` en formato texto."""
+        lineas, acumulado = [], 0
+        for limite, valor in zip(self.limites + (float("inf"),), self.cubetas):
+            acumulado += valor
+            etiqueta = "+Inf" if limite == float("inf") else repr(limite)
+            lineas.append(f'{nombre}_bucket{{le="{etiqueta}"}} {acumulado}')
+        lineas.append(f"{nombre}_sum {self.suma!r}")
+        lineas.append(f"{nombre}_count {self.cuenta}")
+        return lineas
+
+
+class MetricasLimitador:
+    """
+    Contadores e histogramas del camino caliente de un ``TokenBucket``.
+    
+    - ``resultados``: comprobaciones por resultado (permitida o motivo de rechazo)
+    - ``comprobacion``: latencia de la decisión, ya dentro del lock
+    - ``espera_lock``: tiempo esperando el lock del bucket (None si el
+      bucket no toma lock: ``AsyncTokenBucket`` o backend compartido)
+    
+    Los usuarios activos y las expulsiones se leen de ``get_stats`` al exponer.
+    """
+
+    RESULTADOS = ("permitida", "capacidad", "max_tokens_user")
+
+    def __init__(self):
+        self.resultados: Dict[str, int] = dict.fromkeys(self.RESULTADOS, 0)
+        self.comprobacion = Histograma()
+        self.espera_lock: Optional[Histograma] = Histograma()
+        self.lock = threading.Lock()  # Solo para el camino con backend (sin lock del bucket)
+
+    def sumar(self, otra: "MetricasLimitador") -> None:
+        for resultado, cuenta in otra.resultados.items():
+            self.resultados[resultado] += cuenta
+        self.comprobacion.sumar(otra.comprobacion)
+        if self.espera_lock is not None and otra.espera_lock is not None:
+            self.espera_lock.sumar(otra.espera_lock)
+
+    def exponer(self, stats: Dict) -> str:
+        """Formato de exposición de texto de Prometheus (0.0.4)."""
+        lineas = [
+            "# HELP rate_limiter_peticiones_total Comprobaciones por resultado.",
+            "# TYPE rate_limiter_peticiones_total counter",
+        ]
+        for resultado, cuenta in self.resultados.items():
+            lineas.append(f'rate_limiter_peticiones_total{{resultado="{resultado}"}} {cuenta}')
+        lineas += [
+            "# HELP rate_limiter_comprobacion_segundos Latencia de cada comprobación.",
+            "# TYPE rate_limiter_comprobacion_segundos histogram",
+            *self.comprobacion.lineas("rate_limiter_comprobacion_segundos"),
+        ]
+        if self.espera_lock is not None:
+            lineas += [
+                "# HELP rate_limiter_espera_lock_segundos Tiempo esperando el lock del bucket.",
+                "# TYPE rate_limiter_espera_lock_segundos histogram",
+                *self.espera_lock.lineas("rate_limiter_espera_lock_segundos"),
+            ]
+        lineas += [
+            "# HELP rate_limiter_usuarios_activos Usuarios con estado en memoria o backend.",
+            "# TYPE rate_limiter_usuarios_activos gauge",
+            f"rate_limiter_usuarios_activos {stats['total_users']}",
+            "# HELP rate_limiter_evicciones_total Usuarios expulsados por tipo.",
+            "# TYPE rate_limiter_evicciones_total counter",
+            f'rate_limiter_evicciones_total{{tipo="expirada"}} {stats["evicciones_expiradas"]}',
+            f'rate_limiter_evicciones_total{{tipo="lru"}} {stats["evicciones_lru"]}',
+        ]
+        if "rechazos_tabla_llena" in stats:
+            lineas += [
+                "# HELP rate_limiter_rechazos_tabla_llena_total Peticiones rechazadas por no haber slot en el backend.",
+                "# TYPE rate_limiter_rechazos_tabla_llena_total counter",
+                f"rate_limiter_rechazos_tabla_llena_total {stats['rechazos_tabla_llena']}",
+            ]
+        return "\n".join(lineas) + "\n"
+
+
+class _LockMedido:
+    """Envuelve un lock y registra cuánto se espera para adquirirlo."""
+
+    __slots__ = ("_lock", "_histograma")
+
+    def __init__(self, lock, histograma: Histograma):
+        self._lock = lock
+        self._histograma = histograma
+
+    def __enter__(self):
+        inicio = time.perf_counter()
+        self._lock.acquire()
+        # Ya con el lock: el histograma queda protegido por él
+        self._histograma.observar(time.perf_counter() - inicio)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
 
 
 class TokenBucket:
     """
     Implementación de Rate Limiter usando el algoritmo Token Bucket.
-    Thread-safe y eficiente con complejidad O(n).
+    Thread-safe, con dos motores seleccionables al construir el bucket:
+
+    - ``"ventana"`` (por defecto): log deslizante con un timestamp por
+      petición. Exacto por ventana, pero O(n) en tiempo y memoria por usuario.
+    - ``"recarga"``: por usuario solo guarda ``[tokens_disponibles, ultimo]``
+      y recarga de forma perezosa con un reloj monotónico a razón de
+      ``capacidad / tiempo_token`` tokens por segundo. O(1) en tiempo y memoria.
+
+    Memoria acotada: los usuarios se guardan en un ``OrderedDict`` ordenado
+    por último acceso (LRU). Cada petición revisa ``BARRIDO_POR_PETICION``
+    usuarios de un anillo de barrido (O(1)) y expulsa los expirados; si se
+    fija ``max_usuarios``, al llegar al tope se expulsa al menos reciente.
+
+    Métricas: con ``metricas=True`` se cuentan resultados y se miden la
+    latencia de cada comprobación y la espera del lock. Con ``False`` (por
+    defecto) no se instala nada y el camino caliente no cambia.
     """
+
+    MOTORES = ("ventana", "recarga")
+    BARRIDO_POR_PETICION = 2
     
     def __init__(
         self, 
         capacidad: int, 
         tiempo_token: float, 
-        max_tokens_user: int = None
+        max_tokens_user: int = None,
+        motor: str = "ventana",
+        max_usuarios: Optional[int] = None,
+        backend: Optional[BackendEstado] = None,
+        metricas: bool = False
     ):
         """
         Inicializa un objeto TokenBucket.
@@ -72,83 +723,298 @@ class TokenBucket:
             capacidad: Capacidad máxima de tokens por usuario
             tiempo_token: Tiempo en segundos para regenerar un token
             max_tokens_user: Límite máximo absoluto de tokens por usuario (opcional)
+            motor: "ventana" (log deslizante) o "recarga" (contador O(1))
+            max_usuarios: Tope de usuarios en memoria; expulsa por LRU (opcional)
+            backend: Estado compartido entre procesos (solo motor "recarga")
+            metricas: Instrumenta el camino caliente (ver ``exponer_metricas``)
+            
+        Raises:
+            ValueError: Si el motor no existe o la configuración es inválida
         """
+        if motor not in self.MOTORES:
+            raise ValueError(f"Motor desconocido: {motor!r}. Opciones: {self.MOTORES}")
+        if motor == "recarga" and tiempo_token <= 0:
+            raise ValueError("El motor 'recarga' requiere tiempo_token > 0")
+        if max_usuarios is not None and max_usuarios < 1:
+            raise ValueError("max_usuarios debe ser >= 1")
+        if backend is not None and motor != "recarga":
+            raise ValueError("Los backends compartidos requieren motor='recarga'")
+
         self.capacidad = capacidad
         self.tiempo_token = tiempo_token
-        self.token_timestamps: Dict[int, List[Tuple[float, float]]] = {}
+        self.token_timestamps: Dict[int, List[Tuple[float, float]]] = OrderedDict()
         self.max_tokens_user = max_tokens_user
+        self.motor = motor
+        self.max_usuarios = max_usuarios
         self.lock = threading.Lock()  # Thread-safety
+
+        # Motor "recarga": usuario -> [tokens_disponibles, ultimo_refill]
+        self.token_estado: Dict[int, List[float]] = OrderedDict()
+        self.tasa_recarga = capacidad / tiempo_token if tiempo_token > 0 else 0.0
+        self.backend = backend
+
+        # Anillo de barrido: (usuario, estado) en orden de alta; ver _barrer
+        self._anillo_barrido: deque = deque()
+
+        # Contadores de expulsión (expuestos en get_stats)
+        self.evicciones_expiradas = 0
+        self.evicciones_lru = 0
+
+        if motor == "recarga":
+            self._usuarios = self.token_estado
+            self._reloj = self._reloj_monotonico
+            self._usados = self._usados_recarga
+            self._consumir = self._consumir_recarga
+            self._espera = self._espera_recarga
+            self._expirado = self._expirado_recarga
+        else:
+            self._usuarios = self.token_timestamps
+            self._reloj = self._reloj_pared
+            self._usados = self._usados_ventana
+            self._consumir = self._consumir_ventana
+            self._espera = self._espera_ventana
+            self._expirado = self._expirado_ventana
+
+        if backend is not None:
+            self._reloj = backend.reloj
+
+        # Métricas: se instalan como atributos de instancia, igual que los
+        # motores, para que desactivadas no cuesten ni una comprobación
+        self.metricas: Optional[MetricasLimitador] = None
+        if metricas:
+            self.metricas = MetricasLimitador()
+            if backend is None:
+                self.lock = _LockMedido(self.lock, self.metricas.espera_lock)
+            else:
+                self.metricas.espera_lock = None  # El backend no pasa por self.lock
+            self._evaluar_sin_medir = self._evaluar
+            self._evaluar_backend_sin_medir = self._evaluar_backend
+            self._evaluar = self._evaluar_medido
+            self._evaluar_backend = self._evaluar_backend_medido
     
-    async def tomar_token(self, usuario_id: int) -> bool:
+    async def tomar_token(self, usuario_id: int, coste: int = 1) -> bool:
         """
         Intenta tomar un token del bucket para el usuario especificado.
         
         Args:
             usuario_id: ID del usuario que solicita el token
+            coste: Tokens que consume la petición (peticiones ponderadas)
             
         Returns:
             True si se pudo tomar el token, False en caso contrario
             
         Raises:
             HTTPException: Si se excede el límite máximo de tokens por usuario
+            ValueError: Si coste < 1
         """
-        with self.lock:  # Thread-safe
-            ahora = datetime.now().timestamp()
+        return self.tomar_token_sync(usuario_id, coste)
 
-            # Inicializar la lista de tokens para el usuario si no existe
-            if usuario_id not in self.token_timestamps:
-                self.token_timestamps[usuario_id] = []
+    def tomar_token_sync(self, usuario_id: int, coste: int = 1) -> bool:
+        """
+        Versión síncrona de ``tomar_token`` para llamadores en hilos
+        (endpoints ``def`` de FastAPI, workers de un thread pool).
+        
+        Args:
+            usuario_id: ID del usuario que solicita el token
+            coste: Tokens que consume la petición (peticiones ponderadas)
+            
+        Returns:
+            True si se pudo tomar el token, False en caso contrario
+        """
+        if coste < 1:
+            raise ValueError(f"Coste inválido: {coste}")
+        if self.backend is not None:
+            motivo, _ = self._evaluar_backend([(usuario_id, coste)], self._reloj())[0]
+        else:
+            with self.lock:  # Thread-safe
+                motivo, _ = self._evaluar(usuario_id, self._reloj(), coste)
+        return self._resolver(usuario_id, motivo)
 
-            # Limpiar los tokens expirados
-            self.token_timestamps[usuario_id] = [
-                (token, timestamp)
-                for token, timestamp in self.token_timestamps[usuario_id]
-                if ahora - timestamp < self.tiempo_token
-            ]
+    def tomar_tokens_bulk(self, peticiones: Iterable[Union[int, Tuple[int, int]]]) -> List[Dict]:
+        """
+        Comprueba un lote de usuarios en una sola pasada por el lock.
+        
+        A diferencia de ``tomar_token`` nunca lanza 429: el límite absoluto
+        se informa por usuario en ``motivo``, sin abortar el resto del lote.
+        
+        Args:
+            peticiones: IDs de usuario o pares ``(usuario_id, coste)``
+            
+        Returns:
+            Por cada petición, en el mismo orden: ``usuario_id``, ``coste``,
+            ``permitido``, ``motivo`` (None, "capacidad" o "max_tokens_user")
+            y ``tokens_restantes``
+            
+        Raises:
+            ValueError: Si algún coste es menor que 1
+        """
+        lote = _normalizar_lote(peticiones)
+        if self.backend is not None:
+            evaluaciones = self._evaluar_backend(lote, self._reloj())
+        else:
+            with self.lock:  # Un único lock para todo el lote
+                ahora = self._reloj()
+                evaluaciones = [self._evaluar(u, ahora, coste) for u, coste in lote]
 
-            # Calcular tokens disponibles del usuario
-            user_tokens = len(self.token_timestamps[usuario_id])
+        resultados = []
+        for (usuario_id, coste), (motivo, usados) in zip(lote, evaluaciones):
+            if motivo is None:
+                usados += coste
+            resultados.append({
+                "usuario_id": usuario_id,
+                "coste": coste,
+                "permitido": motivo is None,
+                "motivo": motivo,
+                "tokens_restantes": self.capacidad - usados
+            })
+        return resultados
 
-            # Verificar límite máximo por usuario
-            if self.max_tokens_user is not None and user_tokens >= self.max_tokens_user:
-                raise HTTPException(
-                    status_code=429, 
-                    detail=f"Too Many Requests for user {usuario_id}. Max: {self.max_tokens_user}"
-                )
+    def _umbral(self) -> int:
+        """Tokens usables por ventana: ``min(capacidad, max_tokens_user)``."""
+        if self.max_tokens_user is not None and self.max_tokens_user < self.capacidad:
+            return self.max_tokens_user
+        return self.capacidad
 
-            # Verificar capacidad del bucket
-            if user_tokens >= self.capacidad:
-                return False
+    def _resolver(self, usuario_id: int, motivo: Optional[str]) -> bool:
+        """Traduce el motivo de rechazo: 429 absoluto o False por capacidad."""
+        if motivo == "max_tokens_user":
+            raise HTTPException(
+                status_code=429, 
+                detail=f"Too Many Requests for user {usuario_id}. Max: {self.max_tokens_user}"
+            )
+        return motivo is None
 
-            # Tomar un token
-            self.token_timestamps[usuario_id].append((1.0, ahora))
+    def _evaluar_backend(
+        self,
+        lote: List[Tuple[int, int]],
+        ahora: float
+    ) -> List[Tuple[Optional[str], int]]:
+        """
+        Igual que ``_evaluar`` pero con el estado en el backend compartido.
+        
+        El backend solo consume si ``usados + coste <= min(capacidad,
+        max_tokens_user)``; al rechazar se distingue el motivo aquí.
+        """
+        respuestas = self.backend.tomar_lote(lote, self.capacidad, self.tasa_recarga, ahora, self._umbral())
+
+        evaluaciones = []
+        for (_, coste), (permitido, usados) in zip(lote, respuestas):
+            if permitido:
+                motivo = None
+            elif self.max_tokens_user is not None and usados + coste > self.max_tokens_user:
+                motivo = "max_tokens_user"
+            else:
+                motivo = "capacidad"
+            evaluaciones.append((motivo, usados))
+        return evaluaciones
+
+    def _evaluar_medido(self, usuario_id: int, ahora: float, coste: int) -> Tuple[Optional[str], int]:
+        """``_evaluar`` instrumentado; el llamador tiene el lock."""
+        inicio = time.perf_counter()
+        motivo, usados = self._evaluar_sin_medir(usuario_id, ahora, coste)
+        metricas = self.metricas
+        metricas.comprobacion.observar(time.perf_counter() - inicio)
+        metricas.resultados[motivo or "permitida"] += 1
+        return motivo, usados
 
-            return True
+    def _evaluar_backend_medido(
+        self,
+        lote: List[Tuple[int, int]],
+        ahora: float
+    ) -> List[Tuple[Optional[str], int]]:
+        """``_evaluar_backend`` instrumentado: el lote se mide como una comprobación."""
+        inicio = time.perf_counter()
+        evaluaciones = self._evaluar_backend_sin_medir(lote, ahora)
+        duracion = time.perf_counter() - inicio
+        metricas = self.metricas
+        with metricas.lock:
+            metricas.comprobacion.observar(duracion)
+            for motivo, _ in evaluaciones:
+                metricas.resultados[motivo or "permitida"] += 1
+        return evaluaciones
+
+    def exponer_metricas(self) -> str:
+        """
+        Métricas en formato de texto de Prometheus.
+        
+        Raises:
+            RuntimeError: Si el bucket se creó con ``metricas=False``
+        """
+        if self.metricas is None:
+            raise RuntimeError("Métricas desactivadas en este limitador")
+        stats = self.get_stats()
+        with self._lock_sin_medir():  # Instantánea coherente de los histogramas
+            return self.metricas.exponer(stats)
+
+    def _lock_sin_medir(self):
+        """``self.lock`` sin instrumentar: leer las métricas no suma esperas al histograma."""
+        lock = self.lock
+        return lock._lock if isinstance(lock, _LockMedido) else lock
+
+    def _intentar(self, usuario_id: int, ahora: float, coste: int = 1) -> bool:
+        """Núcleo de ``tomar_token``; el llamador debe tener el lock."""
+        motivo, _ = self._evaluar(usuario_id, ahora, coste)
+        return self._resolver(usuario_id, motivo)
+
+    def _evaluar(self, usuario_id: int, ahora: float, coste: int) -> Tuple[Optional[str], int]:
+        """
+        Comprueba y, si procede, consume ``coste`` tokens.
+        
+        Returns:
+            Tupla (motivo de rechazo o None si se permitió, tokens usados antes)
+        """
+        self._barrer(ahora, self.BARRIDO_POR_PETICION)
+        user_tokens = self._usados(usuario_id, ahora, crear=True)
+
+        # Verificar límite máximo por usuario
+        if self.max_tokens_user is not None and user_tokens + coste > self.max_tokens_user:
+            return "max_tokens_user", user_tokens
+
+        # Verificar capacidad del bucket
+        if user_tokens + coste > self.capacidad:
+            return "capacidad", user_tokens
+
+        # Tomar los tokens
+        self._consumir(usuario_id, ahora, coste)
+
+        return None, user_tokens
     
     def get_tokens(self, usuario_id: int) -> int:
         """
-        Devuelve la cantidad de tokens disponibles del usuario.
+        Devuelve la cantidad de tokens usados del usuario en la ventana actual.
         
         Args:
             usuario_id: ID del usuario
             
         Returns:
-            Cantidad de tokens disponibles
+            Cantidad de tokens usados (0 si el usuario no existe)
         """
+        if self.backend is not None:
+            return self.backend.usados(usuario_id, self.capacidad, self.tasa_recarga, self._reloj())
         with self.lock:  # Thread-safe
-            ahora = datetime.now().timestamp()
-
-            if usuario_id not in self.token_timestamps:
-                return 0
+            return self._usados(usuario_id, self._reloj(), crear=False)
 
-            # Limpiar tokens expirados
-            self.token_timestamps[usuario_id] = [
-                (token, timestamp)
-                for token, timestamp in self.token_timestamps[usuario_id]
-                if ahora - timestamp < self.tiempo_token
-            ]
-
-            return len(self.token_timestamps[usuario_id])
+    def limite_vinculante(self, usuario_id: int) -> Dict:
+        """
+        Límite que antes frenará al usuario: la capacidad del bucket o
+        ``max_tokens_user`` si es menor.
+        
+        Returns:
+            ``nombre``, ``ambito``, ``capacidad``, ``periodo``,
+            ``tokens_usados`` y ``tokens_disponibles`` de ese límite
+        """
+        usados = self.get_tokens(usuario_id)
+        nombre, capacidad = "capacidad", self.capacidad
+        if self.max_tokens_user is not None and self.max_tokens_user < capacidad:
+            nombre, capacidad = "max_tokens_user", self.max_tokens_user
+        return {
+            "nombre": nombre,
+            "ambito": "usuario",
+            "capacidad": capacidad,
+            "periodo": self.tiempo_token,
+            "tokens_usados": usados,
+            "tokens_disponibles": max(0, capacidad - usados)
+        }
     
     def get_stats(self) -> Dict:
         """
@@ -157,22 +1023,878 @@ class TokenBucket:
         Returns:
             Diccionario con estadísticas
         """
+        if self.backend is not None:
+            total_users = self.backend.total_usuarios()
+        else:
+            with self._lock_sin_medir():  # Monitorización, no camino caliente
+                total_users = len(self._usuarios)
+        stats = {
+            "total_users": total_users,
+            "capacidad": self.capacidad,
+            "tiempo_token": self.tiempo_token,
+            "max_tokens_user": self.max_tokens_user,
+            "motor": self.motor,
+            "backend": "memoria" if self.backend is None else self.backend.nombre,
+            "max_usuarios": self.max_usuarios,
+            "evicciones_expiradas": self.evicciones_expiradas,
+            "evicciones_lru": self.evicciones_lru
+        }
+        if self.backend is not None:
+            stats.update(self.backend.evicciones())
+        return stats
+
+    def comprobar(self, usuario_id: int, coste: int = 1) -> Tuple[bool, int, float]:
+        """
+        Toma ``coste`` tokens y devuelve todo lo que necesita una respuesta HTTP.
+        
+        Pensado para el middleware: nunca lanza 429 y calcula la espera
+        hasta el siguiente token en la misma pasada por el lock.
+        
+        Returns:
+            Tupla (permitido, tokens restantes, segundos hasta poder reintentar)
+        """
+        if self.backend is not None:
+            motivo, usados = self._evaluar_backend([(usuario_id, coste)], self._reloj())[0]
+            espera = 0.0
+            if motivo is not None:
+                faltan = usados + coste - self._umbral()
+                espera = faltan / self.tasa_recarga if self.tasa_recarga > 0 else float("inf")
+        else:
+            with self.lock:  # Thread-safe
+                ahora = self._reloj()
+                motivo, usados = self._evaluar(usuario_id, ahora, coste)
+                espera = 0.0 if motivo is None else self._espera(usuario_id, ahora, coste)
+
+        if motivo is None:
+            usados += coste
+        return motivo is None, max(0, self.capacidad - usados), max(0.0, espera)
+
+    def barrer_expirados(self, limite: Optional[int] = None) -> int:
+        """
+        Expulsa usuarios inactivos cuyo estado ya equivale a uno nuevo.
+        
+        Pensado para un barrido periódico en segundo plano además del
+        barrido incremental que ya hace cada petición.
+        
+        Args:
+            limite: Máximo de usuarios a revisar (None = sin límite)
+            
+        Returns:
+            Número de usuarios expulsados (siempre 0 con backend compartido,
+            que caduca el estado por su cuenta)
+        """
+        if self.backend is not None:
+            return 0
         with self.lock:
-            return {
-                "total_users": len(self.token_timestamps),
-                "capacidad": self.capacidad,
-                "tiempo_token": self.tiempo_token,
-                "max_tokens_user": self.max_tokens_user
-            }
+            return self._barrer(self._reloj(), limite)
+
+    # ── Memoria acotada (LRU + barrido de expirados) ───────────────────
+
+    def _barrer(self, ahora: float, limite: Optional[int]) -> int:
+        """Revisa ``limite`` usuarios (None = todos) y expulsa los expirados."""
+        expulsados = self._barrer_anillo(self._usuarios, self._anillo_barrido, self._expirado, ahora, limite)
+        self.evicciones_expiradas += expulsados
+        return expulsados
+
+    @staticmethod
+    def _barrer_anillo(claves: Dict, anillo: deque, expirado, ahora: float, limite: Optional[int]) -> int:
+        """
+        Barrido incremental de ``claves`` con un anillo ``(clave, estado)``.
+        
+        Por qué no la cabeza del LRU: el usuario de acceso más antiguo puede
+        tardar mucho en expirar (gastó toda su cuota) y detendría el barrido
+        aunque detrás haya miles de expirados. El anillo se recorre en
+        círculo sin tocar el orden LRU: cada entrada viva vuelve al final y
+        las de claves ya expulsadas o dadas de alta de nuevo se descartan.
+        
+        Returns:
+            Número de claves expulsadas
+        """
+        if limite is None:
+            # Pasada completa: se recorre el diccionario y se rehace el anillo
+            expiradas = [clave for clave, estado in claves.items() if expirado(estado, ahora)]
+            for clave in expiradas:
+                del claves[clave]
+            anillo.clear()
+            anillo.extend(claves.items())
+            return len(expiradas)
+
+        expulsados = 0
+        for _ in range(min(limite, len(anillo))):
+            clave, estado = anillo.popleft()
+            if claves.get(clave) is not estado:
+                continue
+            if expirado(estado, ahora):
+                del claves[clave]
+                expulsados += 1
+            else:
+                anillo.append((clave, estado))
+        return expulsados
+
+    def _registrar(self, usuario_id: int, estado) -> None:
+        """Da de alta un usuario respetando ``max_usuarios`` (expulsión LRU)."""
+        usuarios = self._usuarios
+        if self.max_usuarios is not None and len(usuarios) >= self.max_usuarios:
+            usuarios.popitem(last=False)
+            self.evicciones_lru += 1
+        usuarios[usuario_id] = estado
+        self._anillo_barrido.append((usuario_id, estado))
+
+    # ── Relojes ────────────────────────────────────────────────────────
+    # El motor "ventana" usa el reloj de pared (compatible con timestamps
+    # guardados); el motor "recarga" usa un reloj monotónico, inmune a
+    # saltos de NTP o cambios de hora del sistema.
+
+    @staticmethod
+    def _reloj_pared() -> float:
+        return datetime.now().timestamp()
+
+    @staticmethod
+    def _reloj_monotonico() -> float:
+        return time.monotonic()
+
+    # ── Motor "ventana" (log deslizante) ───────────────────────────────
+
+    def _usados_ventana(self, usuario_id: int, ahora: float, crear: bool) -> int:
+        """Limpia los timestamps expirados y devuelve los tokens usados."""
+        timestamps = self.token_timestamps.get(usuario_id)
+        if timestamps is None:
+            if crear:
+                self._registrar(usuario_id, [])
+            return 0
+        if crear:
+            self.token_timestamps.move_to_end(usuario_id)
+
+        # Limpiar los tokens expirados
+        vigentes = [
+            (token, timestamp)
+            for token, timestamp in timestamps
+            if ahora - timestamp < self.tiempo_token
+        ]
+        timestamps[:] = vigentes  # In situ: el anillo de barrido guarda esta lista
+        # El primer elemento de cada tupla es el peso (coste) de la petición
+        return int(sum(token for token, _ in vigentes))
+
+    def _consumir_ventana(self, usuario_id: int, ahora: float, coste: int) -> None:
+        self.token_timestamps[usuario_id].append((float(coste), ahora))
+
+    def _expirado_ventana(self, timestamps: List[Tuple[float, float]], ahora: float) -> bool:
+        """Sin timestamps dentro de la ventana: equivale a un usuario nuevo."""
+        return not timestamps or ahora - timestamps[-1][1] >= self.tiempo_token
+
+    def _espera_ventana(self, usuario_id: int, ahora: float, coste: int = 1) -> float:
+        """
+        Segundos hasta que expiren suficientes timestamps para ``coste``
+        tokens (contando también con ``max_tokens_user``).
+        """
+        umbral = self._umbral()
+        if coste > umbral:
+            return float("inf")
+        timestamps = self.token_timestamps.get(usuario_id) or []
+        necesarios = sum(token for token, _ in timestamps) + coste - umbral
+        liberados = 0.0
+        for token, timestamp in timestamps:
+            if liberados >= necesarios:
+                break
+            liberados += token
+            if liberados >= necesarios:
+                return max(0.0, timestamp + self.tiempo_token - ahora)
+        return 0.0
+
+    # ── Motor "recarga" (contador O(1)) ────────────────────────────────
+
+    def _usados_recarga(self, usuario_id: int, ahora: float, crear: bool) -> int:
+        """
+        Recarga perezosamente el bucket del usuario y devuelve los tokens usados.
+
+        Por qué perezoso: no hace falta ningún timer; el estado solo se
+        actualiza cuando el usuario hace una petición, en tiempo constante.
+        """
+        estado = self.token_estado.get(usuario_id)
+        if estado is None:
+            if crear:
+                self._registrar(usuario_id, [float(self.capacidad), ahora])
+            return 0
+        if crear:
+            self.token_estado.move_to_end(usuario_id)
+
+        disponibles = estado[0] + (ahora - estado[1]) * self.tasa_recarga
+        estado[0] = disponibles if disponibles < self.capacidad else float(self.capacidad)
+        estado[1] = ahora
+        return self.capacidad - int(estado[0])
+
+    def _consumir_recarga(self, usuario_id: int, ahora: float, coste: int) -> None:
+        self.token_estado[usuario_id][0] -= coste
+
+    def _expirado_recarga(self, estado: List[float], ahora: float) -> bool:
+        """Bucket lleno de nuevo: equivale a un usuario nuevo."""
+        return estado[0] + (ahora - estado[1]) * self.tasa_recarga >= self.capacidad
+
+    def _espera_recarga(self, usuario_id: int, ahora: float, coste: int = 1) -> float:
+        """
+        Segundos hasta que se recarguen ``coste`` tokens enteros (o los
+        necesarios para no pasar de ``max_tokens_user`` si es menor).
+        """
+        estado = self.token_estado.get(usuario_id)
+        umbral = self._umbral()
+        if self.tasa_recarga <= 0 or coste > umbral:
+            return float("inf")
+        # Hay que llegar a ``capacidad - umbral + coste`` tokens disponibles
+        necesarios = self.capacidad - umbral + coste
+        if estado is None or estado[0] >= necesarios:
+            return 0.0
+        return (necesarios - estado[0]) / self.tasa_recarga
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    Variante nativa de asyncio del TokenBucket.
+    
+    ``TokenBucket.tomar_token`` es ``async`` pero toma un ``threading.Lock``:
+    si otro hilo lo tiene, el event loop entero queda bloqueado. Aquí el
+    estado solo se toca desde el hilo del event loop y ninguna sección
+    crítica contiene un ``await``, así que cada operación ya es atómica
+    frente a otras corrutinas y el lock sobra.
+    
+    Además ofrece ``acquire``, que espera (sin bloquear el loop) a que se
+    recargue el siguiente token en vez de devolver 429 de inmediato.
+    
+    Con ``backend`` cada consulta es E/S bloqueante (socket de Redis,
+    ``flock`` del mmap), así que ``tomar_token`` y ``acquire`` la hacen en
+    el pool de hilos con ``asyncio.to_thread``; los backends ya son
+    thread-safe.
+    
+    Nota: sin backend no es thread-safe. Úsalo solo desde un único event loop.
+    """
+
+    def __init__(
+        self,
+        capacidad: int,
+        tiempo_token: float,
+        max_tokens_user: int = None,
+        motor: str = "ventana",
+        max_usuarios: Optional[int] = None,
+        backend: Optional[BackendEstado] = None,
+        metricas: bool = False
+    ):
+        """Ver ``TokenBucket.__init__``."""
+        super().__init__(capacidad, tiempo_token, max_tokens_user, motor, max_usuarios, backend, metricas)
+        self.lock = contextlib.nullcontext()  # Sin lock: un solo event loop
+        if self.metricas is not None:
+            self.metricas.espera_lock = None  # No hay lock que medir: no se exporta
+
+    async def tomar_token(self, usuario_id: int, coste: int = 1) -> bool:
+        """Ver ``TokenBucket.tomar_token``; con backend, fuera del event loop."""
+        if self.backend is not None:
+            return await asyncio.to_thread(self.tomar_token_sync, usuario_id, coste)
+        return self.tomar_token_sync(usuario_id, coste)
+
+    async def acquire(
+        self,
+        usuario_id: int,
+        timeout: Optional[float] = None,
+        coste: int = 1
+    ) -> bool:
+        """
+        Espera hasta poder tomar un token para el usuario.
+        
+        Si el token no estará disponible antes de ``timeout`` se devuelve
+        False en el acto, sin dormir inútilmente. Con ``max_tokens_user``
+        tampoco se lanza 429: se espera igual a que el usuario vuelva a
+        quedar por debajo del tope.
+        
+        Args:
+            usuario_id: ID del usuario que solicita el token
+            timeout: Segundos máximos de espera (None = esperar indefinidamente)
+            coste: Tokens que consume la petición
+            
+        Returns:
+            True si se tomó el token, False si venció el timeout
+        """
+        loop = asyncio.get_running_loop()
+        limite = None if timeout is None else loop.time() + timeout
+
+        while True:
+            if self.backend is not None:
+                permitido, _, espera = await asyncio.to_thread(self.comprobar, usuario_id, coste)
+            else:
+                permitido, _, espera = self.comprobar(usuario_id, coste)
+            if permitido:
+                return True
+
+            if espera == float("inf"):
+                return False
+            if limite is not None and loop.time() + espera > limite:
+                return False
+
+            await asyncio.sleep(espera)
+
+
+class ShardedTokenBucket:
+    """
+    TokenBucket fragmentado (lock striping) para servidores multi-hilo.
+    
+    Reparte los usuarios en N shards según ``hash(usuario_id) % N``; cada
+    shard es un ``TokenBucket`` independiente con su propio lock, así que
+    usuarios distintos casi nunca compiten por el mismo mutex. Expone la
+    misma API que ``TokenBucket``.
+    
+    Ojo: con el GIL de CPython no hay ganancia medible. La sección crítica
+    es Python puro, de modo que solo un hilo avanza a la vez con uno o con
+    16 locks; en ``benchmark_rate_limiter.py contencion`` (CPython 3.11)
+    ambas variantes quedan en el mismo rango (~0,3-0,5 M ops/s con 1, 4 y
+    16 hilos) y la diferencia entre ejecuciones es mayor que la que hay
+    entre ellas. Solo tendría sentido en un intérprete sin GIL.
+    """
+    
+    def __init__(
+        self,
+        capacidad: int,
+        tiempo_token: float,
+        max_tokens_user: int = None,
+        motor: str = "ventana",
+        num_shards: int = 16,
+        max_usuarios: Optional[int] = None,
+        metricas: bool = False
+    ):
+        """
+        Inicializa los shards.
+        
+        Args:
+            capacidad: Capacidad máxima de tokens por usuario
+            tiempo_token: Tiempo en segundos para regenerar un token
+            max_tokens_user: Límite máximo absoluto de tokens por usuario (opcional)
+            motor: "ventana" o "recarga" (ver ``TokenBucket``)
+            num_shards: Número de shards independientes
+            max_usuarios: Tope total de usuarios, repartido entre los shards (opcional)
+            metricas: Instrumenta cada shard (ver ``TokenBucket``)
+            
+        Raises:
+            ValueError: Si num_shards < 1
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards debe ser >= 1")
+
+        self.capacidad = capacidad
+        self.tiempo_token = tiempo_token
+        self.max_tokens_user = max_tokens_user
+        self.motor = motor
+        self.num_shards = num_shards
+        self.max_usuarios = max_usuarios
+        max_por_shard = None if max_usuarios is None else -(-max_usuarios // num_shards)
+        self.shards: List[TokenBucket] = [
+            TokenBucket(capacidad, tiempo_token, max_tokens_user, motor, max_por_shard, metricas=metricas)
+            for _ in range(num_shards)
+        ]
+        self.metricas = self.shards[0].metricas
+
+    def shard_de(self, usuario_id: int) -> TokenBucket:
+        """Devuelve el shard responsable del usuario."""
+        return self.shards[hash(usuario_id) % self.num_shards]
+
+    async def tomar_token(self, usuario_id: int, coste: int = 1) -> bool:
+        """Ver ``TokenBucket.tomar_token``; solo bloquea el shard del usuario."""
+        return self.shard_de(usuario_id).tomar_token_sync(usuario_id, coste)
+
+    def tomar_token_sync(self, usuario_id: int, coste: int = 1) -> bool:
+        """Ver ``TokenBucket.tomar_token_sync``."""
+        return self.shard_de(usuario_id).tomar_token_sync(usuario_id, coste)
+
+    def tomar_tokens_bulk(self, peticiones: Iterable[Union[int, Tuple[int, int]]]) -> List[Dict]:
+        """
+        Ver ``TokenBucket.tomar_tokens_bulk``: agrupa el lote por shard y
+        toma cada lock una sola vez, conservando el orden de entrada.
+        """
+        lote = _normalizar_lote(peticiones)
+        posiciones_por_shard: Dict[int, List[int]] = {}
+        for posicion, (usuario_id, _) in enumerate(lote):
+            posiciones_por_shard.setdefault(hash(usuario_id) % self.num_shards, []).append(posicion)
+
+        resultados: List[Optional[Dict]] = [None] * len(lote)
+        for indice, posiciones in posiciones_por_shard.items():
+            parciales = self.shards[indice].tomar_tokens_bulk([lote[p] for p in posiciones])
+            for posicion, resultado in zip(posiciones, parciales):
+                resultados[posicion] = resultado
+        return resultados
+
+    def get_tokens(self, usuario_id: int) -> int:
+        """Ver ``TokenBucket.get_tokens``."""
+        return self.shard_de(usuario_id).get_tokens(usuario_id)
+
+    def limite_vinculante(self, usuario_id: int) -> Dict:
+        """Ver ``TokenBucket.limite_vinculante``."""
+        return self.shard_de(usuario_id).limite_vinculante(usuario_id)
+
+    def get_stats(self) -> Dict:
+        """
+        Agrega las estadísticas de todos los shards.
+        
+        Cada shard se bloquea por separado, de modo que el resultado es una
+        suma de instantáneas y nunca detiene a todos los shards a la vez.
+        """
+        stats_shards = [shard.get_stats() for shard in self.shards]
+        usuarios_por_shard = [stats["total_users"] for stats in stats_shards]
+        return {
+            "total_users": sum(usuarios_por_shard),
+            "capacidad": self.capacidad,
+            "tiempo_token": self.tiempo_token,
+            "max_tokens_user": self.max_tokens_user,
+            "motor": self.motor,
+            "backend": "memoria",
+            "max_usuarios": self.max_usuarios,
+            "evicciones_expiradas": sum(s["evicciones_expiradas"] for s in stats_shards),
+            "evicciones_lru": sum(s["evicciones_lru"] for s in stats_shards),
+            "num_shards": self.num_shards,
+            "usuarios_por_shard": usuarios_por_shard
+        }
+
+    def comprobar(self, usuario_id: int, coste: int = 1) -> Tuple[bool, int, float]:
+        """Ver ``TokenBucket.comprobar``."""
+        return self.shard_de(usuario_id).comprobar(usuario_id, coste)
+
+    def barrer_expirados(self, limite: Optional[int] = None) -> int:
+        """Ver ``TokenBucket.barrer_expirados``; barre shard a shard."""
+        return sum(shard.barrer_expirados(limite) for shard in self.shards)
+
+    def exponer_metricas(self) -> str:
+        """Ver ``TokenBucket.exponer_metricas``; suma las métricas de los shards."""
+        if self.metricas is None:
+            raise RuntimeError("Métricas desactivadas en este limitador")
+        total = MetricasLimitador()
+        for shard in self.shards:
+            with shard._lock_sin_medir():
+                total.sumar(shard.metricas)
+        return total.exponer(self.get_stats())
+
+
+class Limite(NamedTuple):
+    """
+    Un nivel de cuota de ``TokenBucketCompuesto``.
+    
+    ``capacidad`` tokens por ``periodo`` segundos, recargados de forma
+    continua (igual que el motor ``"recarga"``). ``ambito`` indica si el
+    contador es de cada usuario o compartido por todo su tenant.
+    """
+
+    nombre: str
+    capacidad: int
+    periodo: float
+    ambito: str = "usuario"
+
+
+class TokenBucketCompuesto(TokenBucket):
+    """
+    Cuotas jerárquicas y multiventana en un solo limitador.
+    
+    Por ejemplo, 5/segundo y 100/minuto por usuario más 10.000/día por
+    tenant. Cada clave (usuario o tenant) guarda una sola lista compacta
+    ``[tokens_nivel_1, ..., tokens_nivel_n, ultimo]`` y una petición se
+    evalúa con un único lock en dos fases: primero todos los niveles deben
+    admitirla y solo entonces se descuenta de todos. Un rechazo nunca
+    consume cuota de otro nivel.
+    
+    Compatible con la API de ``TokenBucket`` (endpoints y middleware):
+    ``capacidad`` es la del nivel más pequeño y ``get_tokens`` devuelve
+    ``capacidad - disponibles`` del nivel vinculante, de modo que
+    ``capacidad - get_tokens`` siguen siendo los tokens restantes. El
+    ``motivo`` de un rechazo es el ``nombre`` del nivel que lo provocó.
+    """
+
+    AMBITOS = ("usuario", "tenant")
+
+    def __init__(
+        self,
+        limites: Sequence[Limite],
+        tenant_de: Optional[Callable[[int], Optional[Hashable]]] = None,
+        max_usuarios: Optional[int] = None,
+        metricas: bool = False
+    ):
+        """
+        Inicializa el limitador compuesto.
+        
+        Args:
+            limites: Niveles de cuota (al menos uno)
+            tenant_de: Devuelve el tenant de un usuario (None = sin tenant);
+                obligatorio si hay niveles con ``ambito="tenant"``
+            max_usuarios: Tope de usuarios en memoria; expulsa por LRU (opcional)
+            metricas: Instrumenta el camino caliente (ver ``TokenBucket``)
+            
+        Raises:
+            ValueError: Si no hay límites, hay nombres repetidos, un nivel
+                es inválido o faltan datos para los niveles de tenant
+        """
+        limites = [Limite(*limite) for limite in limites]
+        if not limites:
+            raise ValueError("Se necesita al menos un límite")
+        if len({limite.nombre for limite in limites}) != len(limites):
+            raise ValueError("Los nombres de los límites deben ser únicos")
+        for limite in limites:
+            if limite.ambito not in self.AMBITOS:
+                raise ValueError(f"Ámbito desconocido: {limite.ambito!r}. Opciones: {self.AMBITOS}")
+            if limite.capacidad < 1 or limite.periodo <= 0:
+                raise ValueError(f"Límite inválido: {limite}")
+
+        self.limites = limites
+        self.niveles_usuario = [limite for limite in limites if limite.ambito == "usuario"]
+        self.niveles_tenant = [limite for limite in limites if limite.ambito == "tenant"]
+        if self.niveles_tenant and tenant_de is None:
+            raise ValueError("Los límites de tenant requieren tenant_de")
+        self.tenant_de = tenant_de if self.niveles_tenant else None
+
+        menor = min(limites, key=lambda limite: limite.capacidad)
+        super().__init__(
+            menor.capacidad, menor.periodo, motor="recarga",
+            max_usuarios=max_usuarios, metricas=metricas
+        )
+
+        # Tenant -> [tokens_nivel_1, ..., ultimo]; los usuarios van en token_estado
+        self.estado_tenants: Dict[Hashable, List[float]] = OrderedDict()
+        self._anillo_tenants: deque = deque()
+        self._expirado = self._expirado_usuario
+        self._espera = self._espera_compuesta
+        if self.metricas is not None:
+            self.metricas.resultados = dict.fromkeys(
+                ["permitida"] + [limite.nombre for limite in limites], 0
+            )
+
+    # ── Estado compacto por clave ──────────────────────────────────────
+
+    @staticmethod
+    def _recargar_niveles(estado: List[float], niveles: List[Limite], ahora: float) -> None:
+        """Recarga perezosa de todos los niveles de una clave, in situ."""
+        ultimo = estado[-1]
+        for indice, limite in enumerate(niveles):
+            estado[indice] = _recargar(
+                estado[indice], ultimo, limite.capacidad, limite.capacidad / limite.periodo, ahora
+            )
+        estado[-1] = ahora
+
+    def _estado_usuario(self, usuario_id: int, ahora: float, crear: bool) -> Optional[List[float]]:
+        estado = self.token_estado.get(usuario_id)
+        if estado is None:
+            if crear:
+                estado = [float(limite.capacidad) for limite in self.niveles_usuario] + [ahora]
+                self._registrar(usuario_id, estado)
+            return estado
+        if crear:
+            self.token_estado.move_to_end(usuario_id)
+        self._recargar_niveles(estado, self.niveles_usuario, ahora)
+        return estado
+
+    def _estado_tenant(self, usuario_id: int, ahora: float, crear: bool) -> Optional[List[float]]:
+        if self.tenant_de is None:
+            return None
+        tenant = self.tenant_de(usuario_id)
+        if tenant is None:
+            return None
+        estado = self.estado_tenants.get(tenant)
+        if estado is None:
+            if crear:
+                estado = [float(limite.capacidad) for limite in self.niveles_tenant] + [ahora]
+                self.estado_tenants[tenant] = estado
+                self._anillo_tenants.append((tenant, estado))
+            return estado
+        if crear:
+            self.estado_tenants.move_to_end(tenant)
+        self._recargar_niveles(estado, self.niveles_tenant, ahora)
+        return estado
+
+    def _niveles(self, usuario_id: int, ahora: float, crear: bool):
+        """Pares (estado o None si la clave no existe, niveles) del usuario y su tenant."""
+        pares = [(self._estado_usuario(usuario_id, ahora, crear), self.niveles_usuario)]
+        if self.tenant_de is not None:
+            pares.append((self._estado_tenant(usuario_id, ahora, crear), self.niveles_tenant))
+        return pares
+
+    @staticmethod
+    def _vinculante(pares) -> Tuple[Optional[Limite], float]:
+        """Nivel con menos tokens disponibles (y esos tokens)."""
+        vinculante, disponibles = None, float("inf")
+        for estado, niveles in pares:
+            for indice, limite in enumerate(niveles):
+                tokens = limite.capacidad if estado is None else estado[indice]
+                if tokens < disponibles:
+                    vinculante, disponibles = limite, tokens
+        return vinculante, disponibles
+
+    # ── Evaluación en dos fases ────────────────────────────────────────
+
+    def _evaluar(self, usuario_id: int, ahora: float, coste: int) -> Tuple[Optional[str], int]:
+        """
+        Admite en todos los niveles y solo después consume en todos.
+        
+        Returns:
+            Tupla (nombre del nivel que rechaza o None, ``capacidad`` menos
+            los tokens disponibles del nivel vinculante)
+        """
+        self._barrer(ahora, self.BARRIDO_POR_PETICION)
+        pares = self._niveles(usuario_id, ahora, crear=True)
+
+        # Fase 1: todos los niveles deben admitir
+        vinculante, disponibles = self._vinculante(pares)
+        usados = self.capacidad - int(disponibles)
+        if int(disponibles) < coste:
+            return vinculante.nombre, usados
+
+        # Fase 2: consumir en todos
+        for estado, niveles in pares:
+            for indice in range(len(niveles)):
+                estado[indice] -= coste
+        return None, usados
+
+    def _espera_compuesta(self, usuario_id: int, ahora: float, coste: int = 1) -> float:
+        """Segundos hasta que todos los niveles tengan ``coste`` tokens."""
+        espera = 0.0
+        for estado, niveles in self._niveles(usuario_id, ahora, crear=False):
+            for indice, limite in enumerate(niveles):
+                if coste > limite.capacidad:
+                    return float("inf")
+                if estado is not None and estado[indice] < coste:
+                    faltan = coste - estado[indice]
+                    espera = max(espera, faltan * limite.periodo / limite.capacidad)
+        return espera
+
+    # ── Consultas ──────────────────────────────────────────────────────
+
+    def get_tokens(self, usuario_id: int) -> int:
+        """``capacidad`` menos los tokens disponibles del nivel vinculante."""
+        with self.lock:
+            _, disponibles = self._vinculante(self._niveles(usuario_id, self._reloj(), crear=False))
+        return self.capacidad - int(disponibles)
+
+    def limite_vinculante(self, usuario_id: int) -> Dict:
+        """
+        Ver ``TokenBucket.limite_vinculante``: el nivel (de usuario o de
+        tenant) con menos tokens disponibles ahora mismo.
+        """
+        with self.lock:
+            limite, disponibles = self._vinculante(
+                self._niveles(usuario_id, self._reloj(), crear=False)
+            )
+        return {
+            "nombre": limite.nombre,
+            "ambito": limite.ambito,
+            "capacidad": limite.capacidad,
+            "periodo": limite.periodo,
+            "tokens_usados": limite.capacidad - int(disponibles),
+            "tokens_disponibles": int(disponibles)
+        }
+
+    def get_stats(self) -> Dict:
+        """Ver ``TokenBucket.get_stats``; añade niveles y número de tenants."""
+        stats = super().get_stats()
+        with self._lock_sin_medir():
+            stats["total_tenants"] = len(self.estado_tenants)
+        stats["limites"] = [limite._asdict() for limite in self.limites]
+        return stats
+
+    # ── Memoria acotada ────────────────────────────────────────────────
+
+    @staticmethod
+    def _lleno(estado: List[float], niveles: List[Limite], ahora: float) -> bool:
+        """Todos los niveles recargados al máximo: equivale a una clave nueva."""
+        transcurrido = ahora - estado[-1]
+        return all(
+            estado[indice] + transcurrido * limite.capacidad / limite.periodo >= limite.capacidad
+            for indice, limite in enumerate(niveles)
+        )
+
+    def _expirado_usuario(self, estado: List[float], ahora: float) -> bool:
+        return self._lleno(estado, self.niveles_usuario, ahora)
+
+    def _barrer(self, ahora: float, limite: Optional[int]) -> int:
+        """Ver ``TokenBucket._barrer``; barre también los tenants inactivos."""
+        tenants = self._barrer_anillo(
+            self.estado_tenants, self._anillo_tenants,
+            lambda estado, ahora: self._lleno(estado, self.niveles_tenant, ahora), ahora, limite
+        )
+        self.evicciones_expiradas += tenants
+        return super()._barrer(ahora, limite) + tenants
+
+
+def _clave_estable(valor: bytes) -> int:
+    """
+    Convierte una cabecera o IP en clave entera del limitador.
+    
+    Los IDs numéricos que caben en un entero de 64 bits con signo se usan
+    tal cual (coinciden con /user/{id}/tokens); el resto, incluidos los
+    números más grandes (no cabrían en el slot de ``BackendMmap``), se
+    reduce con blake2b a 64 bits. No se usa ``hash()`` porque está
+    aleatorizado por proceso y rompería los backends compartidos.
+    """
+    try:
+        clave = int(valor)
+    except ValueError:
+        clave = None
+    if clave is not None and -(1 << 63) <= clave < (1 << 63):
+        return clave
+    return int.from_bytes(hashlib.blake2b(valor, digest_size=8).digest(), "little", signed=True)
+
+
+async def sin_bloquear_loop(limitador, metodo, *args):
+    """
+    Ejecuta ``metodo(*args)`` sin bloquear el event loop.
+    
+    Si el limitador tiene un backend compartido la llamada hace E/S
+    bloqueante (Redis, ``flock``) y va al pool de hilos; en memoria es una
+    operación de microsegundos y se hace en el propio loop.
+    """
+    if getattr(limitador, "backend", None) is not None:
+        return await asyncio.to_thread(metodo, *args)
+    return metodo(*args)
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI puro que aplica un ``TokenBucket`` a cualquier app.
+    
+    La clave se saca de una cabecera (p. ej. ``X-API-Key``) o, si no
+    viene, de la IP del cliente; nunca se lee el cuerpo. Las peticiones
+    rechazadas reciben 429 con ``Retry-After`` y ``X-RateLimit-*`` sin
+    llegar a la app; las permitidas solo pagan la comprobación y dos
+    cabeceras extra. Con un backend compartido la comprobación se hace
+    en el pool de hilos (ver ``sin_bloquear_loop``).
+    
+    Uso:
+        app.add_middleware(RateLimitMiddleware, limitador=TokenBucket(60, 60.0))
+    """
+
+    CUERPO_429 = b'{"detail":"Too Many Requests. Please try again later."}'
+
+    def __init__(
+        self,
+        app,
+        limitador,
+        cabecera: Optional[str] = "x-api-key",
+        excluir: Iterable[str] = (),
+        coste: int = 1,
+        cabeceras_en_permitidas: bool = True
+    ):
+        """
+        Args:
+            app: Aplicación ASGI a proteger
+            limitador: TokenBucket (o variante) con ``comprobar``
+            cabecera: Cabecera con la clave del cliente (None = solo IP)
+            excluir: Rutas exactas que no consumen tokens (p. ej. "/health")
+            coste: Tokens que consume cada petición
+            cabeceras_en_permitidas: Añadir ``X-RateLimit-*`` a las respuestas 2xx
+        """
+        self.app = app
+        self.limitador = limitador
+        self.cabecera = cabecera.lower().encode() if cabecera else None
+        self.excluir = frozenset(excluir)
+        self.coste = coste
+        self.cabeceras_en_permitidas = cabeceras_en_permitidas
+        self._limite = str(limitador.capacidad).encode()
+
+    def _clave(self, scope) -> int:
+        if self.cabecera is not None:
+            for nombre, valor in scope["headers"]:
+                if nombre == self.cabecera:
+                    # X-Forwarded-For puede traer una cadena de proxies
+                    return _clave_estable(valor.split(b",", 1)[0].strip())
+        cliente = scope.get("client")
+        return _clave_estable(cliente[0].encode() if cliente else b"desconocido")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluir:
+            await self.app(scope, receive, send)
+            return
+
+        permitido, restantes, espera = await sin_bloquear_loop(
+            self.limitador, self.limitador.comprobar, self._clave(scope), self.coste
+        )
+        if not permitido:
+            await self._rechazar(send, espera)
+            return
+        if not self.cabeceras_en_permitidas:
+            await self.app(scope, receive, send)
+            return
+
+        cabeceras = [
+            (b"x-ratelimit-limit", self._limite),
+            (b"x-ratelimit-remaining", str(restantes).encode()),
+        ]
+
+        async def send_con_cabeceras(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", ())) + cabeceras
+            await send(mensaje)
+
+        await self.app(scope, receive, send_con_cabeceras)
+
+    async def _rechazar(self, send, espera: float) -> None:
+        if espera == float("inf"):
+            espera = self.limitador.tiempo_token
+        segundos = str(max(1, math.ceil(espera))).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self.CUERPO_429)).encode()),
+                (b"retry-after", segundos),
+                (b"x-ratelimit-limit", self._limite),
+                (b"x-ratelimit-remaining", b"0"),
+                (b"x-ratelimit-reset", segundos),
+            ],
+        })
+        await send({"type": "http.response.body", "body": self.CUERPO_429})
 
 
 # Instancia global del TokenBucket
 # Configuración: 10 peticiones por minuto (60 segundos)
-rate_limiter = TokenBucket(
-    capacidad=10, 
-    tiempo_token=60.0,
-    max_tokens_user=15  # Límite absoluto
-)
+# Con varios workers, RATE_LIMITER_BACKEND comparte la cuota entre procesos:
+#   mmap:///dev/shm/rate_limiter.bin  |  redis://localhost:6379
+# RATE_LIMITER_METRICAS=1 activa la instrumentación y /metrics (por defecto no
+# se instala nada y el camino caliente queda igual que sin métricas)
+_backend = crear_backend(os.getenv("RATE_LIMITER_BACKEND", "memoria"))
+_metricas = os.getenv("RATE_LIMITER_METRICAS", "0") in ("1", "true", "yes", "si", "sí")
+
+# Todos los endpoints son async: la variante asyncio evita bloquear el loop
+# (con backend, sus llamadas se hacen en el pool de hilos)
+if _backend is not None:
+    rate_limiter = AsyncTokenBucket(
+        capacidad=10,
+        tiempo_token=60.0,
+        max_tokens_user=15,  # Límite absoluto
+        motor="recarga",
+        backend=_backend,
+        metricas=_metricas
+    )
+else:
+    rate_limiter = AsyncTokenBucket(
+        capacidad=10, 
+        tiempo_token=60.0,
+        max_tokens_user=15,  # Límite absoluto
+        max_usuarios=1_000_000,  # Tope de memoria (expulsión LRU)
+        metricas=_metricas
+    )
+
+# Barrido de usuarios inactivos en segundo plano
+INTERVALO_BARRIDO = 10.0  # segundos
+LIMITE_BARRIDO = 10_000  # usuarios por pasada (acota la pausa del event loop)
+
+
+async def _barrido_periodico() -> None:
+    """Barre usuarios expirados periódicamente, por lotes acotados."""
+    while True:
+        await asyncio.sleep(INTERVALO_BARRIDO)
+        rate_limiter.barrer_expirados(LIMITE_BARRIDO)
+
+
+@app.on_event("startup")
+async def iniciar_barrido():
+    """Lanza el barrido de expirados al arrancar el servidor."""
+    app.state.tarea_barrido = asyncio.create_task(_barrido_periodico())
+
+
+@app.on_event("shutdown")
+async def detener_barrido():
+    """Cancela el barrido de expirados al parar el servidor."""
+    tarea = getattr(app.state, "tarea_barrido", None)
+    if tarea is not None:
+        tarea.cancel()
 
 
 def get_rate_limiter() -> TokenBucket:
@@ -224,6 +1946,7 @@ async def rate_limited_endpoint(
     2. Máximo 10 peticiones por ventana de 60 segundos
     3. Los tokens expirados se limpian automáticamente
     4. Límite absoluto de 15 peticiones
+    5. ``coste`` opcional: una petición puede consumir k tokens
     
     Args:
         usuario: Objeto con ID del usuario
@@ -236,8 +1959,11 @@ async def rate_limited_endpoint(
         HTTPException: 429 si se excede el rate limit
     """
     try:
-        if await token_bucket.tomar_token(usuario.id_usuario):
-            tokens_restantes = token_bucket.capacidad - token_bucket.get_tokens(usuario.id_usuario)
+        if usuario.coste < 1:
+            raise HTTPException(status_code=422, detail="coste debe ser >= 1")
+        if await token_bucket.tomar_token(usuario.id_usuario, usuario.coste):
+            usados = await sin_bloquear_loop(token_bucket, token_bucket.get_tokens, usuario.id_usuario)
+            tokens_restantes = token_bucket.capacidad - usados
             return {
                 "mensaje": "Token tomado exitosamente",
                 "usuario_id": usuario.id_usuario,
@@ -252,6 +1978,69 @@ async def rate_limited_endpoint(
         raise e
 
 
+@app.post(
+    "/rate-limited/batch",
+    tags=["Rate Limiting"],
+    summary="Comprobación de cuotas por lotes",
+    response_description="Resultado por usuario",
+    responses={
+        200: {
+            "description": "Resultado de cada comprobación, en el orden recibido",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "total": 2,
+                        "permitidos": 1,
+                        "resultados": [
+                            {"usuario_id": 1, "coste": 1, "permitido": True,
+                             "motivo": None, "tokens_restantes": 9},
+                            {"usuario_id": 2, "coste": 5, "permitido": False,
+                             "motivo": "capacidad", "tokens_restantes": 3}
+                        ]
+                    }
+                }
+            }
+        }
+    }
+)
+async def rate_limited_batch_endpoint(
+    lote: LoteUsuarios,
+    token_bucket: TokenBucket = Depends(get_rate_limiter)
+):
+    """
+    Comprueba las cuotas de muchos usuarios en una sola petición HTTP.
+    
+    **Formato:** ``{"peticiones": [1, 2, [3, 5]]}`` — IDs sueltos (coste 1)
+    o pares ``[id_usuario, coste]``.
+    
+    **Comportamiento:**
+    - Todo el lote se evalúa bajo un único lock
+    - Siempre responde 200; cada resultado indica ``permitido`` y ``motivo``
+    - ❌ 422: lote vacío, mayor que ``MAX_LOTE`` o con costes < 1
+    
+    Args:
+        lote: Lista de IDs o pares (usuario, coste)
+        token_bucket: TokenBucket inyectado por dependencias
+        
+    Returns:
+        Resultados por usuario y recuento de permitidos
+    """
+    if not lote.peticiones or len(lote.peticiones) > MAX_LOTE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"El lote debe tener entre 1 y {MAX_LOTE} peticiones"
+        )
+    try:
+        resultados = await sin_bloquear_loop(token_bucket, token_bucket.tomar_tokens_bulk, lote.peticiones)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "total": len(resultados),
+        "permitidos": sum(1 for r in resultados if r["permitido"]),
+        "resultados": resultados
+    }
+
+
 @app.get(
     "/stats",
     tags=["Monitoring"],
@@ -267,6 +2056,8 @@ async def get_stats(token_bucket: TokenBucket = Depends(get_rate_limiter)):
     - Capacidad configurada del bucket
     - Ventana de tiempo en segundos
     - Límite máximo por usuario
+    - Tope de usuarios en memoria y contadores de expulsión
+      (``evicciones_expiradas``, ``evicciones_lru``)
     
     **Uso:** Este endpoint es útil para monitoring y debugging.
     No consume tokens del rate limiter.
@@ -274,7 +2065,37 @@ async def get_stats(token_bucket: TokenBucket = Depends(get_rate_limiter)):
     Returns:
         Estadísticas globales del sistema
     """
-    return token_bucket.get_stats()
+    return await sin_bloquear_loop(token_bucket, token_bucket.get_stats)
+
+
+@app.get(
+    "/metrics",
+    tags=["Monitoring"],
+    summary="Métricas en formato Prometheus",
+    response_class=PlainTextResponse
+)
+async def get_metrics(token_bucket: TokenBucket = Depends(get_rate_limiter)):
+    """
+    Expone contadores e histogramas del rate limiter para Prometheus.
+    
+    **Series:**
+    - ``rate_limiter_peticiones_total{resultado=...}``: permitidas y rechazos por motivo
+    - ``rate_limiter_comprobacion_segundos``: histograma de latencia por comprobación
+    - ``rate_limiter_espera_lock_segundos``: histograma de espera del lock
+      (solo si el limitador toma un lock; no con la variante asyncio)
+    - ``rate_limiter_usuarios_activos`` y ``rate_limiter_evicciones_total{tipo=...}``
+    
+    **Notas:**
+    - ❌ 404 si las métricas están desactivadas (por defecto; se activan
+      con ``RATE_LIMITER_METRICAS=1``)
+    - No consume tokens del rate limiter
+    """
+    if getattr(token_bucket, "metricas", None) is None:
+        raise HTTPException(status_code=404, detail="Métricas desactivadas")
+    return PlainTextResponse(
+        await sin_bloquear_loop(token_bucket, token_bucket.exponer_metricas),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 @app.get(
@@ -294,6 +2115,9 @@ async def get_user_tokens(
     - Tokens usados en la ventana actual
     - Tokens disponibles restantes
     - Capacidad total del bucket
+    - ``limite_vinculante``: el límite que frenará antes al usuario (con
+      cuotas compuestas, el nivel o ventana con menos tokens disponibles);
+      los tres campos anteriores se refieren a ese límite
     
     **Notas:**
     - Los tokens expirados se limpian automáticamente antes de contar
@@ -305,12 +2129,13 @@ async def get_user_tokens(
     Returns:
         Estado completo de tokens del usuario
     """
-    tokens = token_bucket.get_tokens(usuario_id)
+    vinculante = await sin_bloquear_loop(token_bucket, token_bucket.limite_vinculante, usuario_id)
     return {
         "usuario_id": usuario_id,
-        "tokens_usados": tokens,
-        "tokens_disponibles": token_bucket.capacidad - tokens,
-        "capacidad_total": token_bucket.capacidad
+        "tokens_usados": vinculante["tokens_usados"],
+        "tokens_disponibles": vinculante["tokens_disponibles"],
+        "capacidad_total": vinculante["capacidad"],
+        "limite_vinculante": vinculante
     }
 
 
@@ -334,7 +2159,9 @@ async def root():
         "generado_por": "Llama 3.1 + Qwen 2.5 Coder",
         "endpoints": {
             "POST /rate-limited": "Endpoint protegido con rate limiting",
+            "POST /rate-limited/batch": "Comprobación de cuotas por lotes",
             "GET /stats": "Estadísticas del sistema",
+            "GET /metrics": "Métricas en formato Prometheus",
             "GET /user/{usuario_id}/tokens": "Tokens de un usuario",
         }
     }
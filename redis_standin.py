@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+🧪 NEO-TOKYO DEV - Servidor local que habla el protocolo Redis (RESP2)
+
+Sustituto mínimo de Redis para tests y benchmarks de ``BackendRedis`` sin
+instalar un servidor real. Implementa solo los comandos que usa el
+backend; los scripts Lua conocidos se ejecutan con una implementación
+Python equivalente (registrada por el SHA1 del script).
+
+Uso:
+    with ServidorRESPLocal() as servidor:
+        backend = BackendRedis(port=servidor.port)
+"""
+
+import hashlib
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from rate_limiter import BackendRedis, _recargar
+
+
+def _script_tomar(servidor: "ServidorRESPLocal", claves: List[bytes], args: List[bytes]) -> list:
+    """Equivalente Python de ``BackendRedis.SCRIPT_TOMAR``."""
+    capacidad, tasa, ahora = int(args[0]), float(args[1]), float(args[2])
+    umbral, coste, ttl_ms = int(args[3]), int(args[4]), int(args[5])
+
+    estado = servidor.hash_de(claves[0])
+    if b"t" not in estado:
+        tokens = float(capacidad)
+    else:
+        tokens = _recargar(float(estado[b"t"]), float(estado[b"u"]), capacidad, tasa, ahora)
+
+    usados = capacidad - int(tokens)
+    permitido = 0
+    if usados + coste <= umbral:
+        permitido = 1
+        tokens -= coste
+
+    estado[b"t"] = repr(tokens).encode()
+    estado[b"u"] = args[2]
+    servidor.expiraciones[claves[0]] = time.monotonic() + ttl_ms / 1000
+    return [permitido, usados]
+
+
+SCRIPTS_CONOCIDOS: Dict[str, Callable] = {
+    hashlib.sha1(BackendRedis.SCRIPT_TOMAR.encode()).hexdigest(): _script_tomar,
+}
+
+
+class _ManejadorRESP(socketserver.StreamRequestHandler):
+    """Atiende una conexión: lee comandos RESP y escribe respuestas."""
+
+    def handle(self) -> None:
+        while True:
+            comando = self._leer_comando()
+            if comando is None:
+                return
+            try:
+                with self.server.lock:
+                    respuesta = self.server.ejecutar(comando)
+                self.wfile.write(_codificar(respuesta))
+            except Exception as error:  # Se devuelve al cliente como -ERR
+                self.wfile.write(f"-{error}\r\n".encode())
+
+    def _leer_comando(self) -> Optional[List[bytes]]:
+        cabecera = self.rfile.readline()
+        if not cabecera:
+            return None
+        argumentos = []
+        for _ in range(int(cabecera[1:])):
+            longitud = int(self.rfile.readline()[1:])
+            argumentos.append(self.rfile.read(longitud + 2)[:-2])
+        return argumentos
+
+
+def _codificar(valor) -> bytes:
+    if valor is None:
+        return b"$-1\r\n"
+    if isinstance(valor, bool) or isinstance(valor, int):
+        return b":%d\r\n" % int(valor)
+    if isinstance(valor, str):
+        return f"+{valor}\r\n".encode()
+    if isinstance(valor, bytes):
+        return b"$%d\r\n%s\r\n" % (len(valor), valor)
+    return b"*%d\r\n" % len(valor) + b"".join(_codificar(v) for v in valor)
+
+
+class ServidorRESPLocal(socketserver.ThreadingTCPServer):
+    """
+    Servidor RESP en 127.0.0.1 con un hilo por conexión.
+
+    Comandos: PING, SCRIPT LOAD, EVALSHA, HMGET, HSET, PEXPIRE, DEL, SCAN,
+    FLUSHALL. Las claves con PEXPIRE caducan de forma perezosa.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _ManejadorRESP)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.datos: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.expiraciones: Dict[bytes, float] = {}
+        self.scripts: Dict[bytes, Callable] = {}
+        self._hilo: Optional[threading.Thread] = None
+
+    # ── Ciclo de vida ──────────────────────────────────────────────────
+
+    def iniciar(self) -> "ServidorRESPLocal":
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "ServidorRESPLocal":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.detener()
+
+    # ── Almacenamiento ─────────────────────────────────────────────────
+
+    def _caducar(self, clave: bytes) -> None:
+        limite = self.expiraciones.get(clave)
+        if limite is not None and limite <= time.monotonic():
+            self.datos.pop(clave, None)
+            del self.expiraciones[clave]
+
+    def hash_de(self, clave: bytes) -> Dict[bytes, bytes]:
+        self._caducar(clave)
+        return self.datos.setdefault(clave, {})
+
+    # ── Comandos ───────────────────────────────────────────────────────
+
+    def ejecutar(self, comando: List[bytes]):
+        nombre, args = comando[0].upper(), comando[1:]
+
+        if nombre == b"PING":
+            return "PONG"
+        if nombre == b"SCRIPT" and args[0].upper() == b"LOAD":
+            sha = hashlib.sha1(args[1]).hexdigest()
+            if sha not in SCRIPTS_CONOCIDOS:
+                raise ValueError("ERR script no soportado por el servidor local")
+            self.scripts[sha.encode()] = SCRIPTS_CONOCIDOS[sha]
+            return sha.encode()
+        if nombre == b"EVALSHA":
+            script = self.scripts.get(args[0])
+            if script is None:
+                raise ValueError("NOSCRIPT No matching script")
+            num_claves = int(args[1])
+            return script(self, args[2:2 + num_claves], args[2 + num_claves:])
+        if nombre == b"HMGET":
+            self._caducar(args[0])
+            estado = self.datos.get(args[0], {})
+            return [estado.get(campo) for campo in args[1:]]
+        if nombre == b"HSET":
+            estado = self.hash_de(args[0])
+            nuevos = sum(1 for campo in args[1::2] if campo not in estado)
+            estado.update(zip(args[1::2], args[2::2]))
+            return nuevos
+        if nombre == b"PEXPIRE":
+            if args[0] not in self.datos:
+                return 0
+            self.expiraciones[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        if nombre == b"DEL":
+            return sum(1 for clave in args if self.datos.pop(clave, None) is not None)
+        if nombre == b"SCAN":
+            # Sin paginación real: devuelve todo en una sola página (cursor 0)
+            patron = args[args.index(b"MATCH") + 1] if b"MATCH" in args else b"*"
+            prefijo = patron.rstrip(b"*")
+            for clave in list(self.datos):
+                self._caducar(clave)
+            return [b"0", [clave for clave in self.datos if clave.startswith(prefijo)]]
+        if nombre == b"FLUSHALL":
+            self.datos.clear()
+            self.expiraciones.clear()
+            return "OK"
+        raise ValueError(f"ERR comando desconocido '{nombre.decode()}'")
+
+
+if __name__ == "__main__":
+    with ServidorRESPLocal(port=6379) as servidor:
+        print(f"🧪 Servidor RESP local escuchando en 127.0.0.1:{servidor.port} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║  🧊 RESPONSE CACHE - In-process cache for Intelligence Dashboard API         ║
+║  TTL + LRU, invalidated by the database generation counter                  ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+
+
+class CachedResponse(NamedTuple):
+    """Serialized response body plus its validator."""
+    body: bytes
+    etag: str
+    generation: int
+    expires_at: float
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the body: identical content keeps its ETag."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """``If-None-Match`` check (handles lists, ``*`` and weak validators)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(','))
+    return etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL/LRU cache of serialized responses.
+
+    An entry is served only while its generation equals the current one
+    and it is younger than ``ttl`` seconds. The generation invalidates on
+    new data; the TTL bounds staleness of time-window queries ("last 7
+    days") and of writes the generation cannot see (another process).
+    When more than ``max_entries`` keys are cached, the least recently used
+    one is evicted.
+
+    ``ttl <= 0`` disables caching (every lookup is a miss).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[CachedResponse]:
+        """Fresh entry for ``key`` at ``generation`` (counts a hit or a miss)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation == generation and entry.expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]  # Stale: drop it now rather than at eviction
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, generation: int, body: bytes) -> CachedResponse:
+        """Store ``body`` for ``key`` and return the entry (with its ETag)."""
+        entry = CachedResponse(body, make_etag(body), generation, self.clock() + self.ttl)
+        if not self.enabled:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def record_not_modified(self):
+        """Count a 304 answer."""
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Counters and size, e.g. for a monitoring endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl_seconds': self.ttl,
+                'max_entries': self.max_entries,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+"""
+🧪 NEO-TOKYO DEV - Test Suite para database_manager
+
+Cada test usa una base de datos temporal: intelligence.db no se toca.
+"""
+
+import pytest
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Importar el módulo a testear
+import sys
+sys.path.insert(0, '..')
+import database_manager as db
+
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def base_temporal(tmp_path, monkeypatch):
+    """
+    Fixture que apunta database_manager a una base de datos vacía.
+
+    Returns:
+        Ruta del fichero SQLite temporal (ya inicializado)
+    """
+    ruta = str(tmp_path / "intelligence.db")
+    monkeypatch.setattr(db, "DATABASE_PATH", ruta)
+    db.init_db()
+    yield ruta
+    db.close_manager()
+
+
+def _informe(tmp_path, titulos, harvested_at="2025-12-05T02:31:36", nombre="report.json"):
+    """Escribe un intelligence_report.json mínimo (URL derivada del título) y devuelve su ruta."""
+    ruta = tmp_path / nombre
+    ruta.write_text(json.dumps({
+        "metadata": {"harvested_at": harvested_at, "sources": ["Test"], "total_articles": len(titulos)},
+        "articles": [
+            {"title": t, "url": f"https://example.com/{t.lower().replace(' ', '-')}", "score": i, "source": "Test",
+             "timestamp": harvested_at}
+            for i, t in enumerate(titulos)
+        ],
+    }), encoding="utf-8")
+    return str(ruta)
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL CONNECTION MANAGER
+# ══════════════════════════════════════════════════════════════
+
+def test_manager_modo_wal_y_pragmas(base_temporal):
+    """
+    Test: El writer activa WAL y los lectores son de solo lectura.
+    """
+    manager = db.get_manager()
+
+    with manager.write() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    with manager.read() as conn:
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+
+
+def test_manager_reutiliza_conexiones(base_temporal):
+    """
+    Test: Las lecturas consecutivas reciben la misma conexión del pool.
+    """
+    manager = db.get_manager()
+
+    with manager.read() as primera:
+        pass
+    with manager.read() as segunda:
+        pass
+
+    assert primera is segunda
+
+
+def test_manager_rollback_en_error(base_temporal):
+    """
+    Test: Una excepción dentro de write() deshace la transacción.
+    """
+    with pytest.raises(RuntimeError):
+        with db.get_manager().write() as conn:
+            conn.execute("INSERT INTO scans (timestamp, source, total_articles) VALUES ('x', 'y', 0)")
+            raise RuntimeError("fallo a mitad de transacción")
+
+    assert db.get_stats()["total_scans"] == 0
+
+
+def test_lecturas_concurrentes(base_temporal, tmp_path):
+    """
+    Test: Varios hilos leen a la vez sin errores y sin superar el pool.
+    """
+    db.save_scan(_informe(tmp_path, ["Python release", "Rust compiler news"]))
+    errores = []
+
+    def leer():
+        try:
+            for _ in range(50):
+                assert db.get_stats()["total_articles"] == 2
+        except Exception as e:  # pragma: no cover - solo si falla
+            errores.append(e)
+
+    hilos = [threading.Thread(target=leer) for _ in range(12)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    assert len(db.get_manager()._idle) <= db.get_manager().pool_size
+
+
+def test_save_scan_y_consultas(base_temporal, tmp_path):
+    """
+    Test: save_scan guarda artículos y keywords consultables.
+    """
+    scan_id = db.save_scan(_informe(tmp_path, ["Python agents", "Python database news"]))
+
+    assert scan_id == 1
+    assert [a["title"] for a in db.get_latest(10)] == ["Python database news", "Python agents"]
+    assert db.get_stats()["total_keywords"] == 4
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE INGESTA MASIVA
+# ══════════════════════════════════════════════════════════════
+
+def test_count_keywords_equivale_al_bucle_por_titulo():
+    """
+    Test: El recuento en una pasada coincide con el bucle original por título.
+    """
+    import re
+    from collections import Counter
+
+    titulos = ["The Rust compiler and the GPU", "Rust for the web", "A new GPU, by Nvidia"]
+    esperado = Counter(
+        palabra
+        for titulo in titulos
+        for palabra in re.findall(r'\b\w{3,}\b', titulo.lower())
+        if palabra not in db.STOPWORDS
+    )
+
+    assert db.count_keywords(titulos) == esperado
+
+
+def test_ingest_articles_desde_generador(base_temporal):
+    """
+    Test: ingest_articles consume un generador en lotes en una transacción.
+
+    Valida: total_articles se calcula si falta en los metadatos.
+    """
+    articulos = (
+        {"title": f"Python release {i}", "url": f"https://example.com/{i}", "score": i}
+        for i in range(2500)
+    )
+
+    scan_id = db.ingest_articles(articulos, {"sources": ["Bulk"]}, batch_size=1000)
+
+    assert db.get_stats()["total_articles"] == 2500
+    with db.get_manager().read() as conn:
+        total = conn.execute("SELECT total_articles FROM scans WHERE id = ?", (scan_id,)).fetchone()[0]
+        keywords = dict(conn.execute("SELECT keyword, frequency FROM keywords WHERE scan_id = ?", (scan_id,)))
+    assert total == 2500
+    assert keywords["python"] == 2500
+
+
+def test_ingest_reports_varios_ficheros(base_temporal, tmp_path):
+    """
+    Test: ingest_reports ingiere varios informes y salta los que no existen.
+    """
+    rutas = [
+        _informe(tmp_path, ["Python news"], nombre="a.json"),
+        str(tmp_path / "no_existe.json"),
+        _informe(tmp_path, ["Rust news", "GPU news"], nombre="b.json"),
+    ]
+
+    scan_ids = db.ingest_reports(rutas)
+
+    assert scan_ids == [1, 2]
+    assert db.get_stats()["total_articles"] == 3
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE TIMESTAMPS INDEXABLES (MIGRACIÓN v1)
+# ══════════════════════════════════════════════════════════════
+
+def _plan(sql, parametros=()):
+    """Detalle del EXPLAIN QUERY PLAN de una consulta."""
+    with db.get_manager().read() as conn:
+        return " | ".join(fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + sql, parametros))
+
+
+def test_migracion_rellena_scanned_at(tmp_path, monkeypatch):
+    """
+    Test: Una base con el esquema antiguo se migra y se rellena scanned_at.
+    """
+    import sqlite3
+    ruta = str(tmp_path / "antigua.db")
+    conn = sqlite3.connect(ruta)
+    conn.execute("CREATE TABLE scans (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME NOT NULL, "
+                 "source TEXT NOT NULL, total_articles INTEGER NOT NULL)")
+    conn.execute("CREATE INDEX idx_scans_timestamp ON scans(timestamp)")
+    conn.execute("INSERT INTO scans (timestamp, source, total_articles) VALUES "
+                 "('2025-12-05T02:31:36.636419', 'HN', 10), ('2025-12-05T00:00:00+00:00', 'HN', 1), ('basura', 'HN', 0)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(db, "DATABASE_PATH", ruta)
+
+    try:
+        db.init_db()
+        with db.get_manager().read() as conn:
+            filas = conn.execute("SELECT timestamp, scanned_at FROM scans ORDER BY id").fetchall()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            indices = {f[1] for f in conn.execute("PRAGMA index_list(scans)")}
+    finally:
+        db.close_manager()
+
+    assert [epoch for _, epoch in filas] == [db.to_epoch(filas[0][0]), 1764892800, None]
+    assert version == len(db.MIGRATIONS)
+    assert "idx_scans_scanned_at" in indices and "idx_scans_timestamp" not in indices
+
+
+def test_consultas_usan_rango_sobre_indice(base_temporal, tmp_path):
+    """
+    Test: Tendencias, historial y últimos artículos recorren el índice (scanned_at, id).
+    """
+    db.save_scan(_informe(tmp_path, ["Python news"], harvested_at=datetime.now().isoformat()))
+
+    tendencias = _plan("SELECT k.keyword, SUM(k.frequency) FROM keywords k JOIN scans s ON k.scan_id = s.id "
+                       "WHERE s.scanned_at >= ? GROUP BY k.keyword", (0,))
+    historial = _plan("SELECT id, timestamp, source, total_articles FROM scans WHERE scanned_at >= ? "
+                      "ORDER BY scanned_at DESC, id DESC", (0,))
+
+    assert "COVERING INDEX idx_scans_scanned_at (scanned_at>?)" in tendencias
+    assert "INDEX idx_scans_scanned_at (scanned_at>?)" in historial
+    assert db.get_history(1)[0]["total_articles"] == 1
+    assert db.get_trends(1)[0]["keyword"] == "python"
+
+
+def test_historial_filtra_por_dias(base_temporal, tmp_path):
+    """
+    Test: get_history y get_trends excluyen escaneos fuera de la ventana.
+    """
+    antiguo = (datetime.now() - timedelta(days=10)).isoformat()
+    db.save_scan(_informe(tmp_path, ["Rust news"], harvested_at=antiguo, nombre="viejo.json"))
+    db.save_scan(_informe(tmp_path, ["Python news"], harvested_at=datetime.now().isoformat()))
+
+    assert [s["id"] for s in db.get_history(7)] == [2]
+    assert [s["id"] for s in db.get_history(30)] == [2, 1]
+    assert {t["keyword"] for t in db.get_trends(7)} == {"python", "news"}
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE ROLLUPS DIARIOS DE KEYWORDS
+# ══════════════════════════════════════════════════════════════
+
+def _tendencias_sin_rollup(dias):
+    """Agregación original sobre la tabla keywords (referencia)."""
+    with db.get_manager().read() as conn:
+        return dict(conn.execute(
+            "SELECT k.keyword, SUM(k.frequency) FROM keywords k JOIN scans s ON k.scan_id = s.id "
+            "WHERE s.scanned_at / 86400 >= ? GROUP BY k.keyword",
+            (db._days_ago(dias) // 86400,)
+        ))
+
+
+def test_rollup_coincide_con_agregacion_original(base_temporal, tmp_path):
+    """
+    Test: save_scan mantiene keyword_daily igual a la suma sobre keywords.
+
+    Valida: Dos escaneos del mismo día se acumulan en una sola fila.
+    """
+    ahora = datetime.now().isoformat()
+    db.save_scan(_informe(tmp_path, ["Python news", "Rust news"], harvested_at=ahora, nombre="a.json"))
+    db.save_scan(_informe(tmp_path, ["Python agents"], harvested_at=ahora, nombre="b.json"))
+
+    tendencias = {t["keyword"]: t["frequency"] for t in db.get_trends(7, 100)}
+
+    assert tendencias == _tendencias_sin_rollup(7)
+    assert tendencias["python"] == 2
+    with db.get_manager().read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM keyword_daily WHERE keyword = 'python'").fetchone()[0] == 1
+
+
+def test_rollup_consulta_por_clave_primaria(base_temporal):
+    """
+    Test: La consulta de tendencias solo lee keyword_daily por rango de día.
+    """
+    plan = _plan("SELECT keyword, SUM(frequency) FROM keyword_daily WHERE day >= ? GROUP BY keyword", (0,))
+
+    assert "keyword_daily" in plan and "day>?" in plan
+    assert "keywords" not in plan.replace("keyword_daily", "")
+
+
+def test_rebuild_rollups(base_temporal, tmp_path):
+    """
+    Test: rebuild_rollups reconstruye la tabla desde el histórico.
+    """
+    db.save_scan(_informe(tmp_path, ["Python news"], harvested_at=datetime.now().isoformat()))
+    with db.get_manager().write() as conn:
+        conn.execute("DELETE FROM keyword_daily")
+
+    filas = db.rebuild_rollups()
+
+    assert filas == 2
+    assert {t["keyword"] for t in db.get_trends(7)} == {"python", "news"}
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE BÚSQUEDA FULL-TEXT (FTS5)
+# ══════════════════════════════════════════════════════════════
+
+def test_search_ordena_por_bm25_y_resalta(base_temporal, tmp_path):
+    """
+    Test: search_articles devuelve primero el título más relevante.
+
+    Valida: El snippet escapa HTML y marca las coincidencias con <mark>.
+    """
+    ahora = datetime.now().isoformat()
+    db.save_scan(_informe(tmp_path, [
+        "Rust <b>compilers</b> explained in depth for embedded newcomers",
+        "Rust compiler",
+        "Python news",
+    ], harvested_at=ahora))
+
+    resultados = db.search_articles("rust compiler")
+
+    assert [r["title"] for r in resultados] == [
+        "Rust compiler",
+        "Rust <b>compilers</b> explained in depth for embedded newcomers",
+    ]
+    assert resultados[0]["rank"] < resultados[1]["rank"]
+    assert resultados[1]["snippet"].startswith("<mark>Rust</mark> &lt;b&gt;<mark>compilers</mark>&lt;/b&gt;")
+
+
+def test_search_filtra_por_dias_y_sintaxis_segura(base_temporal, tmp_path):
+    """
+    Test: days excluye escaneos antiguos y la sintaxis FTS del usuario no rompe la consulta.
+    """
+    antiguo = (datetime.now() - timedelta(days=10)).isoformat()
+    db.save_scan(_informe(tmp_path, ["Python release"], harvested_at=antiguo, nombre="viejo.json"))
+    db.save_scan(_informe(tmp_path, ["Python agents"], harvested_at=datetime.now().isoformat()))
+
+    assert [r["title"] for r in db.search_articles("python", days=7)] == ["Python agents"]
+    assert len(db.search_articles("python")) == 2
+    assert len(db.search_articles('python" OR -title:*')) == 0
+    assert db.search_articles("  ¿? ") == []
+
+
+def test_search_sincronizado_por_triggers(base_temporal, tmp_path):
+    """
+    Test: Borrar o editar historias actualiza el índice FTS.
+    """
+    db.save_scan(_informe(tmp_path, ["Quantum chip", "Quantum dots"]))
+    with db.get_manager().write() as conn:
+        conn.execute("UPDATE stories SET title = 'Classical chip' WHERE title = 'Quantum chip'")
+        conn.execute("DELETE FROM stories WHERE title = 'Quantum dots'")
+
+    assert db.search_articles("quantum") == []
+    assert len(db.search_articles("classical")) == 1
+
+
+def test_endpoint_search(base_temporal, tmp_path):
+    """
+    Test: GET /api/search expone search_articles.
+    """
+    from fastapi.testclient import TestClient
+    from app import app
+
+    db.save_scan(_informe(tmp_path, ["Rust compiler news"]))
+    respuesta = TestClient(app).get("/api/search", params={"q": "compiler"})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["count"] == 1
+    assert respuesta.json()["results"][0]["snippet"] == "Rust <mark>compiler</mark> news"
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE DEDUPLICACIÓN DE HISTORIAS (MIGRACIÓN v4)
+# ══════════════════════════════════════════════════════════════
+
+def test_escaneos_repetidos_no_duplican_historias(base_temporal, tmp_path):
+    """
+    Test: La misma URL en varios escaneos es una sola historia.
+
+    Valida: articles guarda una observación por escaneo y get_latest no repite.
+    """
+    ayer = (datetime.now() - timedelta(days=1)).isoformat()
+    db.save_scan(_informe(tmp_path, ["Python release", "Rust news"], harvested_at=ayer, nombre="a.json"))
+    db.save_scan(_informe(tmp_path, ["Rust news", "Python release"], harvested_at=datetime.now().isoformat()))
+
+    stats = db.get_stats()
+    ultimos = db.get_latest(10)
+
+    assert (stats["total_stories"], stats["total_articles"]) == (2, 4)
+    assert [(a["title"], a["score"]) for a in ultimos] == [("Python release", 1), ("Rust news", 0)]
+    assert len(db.search_articles("rust")) == 1
+
+
+def test_informe_antiguo_no_retrocede_historia(base_temporal, tmp_path):
+    """
+    Test: Ingerir tarde un informe más antiguo no pisa la última observación.
+    """
+    nuevo = datetime.now().isoformat()
+    viejo = (datetime.now() - timedelta(days=3)).isoformat()
+    db.ingest_articles([{"title": "GPU prices (updated)", "url": "https://example.com/gpu", "score": 90}],
+                       {"harvested_at": nuevo})
+    db.ingest_articles([{"title": "GPU prices", "url": "https://example.com/gpu", "score": 5}],
+                       {"harvested_at": viejo})
+
+    ultimo = db.get_latest(1)[0]
+
+    assert (ultimo["title"], ultimo["score"]) == ("GPU prices (updated)", 90)
+    with db.get_manager().read() as conn:
+        assert conn.execute("SELECT first_scan_id, last_scan_id FROM stories").fetchone() == (1, 1)
+
+
+def test_migracion_colapsa_duplicados(tmp_path, monkeypatch):
+    """
+    Test: Una base v3 con artículos repetidos se migra a historias únicas.
+
+    Valida: Se conservan los ids de artículo y la búsqueda pasa a stories_fts.
+    """
+    import sqlite3
+    ruta = str(tmp_path / "v3.db")
+    monkeypatch.setattr(db, "DATABASE_PATH", ruta)
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS[:3])
+    db.init_db()
+    db.close_manager()
+
+    conn = sqlite3.connect(ruta)
+    conn.executemany("INSERT INTO scans (timestamp, scanned_at, source, total_articles) VALUES (?, ?, 'HN', 2)",
+                     [("2025-12-04T10:00:00", 1764842400), ("2025-12-05T10:00:00", 1764928800)])
+    conn.executemany("INSERT INTO articles (scan_id, title, url, score, source, timestamp) VALUES (?, ?, ?, ?, 'HN', 'x')", [
+        (1, "Old title", "https://a", 10),
+        (1, "Other", "https://b", 3),
+        (2, "New title", "https://a", 50),
+        (2, "New title", "https://a", 70),   # Repetida dentro del mismo escaneo
+        (2, "No link", "", 1),
+    ])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.undo()
+    monkeypatch.setattr(db, "DATABASE_PATH", ruta)
+    try:
+        db.init_db()
+        with db.get_manager().read() as conn:
+            historias = conn.execute("SELECT url, title, first_scan_id, last_scan_id, last_score "
+                                     "FROM stories ORDER BY id").fetchall()
+            observaciones = conn.execute("SELECT id, scan_id, score FROM articles ORDER BY id").fetchall()
+            tablas = {f[0] for f in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        encontrados = [r["title"] for r in db.search_articles("title")]
+    finally:
+        db.close_manager()
+
+    assert historias == [
+        ("https://a", "New title", 1, 2, 70),
+        ("https://b", "Other", 1, 1, 3),
+        ("", "No link", 2, 2, 1),
+    ]
+    assert observaciones == [(1, 1, 10), (2, 1, 3), (3, 2, 70), (5, 2, 1)]
+    assert "articles_fts" not in tablas
+    assert encontrados == ["New title"]
+
+
+def test_latest_usa_indice_de_historias(base_temporal):
+    """
+    Test: get_latest recorre idx_stories_latest sin ordenar en memoria.
+    """
+    plan = _plan("SELECT title FROM stories ORDER BY last_seen_at DESC, last_score DESC LIMIT 10")
+
+    assert "idx_stories_latest" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL ACCESO ASÍNCRONO (AsyncDatabase)
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_async_lecturas_fuera_del_event_loop(base_temporal):
+    """
+    Test: Las lecturas se ejecutan en hilos del pool, no en el del event loop.
+
+    Valida: Varias lecturas lentas se solapan en vez de serializarse.
+    """
+    import asyncio
+    import time
+    database = db.AsyncDatabase(read_workers=4)
+    hilos = set()
+
+    def lectura_lenta():
+        hilos.add(threading.current_thread().name)
+        time.sleep(0.1)
+        return db.get_stats()["total_scans"]
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(database.read(lectura_lenta) for _ in range(4)))
+    transcurrido = time.perf_counter() - inicio
+    database.close()
+
+    assert resultados == [0, 0, 0, 0]
+    assert all(nombre.startswith("db-read") for nombre in hilos)
+    assert transcurrido < 0.3
+
+
+@pytest.mark.asyncio
+async def test_async_escrituras_con_contrapresion(base_temporal, tmp_path):
+    """
+    Test: Con max_pending_writes escrituras en curso, la siguiente se rechaza.
+    """
+    import asyncio
+    database = db.AsyncDatabase(max_pending_writes=1)
+    liberar = threading.Event()
+
+    def escritura_bloqueada():
+        liberar.wait(5)
+        return db.save_scan(_informe(tmp_path, ["Python news"]))
+
+    primera = asyncio.ensure_future(database.write(escritura_bloqueada))
+    await asyncio.sleep(0.05)
+    with pytest.raises(db.WriteQueueFull):
+        await database.write(db.get_stats)
+    liberar.set()
+
+    assert await primera == 1
+    assert database.stats()["rejected_writes"] == 1
+    assert database.stats()["pending_writes"] == 0
+    assert await database.write(db.get_stats)  # El hueco vuelve a estar libre
+    database.close()
+
+
+@pytest.mark.asyncio
+async def test_async_modo_en_linea(base_temporal):
+    """
+    Test: read_workers=0 ejecuta en el propio hilo (línea base sin pool).
+    """
+    database = db.AsyncDatabase(read_workers=0)
+
+    hilo = await database.read(lambda: threading.current_thread())
+
+    assert hilo is threading.current_thread()
+
+
+def test_endpoint_scan_503_con_cola_llena(base_temporal, monkeypatch):
+    """
+    Test: POST /api/scan responde 503 con Retry-After si la cola de escritura está llena.
+    """
+    from fastapi.testclient import TestClient
+    import app as aplicacion
+
+    database = db.AsyncDatabase(max_pending_writes=0)
+    monkeypatch.setattr(aplicacion, "database", database)
+
+    respuesta = TestClient(aplicacion.app).post("/api/scan")
+
+    assert respuesta.status_code == 503
+    assert respuesta.headers["retry-after"] == "1"
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE PAGINACIÓN POR CURSOR Y EXPORTACIÓN
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def historial(base_temporal):
+    """Fixture con 3 escaneos de 10 artículos distintos cada uno."""
+    for escaneo in range(3):
+        db.ingest_articles(
+            [{"title": f"Story {escaneo}-{i}", "url": f"https://example.com/{escaneo}/{i}", "score": i}
+             for i in range(10)],
+            {"harvested_at": f"2025-12-0{escaneo + 1}T10:00:00"}
+        )
+    return base_temporal
+
+
+def test_paginas_recorren_todo_sin_solaparse(historial):
+    """
+    Test: Siguiendo next_cursor se obtiene cada artículo una vez, del más nuevo al más antiguo.
+    """
+    ids, cursor, paginas = [], None, 0
+    while True:
+        filas, cursor = db.get_articles_page(cursor, limit=7)
+        ids.extend(fila["id"] for fila in filas)
+        paginas += 1
+        if cursor is None:
+            break
+
+    assert ids == list(range(30, 0, -1))
+    assert paginas == 5
+    assert filas[-1]["title"] == "Story 0-0" and filas[-1]["scan_timestamp"] == "2025-12-01T10:00:00"
+
+
+def test_iter_pages_exporta_en_orden(historial):
+    """
+    Test: iter_pages recorre las keywords de la más antigua a la más nueva por lotes.
+    """
+    lotes = list(db.iter_pages(db.get_keywords_page, batch_size=4))
+    ids = [fila["id"] for lote in lotes for fila in lote]
+
+    assert ids == sorted(ids) and len(ids) == len(set(ids))
+    assert all(len(lote) <= 4 for lote in lotes)
+    assert set(lotes[0][0]) == set(db.KEYWORD_FIELDS)
+
+
+def test_paginacion_sin_offset(historial):
+    """
+    Test: Cada página es una búsqueda por rango sobre el rowid, sin OFFSET.
+    """
+    sql = db._ARTICLES_KEYSET.format(schema="main", op="<", order="DESC")
+    plan = _plan(sql, (10, 5))
+
+    assert "OFFSET" not in sql.upper()
+    assert "INTEGER PRIMARY KEY (rowid<?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_endpoints_paginados_y_export(historial):
+    """
+    Test: /api/articles pagina por cursor y /api/export emite NDJSON y CSV.
+
+    Valida: after reanuda la exportación.
+    """
+    import csv
+    import io
+    from fastapi.testclient import TestClient
+    from app import app
+
+    http = TestClient(app)
+    primera = http.get("/api/articles", params={"limit": 25}).json()
+    segunda = http.get("/api/articles", params={"limit": 25, "cursor": primera["next_cursor"]}).json()
+    ndjson = http.get("/api/export/articles")
+    filas_csv = list(csv.DictReader(io.StringIO(http.get("/api/export/articles", params={"format": "csv"}).text)))
+    reanudada = http.get("/api/export/articles", params={"after": 28}).text.splitlines()
+
+    assert (primera["count"], segunda["count"], segunda["next_cursor"]) == (25, 5, None)
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(linea)["id"] for linea in ndjson.text.splitlines()] == list(range(1, 31))
+    assert len(filas_csv) == 30 and filas_csv[0]["url"] == "https://example.com/0/0"
+    assert [json.loads(linea)["id"] for linea in reanudada] == [29, 30]
+    assert http.get("/api/export/scans").status_code == 422
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE ARCHIVADO MENSUAL
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def archivado(base_temporal, tmp_path):
+    """
+    Fixture con dos escaneos de hace 200 y 170 días y uno reciente.
+
+    Returns:
+        Meses UTC ("YYYY-MM") de los dos escaneos antiguos
+    """
+    fechas = [datetime.now() - timedelta(days=dias) for dias in (200, 170, 1)]
+    for i, fecha in enumerate(fechas):
+        db.save_scan(_informe(tmp_path, [f"Story {i}", "Python news"], harvested_at=fecha.isoformat(),
+                              nombre=f"{i}.json"))
+    return [time.strftime("%Y-%m", time.gmtime(db.to_epoch(f.isoformat()))) for f in fechas[:2]]
+
+
+def test_archivado_mueve_escaneos_por_mes(archivado, tmp_path):
+    """
+    Test: Los escaneos antiguos pasan a un fichero por mes y salen de la base caliente.
+
+    Valida: El catálogo guarda los contadores de cada archivo.
+    """
+    meses = db.archive_scans(older_than_days=90, vacuum=True)
+
+    assert [m["month"] for m in meses] == sorted(set(archivado))
+    assert sum(m["scans"] for m in meses) == 2 and sum(m["articles"] for m in meses) == 4
+    for mes in archivado:
+        assert (tmp_path / "archive" / f"intelligence-{mes}.db").exists()
+    with db.get_manager().read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM scans").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0] == 4  # Las historias se quedan
+    assert db.get_stats()["total_scans"] == 3
+    assert db.get_stats()["total_articles"] == 6
+
+
+def test_archivado_repetido_no_duplica(archivado):
+    """
+    Test: Volver a archivar (p. ej. tras una interrupción) no duplica filas.
+    """
+    db.archive_scans(older_than_days=90)
+    # Simula una interrupción entre la copia y el borrado: las filas vuelven a la base caliente
+    ruta = db.archive_paths()[0]
+    with db.get_manager().write() as conn:
+        conn.execute("ATTACH DATABASE ? AS copia", (ruta,))
+        conn.execute("INSERT INTO main.scans SELECT * FROM copia.scans")
+        conn.execute("INSERT INTO main.articles SELECT * FROM copia.articles")
+        conn.commit()
+        conn.execute("DETACH DATABASE copia")
+
+    segunda = db.archive_scans(older_than_days=90)
+
+    assert sum(m["scans"] for m in segunda) == 1 and sum(m["articles"] for m in segunda) == 2
+    assert db.get_stats()["total_scans"] == 3
+    assert [s["id"] for s in db.get_history(365)] == [3, 2, 1]
+
+
+def test_archivado_no_borra_escaneos_escritos_tras_la_copia(archivado, monkeypatch):
+    """
+    Test: Un escaneo del mismo mes guardado entre la copia y el borrado sigue en la base caliente.
+
+    Valida: El borrado solo quita las filas que ya están en el archivo.
+    """
+    tardio = ("INSERT INTO main.scans (timestamp, source, total_articles, scanned_at) "
+              "SELECT timestamp, 'tardio', 0, scanned_at FROM archive.scans ORDER BY id LIMIT 1")
+    monkeypatch.setattr(db, "_ARCHIVE_PURGE", (tardio,) + db._ARCHIVE_PURGE)
+
+    meses = db.archive_scans(older_than_days=90)
+
+    with db.get_manager().read() as conn:
+        fuentes = [fila[0] for fila in conn.execute("SELECT source FROM scans ORDER BY id")]
+    assert sum(m["scans"] for m in meses) == 2
+    assert fuentes == ["Test"] + ["tardio"] * len(meses)
+
+
+def test_consultas_incluyen_archivos(archivado):
+    """
+    Test: Historial, tendencias, exportación y rebuild_rollups ven los escaneos archivados.
+    """
+    tendencias = {t["keyword"]: t["frequency"] for t in db.get_trends(365, 100)}
+    db.archive_scans(older_than_days=90)
+
+    assert [s["id"] for s in db.get_history(7)] == [3]
+    assert [s["id"] for s in db.get_history(365)] == [3, 2, 1]
+    assert [f["id"] for lote in db.iter_pages(db.get_articles_page) for f in lote] == list(range(1, 7))
+    assert [f["title"] for f in db.get_articles_page(archive=db.archive_paths()[0])[0]] == ["Python news", "Story 0"]
+    assert db.rebuild_rollups() > 0
+    assert {t["keyword"]: t["frequency"] for t in db.get_trends(365, 100)} == tendencias
+
+
+def test_endpoint_articles_incluye_archivos(archivado):
+    """
+    Test: /api/articles sigue paginando por los escaneos archivados.
+
+    Valida: El cursor pasa de la base caliente a los archivos sin saltar filas.
+    """
+    from fastapi.testclient import TestClient
+    from app import app
+
+    db.archive_scans(older_than_days=90)
+    http = TestClient(app)
+    ids, cursor = [], None
+    while True:
+        parametros = {"limit": 4} if cursor is None else {"limit": 4, "cursor": cursor}
+        pagina = http.get("/api/articles", params=parametros).json()
+        ids += [fila["id"] for fila in pagina["articles"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == list(range(6, 0, -1))
+    assert [f["id"] for f in db.history_page(db.get_keywords_page, limit=100)[0]] == list(range(9, 0, -1))
+
+
+def test_endpoint_export_incluye_archivos(archivado):
+    """
+    Test: /api/export recorre los archivos mensuales antes que la base caliente.
+    """
+    from fastapi.testclient import TestClient
+    from app import app
+
+    db.archive_scans(older_than_days=90)
+    lineas = TestClient(app).get("/api/export/keywords").text.splitlines()
+
+    assert len(lineas) == 9  # 3 escaneos x 3 keywords
+    assert [json.loads(linea)["scan_id"] for linea in lineas] == [1, 1, 1, 2, 2, 2, 3, 3, 3]
+
+
+def test_export_reanuda_con_archivos_desordenados(base_temporal, tmp_path):
+    """
+    Test: after reanuda la exportación aunque los ids de archivos y base caliente se crucen.
+
+    Valida:
+        - Un informe antiguo cargado tarde (ids altos en un mes viejo) sale en orden de id
+        - Reanudar con el último id recibido no salta ni repite filas
+    """
+    from fastapi.testclient import TestClient
+    from app import app
+
+    for i, dias in enumerate((1, 200, 170)):  # El reciente primero: ids 1-2
+        fecha = (datetime.now() - timedelta(days=dias)).isoformat()
+        db.save_scan(_informe(tmp_path, [f"Story {i}", "Python news"], harvested_at=fecha, nombre=f"{i}.json"))
+    db.archive_scans(older_than_days=90)
+
+    ids = [f["id"] for lote in db.iter_pages(db.get_articles_page, batch_size=4) for f in lote]
+    reanudados = [f["id"] for lote in db.iter_pages(db.get_articles_page, after=4) for f in lote]
+    lineas = TestClient(app).get("/api/export/articles", params={"after": 2}).text.splitlines()
+
+    assert len(db.archive_paths()) == 2
+    assert ids == list(range(1, 7))
+    assert reanudados == [5, 6]
+    assert [json.loads(linea)["id"] for linea in lineas] == [3, 4, 5, 6]
+
+
+def test_iter_pages_reanuda_tras_archivar(archivado):
+    """
+    Test: Si se archiva a mitad de una exportación, after sigue el hilo por id.
+    """
+    primeras = [f["id"] for f in next(db.iter_pages(db.get_articles_page, batch_size=3))]
+    db.archive_scans(older_than_days=90)
+    resto = [f["id"] for lote in db.iter_pages(db.get_articles_page, after=primeras[-1]) for f in lote]
+
+    assert primeras + resto == list(range(1, 7))
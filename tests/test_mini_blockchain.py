@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+🧪 NEO-TOKYO DEV - Test Suite para mini_blockchain
+"""
+
+import pytest
+import hashlib
+
+# Importar el módulo a testear
+import sys
+sys.path.insert(0, '..')
+from mini_blockchain import Block, Blockchain, BlockStore, ParallelMiner, difficulty_target, find_nonce
+
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture(scope="module")
+def minero():
+    """Fixture con un ParallelMiner de 3 procesos y tramos pequeños (muchas tareas)."""
+    with ParallelMiner(workers=3, chunk_size=500) as miner:
+        yield miner
+
+
+def _primer_nonce_hex(prefijo, dificultad, inicio, fin):
+    """Referencia: el bucle original con hexdigest().startswith()."""
+    objetivo = "0" * dificultad
+    for nonce in range(inicio, fin):
+        if hashlib.sha256(prefijo + str(nonce).encode()).hexdigest().startswith(objetivo):
+            return nonce
+    return None
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL HASHING CON MIDSTATE
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.parametrize("dificultad", [0, 1, 2, 3])
+@pytest.mark.parametrize("inicio,fin", [(0, 3000), (990, 1010), (999_500, 1_002_500), (123_456, 123_456)])
+def test_find_nonce_igual_que_hexdigest(dificultad, inicio, fin):
+    """
+    Test: find_nonce encuentra el mismo nonce que el bucle con hexdigest.
+
+    Valida: Rangos que cruzan los cambios de millar (999 -> 1000) y rangos vacíos.
+    """
+    prefijo = "1 2025-12-05 02:31:36.636419 Alice envía 10 BTC ".encode() + b"0" * 64
+
+    assert find_nonce(prefijo, dificultad, inicio, fin) == _primer_nonce_hex(prefijo, dificultad, inicio, fin)
+
+
+def test_difficulty_target_equivale_a_ceros_hex():
+    """
+    Test: digest < difficulty_target(n) si y solo si el hex empieza por n ceros.
+    """
+    for dificultad in range(0, 6):
+        objetivo = difficulty_target(dificultad)
+        for digest in (bytes(32), b"\x00\x00\x0f" + b"\xff" * 29, b"\x00\x00\x10" + bytes(29), b"\xff" * 32):
+            assert (digest < objetivo) == digest.hex().startswith("0" * dificultad)
+
+
+def test_bloque_serie_mantiene_el_formato_de_hash():
+    """
+    Test: El minado rápido da el mismo nonce y hash que el formato original.
+
+    Valida: Cadenas minadas antes siguen validando (_calculate_hash no cambia).
+    """
+    cadena = Blockchain(difficulty=3)
+    bloque = cadena.add_block("Bob envía 5 BTC a Charlie")
+    prefijo = bloque._hash_prefix().encode()
+
+    assert bloque.nonce == _primer_nonce_hex(prefijo, 3, 0, 10**7)
+    assert bloque.hash == bloque._calculate_hash()
+    assert cadena.is_valid()
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL MINADO MULTIPROCESO
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.parametrize("dificultad", [1, 2, 3])
+def test_paralelo_encuentra_el_mismo_nonce_que_serie(minero, dificultad):
+    """
+    Test: ParallelMiner devuelve el nonce más bajo, igual que _mine_block.
+
+    Valida: El hash coincide con _calculate_hash del bloque.
+    """
+    bloque = Block(index=1, data="Alice envía 10 BTC a Bob", previous_hash="0" * 64, difficulty=dificultad)
+
+    nonce, hash_ = minero.mine(bloque)
+
+    assert (nonce, hash_) == (bloque.nonce, bloque.hash)
+
+
+def test_search_respeta_el_rango(minero):
+    """
+    Test: search solo prueba nonces de [start, stop) y devuelve None si no hay ninguno.
+    """
+    prefijo = b"prefijo"
+    objetivo = next(n for n in range(1234, 10**6)
+                    if hashlib.sha256(prefijo + str(n).encode()).hexdigest().startswith("00"))
+
+    assert minero.search(prefijo, 2, start=1234) == objetivo
+    assert minero.search(prefijo, 2, start=1234, stop=objetivo) is None
+    assert minero.search(prefijo, 64, start=0, stop=5000) is None
+
+
+def test_blockchain_con_minero_es_valida(minero):
+    """
+    Test: Una cadena minada en paralelo pasa is_valid.
+    """
+    cadena = Blockchain(difficulty=2, miner=minero)
+    cadena.add_block("Bob envía 5 BTC a Charlie")
+    cadena.add_block("Charlie envía 2 BTC a Alice")
+
+    assert cadena.is_valid()
+    assert all(bloque.hash.startswith("00") for bloque in cadena.chain)
+
+
+def test_chunk_size_invalido():
+    """
+    Test: chunk_size debe ser al menos 1.
+    """
+    with pytest.raises(ValueError):
+        ParallelMiner(chunk_size=0)
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL ALMACÉN EN DISCO (BlockStore)
+# ══════════════════════════════════════════════════════════════
+
+def test_open_guarda_y_reabre_sin_minar(tmp_path, monkeypatch):
+    """
+    Test: Una cadena reabierta tiene los mismos bloques y no se vuelve a minar.
+    """
+    cadena = Blockchain.open(str(tmp_path / "cadena"), difficulty=2)
+    cadena.add_block("Alice envía 10 BTC a Bob")
+    cadena.add_block("Datos con acentos: ñandú €")
+    hashes = [bloque.hash for bloque in cadena.chain]
+    timestamp = cadena.chain[2].timestamp
+    cadena.close()
+
+    monkeypatch.setattr(Block, "_mine_block", lambda self: pytest.fail("no se debe minar al abrir"))
+    reabierta = Blockchain.open(str(tmp_path / "cadena"))
+
+    assert [bloque.hash for bloque in reabierta.chain] == hashes
+    assert reabierta.difficulty == 2
+    assert reabierta.chain[-1].data == "Datos con acentos: ñandú €"
+    assert reabierta.chain[2].timestamp == timestamp
+    assert reabierta.is_valid()
+    reabierta.close()
+
+
+def test_store_busca_por_altura_y_hash(tmp_path):
+    """
+    Test: get(altura) y get_by_hash(hash) devuelven el bloque sin recorrer la cadena.
+
+    Valida: La tabla hash crece (más bloques que SLOTS_INICIALES / 2).
+    """
+    cadena = Blockchain.open(str(tmp_path / "cadena"), difficulty=0)
+    for i in range(BlockStore.SLOTS_INICIALES):
+        cadena.add_block(f"tx {i}")
+    store = cadena.store
+
+    assert len(store) == BlockStore.SLOTS_INICIALES + 1
+    for altura in (0, 1, 700, len(store) - 1):
+        bloque = store.get(altura)
+        assert store.height_of(bloque.hash) == altura
+        assert store.get_by_hash(bloque.hash).data == bloque.data
+    assert store.get_by_hash("ab" * 32) is None
+    assert store.height_of("no es hex") is None
+    with pytest.raises(IndexError):
+        store.get(len(store))
+    cadena.close()
+
+
+def test_store_reparte_en_segmentos(tmp_path):
+    """
+    Test: Los bloques pasan a un segmento nuevo cuando no caben en el actual.
+    """
+    with BlockStore(str(tmp_path / "store"), segment_size=300) as store:
+        bloques = [Block(index=0, data="g", previous_hash="0" * 64, difficulty=0)]
+        for i in range(1, 6):
+            bloques.append(Block(index=i, data="x" * 150, previous_hash=bloques[-1].hash, difficulty=0))
+        bloques.append(Block(index=6, data="y" * 1000, previous_hash=bloques[-1].hash, difficulty=0))
+        for bloque in bloques:
+            store.append(bloque)
+
+        assert [store.get(i).hash for i in range(7)] == [b.hash for b in bloques]
+    assert len(list((tmp_path / "store").glob("blocks-*.seg"))) > 3
+
+
+def test_store_append_fuera_de_orden(tmp_path):
+    """
+    Test: Solo se puede añadir la siguiente altura (append-only).
+    """
+    with BlockStore(str(tmp_path / "store")) as store:
+        with pytest.raises(ValueError):
+            store.append(Block(index=3, data="x", previous_hash="0" * 64, difficulty=0))
+
+
+def test_store_fichero_invalido(tmp_path):
+    """
+    Test: Un blocks.idx que no es de BlockStore se rechaza.
+    """
+    (tmp_path / "store").mkdir()
+    (tmp_path / "store" / "blocks.idx").write_bytes(b"basura" * 10)
+
+    with pytest.raises(ValueError):
+        BlockStore(str(tmp_path / "store"))
+
+
+def test_store_repara_tabla_hash_tras_corte(tmp_path):
+    """
+    Test: Si la tabla hash quedó atrás (corte tras confirmar el bloque) se completa al abrir.
+    """
+    ruta = str(tmp_path / "cadena")
+    cadena = Blockchain.open(ruta, difficulty=0)
+    ultimo = cadena.add_block("último")
+    store = cadena.store
+    store._CABECERA_HASHES.pack_into(store._hashes, 0, store._MAGIA_HASHES, store._slots, 1)
+    cadena.close()
+
+    with BlockStore(ruta) as reabierto:
+        assert reabierto.height_of(ultimo.hash) == 1
+
+
+def test_store_publica_bloques_solo_en_flush(tmp_path):
+    """
+    Test: Un bloque añadido no se confirma en disco hasta flush().
+    """
+    ruta = str(tmp_path / "cadena")
+    cadena = Blockchain.open(ruta, difficulty=0)
+    cadena.flush()
+    cadena.add_block("sin flush")
+
+    with BlockStore(ruta) as otro:
+        assert len(otro) == 1
+    cadena.flush()
+    with BlockStore(ruta) as otro:
+        assert len(otro) == 2
+    cadena.close()
+
+
+def test_store_descarta_cola_corrupta_al_abrir(tmp_path):
+    """
+    Test: Si el último bloque publicado no está en disco se descarta al abrir.
+
+    Valida: La cadena reabierta es válida y admite un bloque nuevo a esa altura.
+    """
+    ruta = str(tmp_path / "cadena")
+    cadena = Blockchain.open(ruta, difficulty=0)
+    cadena.add_block("bueno")
+    perdido = cadena.add_block("perdido")
+    segmento, offset, longitud, _ = cadena.store._registro(2)
+    cadena.close()
+
+    with open(tmp_path / "cadena" / f"blocks-{segmento:05d}.seg", "r+b") as f:
+        f.seek(offset)
+        f.write(bytes(longitud))  # El bloque no llegó a disco
+
+    reabierta = Blockchain.open(ruta)
+    assert len(reabierta.chain) == 2
+    assert reabierta.store.get_by_hash(perdido.hash) is None
+    assert reabierta.is_valid()
+    assert reabierta.add_block("otro").index == 2
+    reabierta.close()
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE VALIDACIÓN INCREMENTAL Y AUDITORÍA PARALELA
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def cadena_larga():
+    """Fixture con una cadena en memoria de 40 bloques (dificultad 1)."""
+    cadena = Blockchain(difficulty=1)
+    for i in range(39):
+        cadena.add_block(f"tx {i}")
+    return cadena
+
+
+def _contar_hashes(monkeypatch):
+    """Cuenta las llamadas a Block._calculate_hash."""
+    llamadas = []
+    original = Block._calculate_hash
+    monkeypatch.setattr(Block, "_calculate_hash", lambda self: llamadas.append(self.index) or original(self))
+    return llamadas
+
+
+def test_is_valid_solo_revisa_bloques_nuevos(cadena_larga, monkeypatch):
+    """
+    Test: Tras una validación completa, is_valid(incremental=True) solo recalcula los bloques añadidos.
+    """
+    assert cadena_larga.is_valid()
+    cadena_larga.add_block("nuevo")
+    llamadas = _contar_hashes(monkeypatch)
+
+    assert cadena_larga.is_valid(incremental=True)
+    assert llamadas == [40]
+    assert cadena_larga.is_valid()
+    assert len(llamadas) == 1 + 40
+
+
+def test_is_valid_detecta_manipulacion_en_el_sitio(cadena_larga):
+    """
+    Test: Modificar en el sitio un bloque ya validado se detecta con is_valid() sin argumentos.
+
+    Valida:
+        - La validación incremental no lo ve (queda por debajo del checkpoint)
+        - Al restaurarlo la cadena vuelve a ser válida
+    """
+    assert cadena_larga.is_valid()
+    original = cadena_larga.chain[5].data
+    cadena_larga.chain[5].data = "Alice envía 1000 BTC a Alice (FRAUDE!)"
+
+    assert cadena_larga.is_valid(incremental=True)
+    assert not cadena_larga.is_valid()
+    cadena_larga.chain[5].data = original
+    assert cadena_larga.is_valid()
+
+
+def test_is_valid_detecta_bloque_reemplazado(cadena_larga):
+    """
+    Test: Sustituir el último bloque validado en la lista también se detecta.
+    """
+    assert cadena_larga.is_valid()
+    ultimo = cadena_larga.chain[-1]
+    cadena_larga.chain[-1] = Block(index=ultimo.index, data="otro", previous_hash="f" * 64, difficulty=1)
+
+    assert not cadena_larga.is_valid()
+
+
+def test_is_valid_detecta_bloque_reemplazado_bajo_checkpoint(cadena_larga, monkeypatch):
+    """
+    Test: Sustituir un bloque por debajo del checkpoint por otro bien minado.
+
+    Valida: is_valid(incremental=True) vuelve a validar desde esa altura, no desde el génesis.
+    """
+    assert cadena_larga.is_valid()
+    cadena_larga.chain[5] = Block(index=5, data="FRAUDE", previous_hash=cadena_larga.chain[4].hash, difficulty=1)
+    llamadas = _contar_hashes(monkeypatch)
+
+    assert not cadena_larga.is_valid(incremental=True)
+    assert llamadas == [5]
+    assert not cadena_larga.is_valid()
+
+
+def test_checkpoint_no_depende_de_otras_cadenas(cadena_larga, monkeypatch):
+    """
+    Test: Editar bloques de otra cadena no obliga a revalidar esta.
+    """
+    assert cadena_larga.is_valid()
+    otra = Blockchain(difficulty=1)
+    otra.chain[0].data = "otro génesis"
+    otra.chain[0] = Block(index=0, data="otro", previous_hash="0", difficulty=1)
+    llamadas = _contar_hashes(monkeypatch)
+
+    assert cadena_larga.is_valid(incremental=True)
+    assert llamadas == []
+
+
+@pytest.mark.parametrize("altura,campo", [(1, "data"), (7, "data"), (8, "previous_hash"), (33, "nonce")])
+def test_audit_igual_que_is_valid(cadena_larga, capsys, altura, campo):
+    """
+    Test: audit (tramos en varios procesos) da el mismo veredicto y mensaje que is_valid.
+
+    Valida: Fallos dentro de un tramo y en la frontera entre tramos (altura 8).
+    """
+    assert cadena_larga.audit(workers=2, chunk_size=7)
+    bloque = cadena_larga.chain[altura]
+    setattr(bloque, campo, {"data": "x", "previous_hash": "a" * 64, "nonce": bloque.nonce + 1}[campo])
+    capsys.readouterr()
+
+    assert not cadena_larga.is_valid()
+    esperado = capsys.readouterr().out
+    assert not cadena_larga.audit(workers=2, chunk_size=7)
+    assert capsys.readouterr().out == esperado
+
+
+def test_audit_sobre_block_store(tmp_path):
+    """
+    Test: Con BlockStore cada proceso lee su tramo del disco y la auditoría deja checkpoint.
+    """
+    cadena = Blockchain.open(str(tmp_path / "cadena"), difficulty=1)
+    for i in range(25):
+        cadena.add_block(f"tx {i}")
+
+    assert cadena.audit(workers=2, chunk_size=6)
+    assert cadena._verified_height() == 25
+    cadena.close()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+🧪 NEO-TOKYO DEV - Test Suite para response_cache y la caché de app.py
+"""
+
+import pytest
+import json
+
+# Importar el módulo a testear
+import sys
+sys.path.insert(0, '..')
+import database_manager as db
+from response_cache import ResponseCache, etag_matches
+
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+class RelojFalso:
+    """Reloj controlable para probar la caducidad sin sleep()."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    """
+    Fixture con un TestClient de app.py sobre una base temporal y caché vacía.
+
+    Returns:
+        (cliente, ruta del informe que usa POST /api/scan)
+    """
+    from fastapi.testclient import TestClient
+    import app as aplicacion
+
+    monkeypatch.setattr(db, "DATABASE_PATH", str(tmp_path / "intelligence.db"))
+    monkeypatch.setattr(aplicacion, "response_cache", ResponseCache(max_entries=16, ttl=60))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "output").mkdir()
+    db.init_db()
+    yield TestClient(aplicacion.app), tmp_path / "output" / "intelligence_report.json"
+    db.close_manager()
+
+
+def _escribir_informe(ruta, titulos):
+    ruta.write_text(json.dumps({
+        "metadata": {"harvested_at": "2025-12-05T02:31:36", "sources": ["Test"]},
+        "articles": [{"title": t, "url": f"https://example.com/{t}", "score": 1} for t in titulos],
+    }), encoding="utf-8")
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE ResponseCache
+# ══════════════════════════════════════════════════════════════
+
+def test_cache_hit_y_miss():
+    """
+    Test: Una entrada se sirve mientras no cambie la generación.
+    """
+    cache = ResponseCache()
+
+    assert cache.get("k", 0) is None
+    entrada = cache.put("k", 0, b"{}")
+
+    assert cache.get("k", 0) == entrada
+    assert cache.get("k", 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_caduca_por_ttl():
+    """
+    Test: Las entradas caducan tras ttl segundos aunque no haya escaneos.
+    """
+    reloj = RelojFalso()
+    cache = ResponseCache(ttl=30, clock=reloj)
+    cache.put("k", 0, b"{}")
+
+    reloj.ahora += 29
+    assert cache.get("k", 0) is not None
+    reloj.ahora += 2
+    assert cache.get("k", 0) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_expulsa_lru():
+    """
+    Test: Al superar max_entries se expulsa la entrada usada hace más tiempo.
+    """
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 0, b"a")
+    cache.put("b", 0, b"b")
+    cache.get("a", 0)          # "b" pasa a ser la menos reciente
+    cache.put("c", 0, b"c")
+
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) is not None
+    assert cache.evictions == 1
+
+
+def test_cache_desactivada_con_ttl_cero():
+    """
+    Test: ttl=0 desactiva la caché pero sigue calculando el ETag.
+    """
+    cache = ResponseCache(ttl=0)
+    entrada = cache.put("k", 0, b"{}")
+
+    assert entrada.etag.startswith('"')
+    assert cache.get("k", 0) is None
+    assert cache.stats()["enabled"] is False
+
+
+def test_etag_matches():
+    """
+    Test: If-None-Match acepta listas, validadores débiles y '*'.
+    """
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches('*', '"x"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE LA CACHÉ EN LOS ENDPOINTS
+# ══════════════════════════════════════════════════════════════
+
+def test_endpoint_cacheado_no_toca_la_base(cliente, monkeypatch):
+    """
+    Test: La segunda petición sale de la caché sin llamar a database_manager.
+    """
+    http, _ = cliente
+    primera = http.get("/api/stats")
+
+    monkeypatch.setattr(db, "get_stats", lambda: pytest.fail("la caché debió responder"))
+    segunda = http.get("/api/stats")
+
+    assert segunda.json() == primera.json()
+    assert segunda.headers["etag"] == primera.headers["etag"]
+    assert http.get("/api/cache").json()["cache"]["hits"] == 1
+
+
+def test_if_none_match_devuelve_304(cliente):
+    """
+    Test: El sondeo del dashboard con If-None-Match recibe 304 sin cuerpo.
+    """
+    http, _ = cliente
+    etag = http.get("/api/latest").headers["etag"]
+
+    respuesta = http.get("/api/latest", headers={"If-None-Match": etag})
+
+    assert respuesta.status_code == 304
+    assert respuesta.content == b""
+    assert respuesta.headers["etag"] == etag
+    assert http.get("/api/cache").json()["cache"]["not_modified"] == 1
+
+
+def test_scan_invalida_la_cache(cliente):
+    """
+    Test: POST /api/scan sube la generación y las respuestas se recalculan.
+
+    Valida: El ETag antiguo deja de coincidir (200 con datos nuevos).
+    """
+    http, informe = cliente
+    antes = http.get("/api/latest")
+    _escribir_informe(informe, ["Python release"])
+
+    assert http.post("/api/scan").status_code == 200
+    despues = http.get("/api/latest", headers={"If-None-Match": antes.headers["etag"]})
+
+    assert despues.status_code == 200
+    assert despues.json()["count"] == 1
+    assert despues.headers["etag"] != antes.headers["etag"]
+
+
+def test_clave_incluye_parametros(cliente):
+    """
+    Test: Parámetros distintos son entradas distintas de la caché.
+    """
+    http, informe = cliente
+    _escribir_informe(informe, ["Python release", "Rust news"])
+    http.post("/api/scan")
+
+    assert http.get("/api/latest", params={"limit": 1}).json()["count"] == 1
+    assert http.get("/api/latest", params={"limit": 5}).json()["count"] == 2
+    assert http.get("/api/cache").json()["cache"]["entries"] == 2
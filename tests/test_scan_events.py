@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+🧪 NEO-TOKYO DEV - Test Suite para el canal SSE de app.py (/api/events)
+"""
+
+import pytest
+import asyncio
+import json
+
+# Importar el módulo a testear
+import sys
+sys.path.insert(0, '..')
+import database_manager as db
+import app as aplicacion
+
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def eventos(tmp_path, monkeypatch):
+    """
+    Fixture con una base temporal y un ScanEvents nuevo que cuenta las cargas.
+
+    Returns:
+        (ScanEvents, lista con una entrada por consulta a la base)
+    """
+    monkeypatch.setattr(db, "DATABASE_PATH", str(tmp_path / "intelligence.db"))
+    db.init_db()
+    cargas = []
+
+    async def cargar():
+        cargas.append(db.data_generation())
+        return await aplicacion._live_sections()
+
+    yield aplicacion.ScanEvents(cargar, poll_interval=0.05, keepalive=0.2), cargas
+    db.close_manager()
+
+
+def _escanear(titulos):
+    db.ingest_articles(
+        [{"title": t, "url": f"https://example.com/{t}", "score": 1} for t in titulos],
+        {"harvested_at": "2025-12-05T02:31:36"}
+    )
+
+
+async def _siguiente_evento(flujo):
+    """Siguiente evento 'update' del flujo (se saltan retry y keepalive)."""
+    while True:
+        trama = await asyncio.wait_for(flujo.__anext__(), 2)
+        if trama.startswith("id: "):
+            cabecera, datos = trama.strip().split("\ndata: ")
+            return cabecera.split("\n")[0][4:], json.loads(datos)
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE ScanEvents
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_primer_evento_completo_y_luego_deltas(eventos):
+    """
+    Test: Al suscribirse llega todo; tras un escaneo solo lo que cambió.
+
+    Valida: new_articles lista las URLs que entran en la lista de últimos.
+    """
+    hub, _ = eventos
+    _escanear(["Python release"])
+    flujo = hub.stream()
+
+    _, primero = await _siguiente_evento(flujo)
+    _escanear(["Rust compiler"])
+    hub.notify()
+    identificador, segundo = await _siguiente_evento(flujo)
+    await flujo.aclose()
+
+    assert set(primero) == {"generation", "stats", "trends", "latest", "new_articles"}
+    assert primero["new_articles"] == []
+    assert identificador == str(db.data_generation())
+    assert segundo["stats"]["total_scans"] == 2
+    assert segundo["new_articles"] == ["https://example.com/Rust compiler"]
+    assert hub.subscribers == 0
+
+
+@pytest.mark.asyncio
+async def test_una_consulta_por_escaneo_para_todos_los_clientes(eventos):
+    """
+    Test: Con muchos clientes conectados la base se consulta una vez por escaneo.
+    """
+    hub, cargas = eventos
+    flujos = [hub.stream() for _ in range(50)]
+    for flujo in flujos:
+        await _siguiente_evento(flujo)
+
+    _escanear(["Quantum chip"])
+    hub.notify()
+    eventos_recibidos = [await _siguiente_evento(flujo) for flujo in flujos]
+    await asyncio.sleep(0.2)  # Varias vueltas del watcher sin datos nuevos
+    for flujo in flujos:
+        await flujo.aclose()
+
+    assert all(datos["stats"]["total_scans"] == 1 for _, datos in eventos_recibidos)
+    assert len(cargas) == 2  # Estado inicial + el escaneo
+
+
+@pytest.mark.asyncio
+async def test_reconexion_al_dia_no_reenvia(eventos):
+    """
+    Test: Con Last-Event-ID igual a la generación actual no hay evento inicial.
+    """
+    hub, _ = eventos
+    flujo = hub.stream()
+    identificador, _ = await _siguiente_evento(flujo)
+    await flujo.aclose()
+
+    reconexion = hub.stream(last_event_id=identificador)
+    tramas = [await asyncio.wait_for(reconexion.__anext__(), 2) for _ in range(2)]
+    await reconexion.aclose()
+
+    assert tramas[0].startswith("retry: ")
+    assert tramas[1] == ": keepalive\n\n"
+
+
+@pytest.mark.asyncio
+async def test_escaneo_sin_cambios_visibles_no_emite(eventos):
+    """
+    Test: Una escritura que no cambia ninguna sección no genera evento.
+    """
+    hub, _ = eventos
+    flujo = hub.stream()
+    await _siguiente_evento(flujo)
+
+    with db.get_manager().write() as conn:  # Sube la generación sin tocar los datos
+        conn.execute("SELECT 1")
+    hub.notify()
+    trama = await asyncio.wait_for(flujo.__anext__(), 2)
+    await flujo.aclose()
+
+    assert trama == ": keepalive\n\n"
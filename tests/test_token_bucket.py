@@ -17,7 +17,9 @@ from fastapi import HTTPException
 # Importar la clase a testear
 import sys
 sys.path.insert(0, '..')
-from rate_limiter import TokenBucket
+from rate_limiter import TokenBucket, ShardedTokenBucket, AsyncTokenBucket
+from rate_limiter import BackendMmap, BackendRedis, crear_backend
+from rate_limiter import TokenBucketCompuesto, Limite
 
 
 # ══════════════════════════════════════════════════════════════
@@ -404,6 +406,1119 @@ def test_get_stats_estructura():
     assert isinstance(bucket.tiempo_token, float)
 
 
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL MOTOR "RECARGA" (O(1))
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def bucket_recarga():
+    """
+    Fixture que crea un TokenBucket con el motor de recarga O(1).
+    
+    Returns:
+        TokenBucket con capacidad 10, ventana de 60 segundos y motor "recarga"
+    """
+    return TokenBucket(capacidad=10, tiempo_token=60.0, motor="recarga")
+
+
+def test_motor_desconocido_lanza_error():
+    """
+    Test: Un motor inexistente se rechaza al construir el bucket.
+    """
+    with pytest.raises(ValueError):
+        TokenBucket(capacidad=10, tiempo_token=60.0, motor="magia")
+
+
+def test_motor_por_defecto_es_ventana(token_bucket):
+    """
+    Test: Sin especificar motor se mantiene el log deslizante original.
+    """
+    assert token_bucket.motor == "ventana"
+    assert token_bucket.get_stats()["motor"] == "ventana"
+
+
+@pytest.mark.asyncio
+async def test_recarga_limita_a_capacidad(bucket_recarga):
+    """
+    Test: El motor recarga permite exactamente 'capacidad' tokens en ráfaga.
+    
+    Valida:
+        - Las primeras 'capacidad' peticiones pasan
+        - La siguiente se rechaza
+        - El estado por usuario es de tamaño constante
+    """
+    with patch('rate_limiter.time') as mock_time:
+        mock_time.monotonic.return_value = 1000.0
+        
+        for _ in range(bucket_recarga.capacidad):
+            assert await bucket_recarga.tomar_token(usuario_id=1) is True
+        
+        assert await bucket_recarga.tomar_token(usuario_id=1) is False
+        assert bucket_recarga.get_tokens(usuario_id=1) == bucket_recarga.capacidad
+        assert len(bucket_recarga.token_estado[1]) == 2
+
+
+@pytest.mark.asyncio
+async def test_recarga_perezosa_con_reloj_monotonico(bucket_recarga):
+    """
+    Test: Los tokens se recargan a razón de capacidad / tiempo_token.
+    
+    Valida:
+        - Tras 6 segundos (10 tokens / 60 s) vuelve exactamente 1 token
+        - Tras una ventana completa el bucket vuelve a estar lleno
+    """
+    with patch('rate_limiter.time') as mock_time:
+        mock_time.monotonic.return_value = 1000.0
+        for _ in range(bucket_recarga.capacidad):
+            await bucket_recarga.tomar_token(usuario_id=1)
+        
+        mock_time.monotonic.return_value = 1006.0
+        assert bucket_recarga.get_tokens(usuario_id=1) == 9
+        assert await bucket_recarga.tomar_token(usuario_id=1) is True
+        assert await bucket_recarga.tomar_token(usuario_id=1) is False
+        
+        mock_time.monotonic.return_value = 1006.0 + bucket_recarga.tiempo_token
+        assert bucket_recarga.get_tokens(usuario_id=1) == 0
+
+
+def test_recarga_usuario_nuevo_y_stats(bucket_recarga):
+    """
+    Test: get_tokens y get_stats son compatibles con el motor ventana.
+    """
+    assert bucket_recarga.get_tokens(usuario_id=999) == 0
+    
+    stats = bucket_recarga.get_stats()
+    assert stats["total_users"] == 0
+    assert stats["capacidad"] == 10
+    assert stats["motor"] == "recarga"
+
+
+@pytest.mark.asyncio
+async def test_recarga_capacidad_cero():
+    """
+    Test: Con capacidad 0 el motor recarga siempre rechaza.
+    """
+    bucket = TokenBucket(capacidad=0, tiempo_token=60.0, motor="recarga")
+    
+    assert await bucket.tomar_token(usuario_id=1) is False
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE SHARDEDTOKENBUCKET (LOCK STRIPING)
+# ══════════════════════════════════════════════════════════════
+
+def test_sharded_reparte_usuarios_en_shards():
+    """
+    Test: Cada usuario siempre cae en el mismo shard y los shards tienen locks propios.
+    """
+    bucket = ShardedTokenBucket(capacidad=10, tiempo_token=60.0, num_shards=4)
+    
+    assert len({id(shard.lock) for shard in bucket.shards}) == 4
+    assert bucket.shard_de(7) is bucket.shard_de(7)
+    assert bucket.shard_de(1) is not bucket.shard_de(2)
+
+
+def test_sharded_num_shards_invalido():
+    """
+    Test: num_shards debe ser al menos 1.
+    """
+    with pytest.raises(ValueError):
+        ShardedTokenBucket(capacidad=10, tiempo_token=60.0, num_shards=0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+async def test_sharded_limita_por_usuario(motor):
+    """
+    Test: El rate limiting por usuario se conserva con shards.
+    """
+    bucket = ShardedTokenBucket(capacidad=3, tiempo_token=60.0, motor=motor, num_shards=8)
+    
+    resultados = [await bucket.tomar_token(usuario_id=5) for _ in range(4)]
+    
+    assert resultados == [True, True, True, False]
+    assert bucket.get_tokens(usuario_id=5) == 3
+    assert await bucket.tomar_token(usuario_id=6) is True
+
+
+def test_sharded_stats_agregadas():
+    """
+    Test: get_stats suma los usuarios de todos los shards.
+    
+    Valida:
+        - Incluye las mismas claves que TokenBucket.get_stats
+    """
+    bucket = ShardedTokenBucket(capacidad=10, tiempo_token=60.0, num_shards=4)
+    
+    for usuario_id in range(10):
+        bucket.tomar_token_sync(usuario_id)
+    
+    stats = bucket.get_stats()
+    assert set(TokenBucket(10, 60.0).get_stats()) <= set(stats)
+    assert stats["backend"] == "memoria"
+    assert stats["total_users"] == 10
+    assert stats["num_shards"] == 4
+    assert sum(stats["usuarios_por_shard"]) == 10
+
+
+def test_sharded_concurrencia_hilos():
+    """
+    Test: Con hilos reales sobre el mismo usuario nunca se supera la capacidad.
+    """
+    bucket = ShardedTokenBucket(capacidad=50, tiempo_token=60.0, num_shards=4)
+    resultados: List[bool] = []
+    
+    def trabajador():
+        for _ in range(20):
+            resultados.append(bucket.tomar_token_sync(1))
+    
+    hilos = [threading.Thread(target=trabajador) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    assert sum(resultados) == 50
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE ASYNCTOKENBUCKET (ASYNCIO NATIVO)
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_async_bucket_no_usa_threading_lock():
+    """
+    Test: La variante asyncio no toma un threading.Lock en el event loop.
+    """
+    bucket = AsyncTokenBucket(capacidad=2, tiempo_token=60.0)
+    
+    assert not isinstance(bucket.lock, type(threading.Lock()))
+    assert [await bucket.tomar_token(1) for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+async def test_acquire_espera_al_siguiente_token(motor):
+    """
+    Test: acquire espera a la recarga en lugar de rechazar.
+    
+    Valida:
+        - El primer acquire es inmediato
+        - El segundo espera aproximadamente tiempo_token / capacidad
+    """
+    bucket = AsyncTokenBucket(capacidad=1, tiempo_token=0.1, motor=motor)
+    loop = asyncio.get_running_loop()
+    
+    assert await bucket.acquire(usuario_id=1) is True
+    inicio = loop.time()
+    assert await bucket.acquire(usuario_id=1, timeout=1.0) is True
+    
+    assert loop.time() - inicio >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_acquire_timeout_devuelve_false_sin_dormir():
+    """
+    Test: Si el token no llegará antes del timeout, acquire falla en el acto.
+    """
+    bucket = AsyncTokenBucket(capacidad=1, tiempo_token=60.0, motor="recarga")
+    loop = asyncio.get_running_loop()
+    
+    await bucket.acquire(usuario_id=1)
+    inicio = loop.time()
+    
+    assert await bucket.acquire(usuario_id=1, timeout=0.5) is False
+    assert loop.time() - inicio < 0.1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+async def test_acquire_con_max_tokens_user_espera_sin_429(motor):
+    """
+    Test: Con max_tokens_user por debajo de la capacidad acquire no lanza 429.
+    
+    Valida:
+        - Al alcanzar el tope espera a quedar por debajo y devuelve True
+        - Si no da tiempo antes del timeout devuelve False
+    """
+    bucket = AsyncTokenBucket(capacidad=10, tiempo_token=0.2, max_tokens_user=5, motor=motor)
+    for _ in range(5):
+        assert await bucket.acquire(usuario_id=1) is True
+    
+    assert await bucket.acquire(usuario_id=1, timeout=2) is True
+    
+    lento = AsyncTokenBucket(capacidad=10, tiempo_token=60.0, max_tokens_user=5, motor=motor)
+    for _ in range(5):
+        await lento.acquire(usuario_id=1)
+    assert await lento.acquire(usuario_id=1, timeout=0.5) is False
+
+
+def _backend_anotado(backend, en_loop):
+    """Envuelve tomar_lote para anotar si se llama desde un event loop."""
+    tomar_lote = backend.tomar_lote
+    
+    def tomar_lote_anotado(*args):
+        try:
+            asyncio.get_running_loop()
+            en_loop.append(True)
+        except RuntimeError:
+            en_loop.append(False)
+        return tomar_lote(*args)
+    
+    backend.tomar_lote = tomar_lote_anotado
+    return backend
+
+
+@pytest.mark.asyncio
+async def test_async_bucket_con_backend_no_bloquea_el_loop(ruta_mmap):
+    """
+    Test: Con backend compartido la E/S se hace fuera del hilo del event loop.
+    
+    Valida:
+        - tomar_token y acquire consultan el backend desde el pool de hilos
+        - La cuota compartida se respeta igual
+    """
+    en_loop = []
+    backend = _backend_anotado(BackendMmap(ruta_mmap), en_loop)
+    bucket = AsyncTokenBucket(capacidad=2, tiempo_token=60.0, motor="recarga", backend=backend)
+    
+    assert [await bucket.tomar_token(1) for _ in range(3)] == [True, True, False]
+    assert await bucket.acquire(usuario_id=2) is True
+    assert await bucket.acquire(usuario_id=1, timeout=0.1) is False
+    assert en_loop == [False] * 5
+
+
+@pytest.mark.asyncio
+async def test_acquire_capacidad_cero():
+    """
+    Test: Con capacidad 0 acquire nunca espera para siempre.
+    """
+    bucket = AsyncTokenBucket(capacidad=0, tiempo_token=60.0)
+    
+    assert await bucket.acquire(usuario_id=1) is False
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE MEMORIA ACOTADA (BARRIDO + LRU)
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+def test_barrido_expulsa_usuarios_inactivos(motor):
+    """
+    Test: Los usuarios inactivos se expulsan y total_users baja.
+    
+    Valida:
+        - Tras una ventana completa sin peticiones el usuario es expulsable
+        - barrer_expirados lo elimina y cuenta la expulsión
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0, motor=motor)
+    ahora = [1000.0]
+    bucket._reloj = lambda: ahora[0]
+    
+    for usuario_id in range(100):
+        bucket.tomar_token_sync(usuario_id)
+    assert bucket.get_stats()["total_users"] == 100
+    
+    ahora[0] += 61.0
+    assert bucket.barrer_expirados() == 100
+    
+    stats = bucket.get_stats()
+    assert stats["total_users"] == 0
+    assert stats["evicciones_expiradas"] == 100
+
+
+def test_barrido_incremental_por_peticion():
+    """
+    Test: Cada petición expulsa como mucho BARRIDO_POR_PETICION inactivos.
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0, motor="recarga")
+    ahora = [1000.0]
+    bucket._reloj = lambda: ahora[0]
+    
+    for usuario_id in range(10):
+        bucket.tomar_token_sync(usuario_id)
+    
+    ahora[0] += 61.0
+    bucket.tomar_token_sync(999)
+    
+    assert bucket.evicciones_expiradas == TokenBucket.BARRIDO_POR_PETICION
+    assert len(bucket.token_estado) == 10 - TokenBucket.BARRIDO_POR_PETICION + 1
+
+
+def test_barrido_no_se_detiene_en_usuario_activo():
+    """
+    Test: Un usuario activo con el acceso más antiguo no bloquea el barrido.
+    
+    Valida:
+        - El barrido por petición sigue alcanzando a los expirados de detrás
+        - El usuario activo conserva su estado y su puesto en el LRU
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0, motor="recarga")
+    ahora = [1000.0]
+    bucket._reloj = lambda: ahora[0]
+    
+    for _ in range(5):
+        bucket.tomar_token_sync(1)  # Gasta toda su cuota: tarda 60 s en expirar
+    ahora[0] += 1.0
+    for usuario_id in range(2, 12):
+        bucket.tomar_token_sync(usuario_id)  # Un token: expiran en 12 s
+    
+    ahora[0] += 13.0
+    for _ in range(10):
+        bucket.tomar_token_sync(999)
+    
+    assert list(bucket.token_estado) == [1, 999]
+    assert bucket.evicciones_expiradas == 10
+    assert bucket.get_tokens(1) > 0
+
+
+def test_barrido_respeta_usuarios_activos():
+    """
+    Test: Un usuario con tokens dentro de la ventana no se expulsa.
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0)
+    ahora = [1000.0]
+    bucket._reloj = lambda: ahora[0]
+    
+    bucket.tomar_token_sync(1)
+    ahora[0] += 30.0
+    
+    assert bucket.barrer_expirados() == 0
+    assert bucket.get_tokens(1) == 1
+
+
+def test_max_usuarios_expulsa_el_menos_reciente():
+    """
+    Test: Con max_usuarios se expulsa por LRU al dar de alta usuarios nuevos.
+    
+    Valida:
+        - Nunca hay más de max_usuarios en memoria
+        - El usuario expulsado es el de acceso más antiguo
+        - El contador evicciones_lru aumenta
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0, max_usuarios=3)
+    
+    for usuario_id in (1, 2, 3):
+        bucket.tomar_token_sync(usuario_id)
+    bucket.tomar_token_sync(1)  # 1 pasa a ser el más reciente
+    bucket.tomar_token_sync(4)
+    
+    assert list(bucket.token_timestamps) == [3, 1, 4]
+    assert bucket.get_stats()["evicciones_lru"] == 1
+
+
+def test_sharded_reparte_max_usuarios_y_agrega_evicciones():
+    """
+    Test: ShardedTokenBucket reparte el tope y suma las expulsiones.
+    """
+    bucket = ShardedTokenBucket(capacidad=5, tiempo_token=60.0, num_shards=2, max_usuarios=4)
+    
+    for usuario_id in range(10):
+        bucket.tomar_token_sync(usuario_id)
+    
+    stats = bucket.get_stats()
+    assert stats["total_users"] == 4
+    assert stats["evicciones_lru"] == 6
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE BACKENDS COMPARTIDOS (MMAP / REDIS)
+# ══════════════════════════════════════════════════════════════
+
+def _tomar_en_proceso(ruta: str, resultados) -> None:
+    """Worker de multiprocessing: 5 intentos del usuario 1 sobre el mmap."""
+    bucket = TokenBucket(capacidad=6, tiempo_token=60.0, motor="recarga", backend=BackendMmap(ruta))
+    resultados.extend([bucket.tomar_token_sync(1) for _ in range(5)])
+
+
+@pytest.fixture
+def ruta_mmap(tmp_path):
+    """Ruta temporal para el fichero del BackendMmap."""
+    return str(tmp_path / "rate_limiter.bin")
+
+
+@pytest.fixture
+def servidor_resp():
+    """Servidor local que habla el protocolo Redis."""
+    from redis_standin import ServidorRESPLocal
+    with ServidorRESPLocal() as servidor:
+        yield servidor
+
+
+def test_backend_requiere_motor_recarga(ruta_mmap):
+    """
+    Test: El estado compartido solo existe para el motor O(1).
+    """
+    with pytest.raises(ValueError):
+        TokenBucket(capacidad=10, tiempo_token=60.0, backend=BackendMmap(ruta_mmap))
+
+
+def test_mmap_comparte_cuota_entre_instancias(ruta_mmap):
+    """
+    Test: Dos buckets sobre el mismo fichero comparten la cuota del usuario.
+    
+    Valida:
+        - Entre ambos solo se conceden 'capacidad' tokens
+        - get_tokens y get_stats leen el estado compartido
+    """
+    worker_a = TokenBucket(capacidad=4, tiempo_token=60.0, motor="recarga", backend=BackendMmap(ruta_mmap))
+    worker_b = TokenBucket(capacidad=4, tiempo_token=60.0, motor="recarga", backend=BackendMmap(ruta_mmap))
+    
+    resultados = [worker.tomar_token_sync(1) for worker in (worker_a, worker_b) * 3]
+    
+    assert sum(resultados) == 4
+    assert worker_b.get_tokens(1) == 4
+    assert worker_a.get_stats()["total_users"] == 1
+    assert worker_a.get_stats()["backend"] == "mmap"
+
+
+def test_mmap_comparte_cuota_entre_procesos(ruta_mmap):
+    """
+    Test: Procesos reales que usan el mismo fichero no multiplican la cuota.
+    """
+    import multiprocessing
+    
+    BackendMmap(ruta_mmap).cerrar()
+    contexto = multiprocessing.get_context("fork")
+    with contexto.Manager() as manager:
+        resultados = manager.list()
+        procesos = [contexto.Process(target=_tomar_en_proceso, args=(ruta_mmap, resultados)) for _ in range(3)]
+        for proceso in procesos:
+            proceso.start()
+        for proceso in procesos:
+            proceso.join()
+        
+        assert sum(resultados) == 6
+
+
+def test_mmap_recarga_y_reutiliza_slots(ruta_mmap):
+    """
+    Test: La tabla de tamaño fijo reutiliza slots expirados y nunca expulsa
+    a un usuario vivo.
+    
+    Valida:
+        - Con la tabla llena de usuarios vivos el nuevo se rechaza
+        - Los usuarios existentes conservan su estado
+        - Los rechazos se cuentan aparte de las expiraciones
+    """
+    backend = BackendMmap(ruta_mmap, num_slots=2)
+    bucket = TokenBucket(capacidad=1, tiempo_token=10.0, motor="recarga", backend=backend)
+    ahora = [100.0]
+    bucket._reloj = lambda: ahora[0]
+    
+    assert bucket.tomar_token_sync(1) is True
+    assert bucket.tomar_token_sync(2) is True
+    assert bucket.tomar_token_sync(3) is False  # tabla llena: falla cerrado
+    assert bucket.tomar_token_sync(1) is False
+    assert bucket.tomar_token_sync(2) is False
+    assert backend.evicciones()["rechazos_tabla_llena"] == 1
+    assert backend.evicciones()["evicciones_lru"] == 0
+    
+    ahora[0] += 10.0  # todos los buckets vuelven a estar llenos
+    assert bucket.tomar_token_sync(4) is True
+    assert backend.evicciones()["evicciones_expiradas"] == 1
+    assert bucket.get_stats()["total_users"] == 2
+
+
+def test_backend_estado_es_abstracto():
+    """
+    Test: Un backend que no implementa la interfaz no se puede instanciar.
+    """
+    from rate_limiter import BackendEstado
+    
+    class Incompleto(BackendEstado):
+        def tomar(self, usuario_id, capacidad, tasa, ahora, umbral, coste=1):
+            return True, 0
+    
+    with pytest.raises(TypeError):
+        Incompleto()
+
+
+def test_mmap_fichero_invalido(tmp_path):
+    """
+    Test: Un fichero ajeno no se interpreta como tabla de estado.
+    """
+    ruta = tmp_path / "otro.bin"
+    ruta.write_bytes(b"no soy un backend" * 10)
+    
+    with pytest.raises(ValueError):
+        BackendMmap(str(ruta))
+
+
+def test_redis_limita_y_respeta_max_tokens_user(servidor_resp):
+    """
+    Test: BackendRedis aplica capacidad y límite absoluto vía EVALSHA.
+    
+    Valida:
+        - Se conceden min(capacidad, max_tokens_user) tokens
+        - Al alcanzar max_tokens_user se lanza HTTPException 429
+    """
+    backend = BackendRedis(port=servidor_resp.port)
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0, max_tokens_user=3, motor="recarga", backend=backend)
+    
+    assert [bucket.tomar_token_sync(7) for _ in range(3)] == [True, True, True]
+    with pytest.raises(HTTPException) as exc_info:
+        bucket.tomar_token_sync(7)
+    
+    assert exc_info.value.status_code == 429
+    assert bucket.get_tokens(7) == 3
+    assert bucket.get_tokens(8) == 0
+    assert bucket.get_stats()["total_users"] == 1
+    backend.cerrar()
+
+
+def test_redis_recarga_el_script_tras_reinicio(servidor_resp):
+    """
+    Test: Si el servidor pierde los scripts (NOSCRIPT) se vuelven a cargar.
+    """
+    backend = BackendRedis(port=servidor_resp.port)
+    bucket = TokenBucket(capacidad=2, tiempo_token=60.0, motor="recarga", backend=backend)
+    
+    servidor_resp.scripts.clear()
+    
+    assert bucket.tomar_token_sync(1) is True
+    backend.cerrar()
+
+
+def test_crear_backend_desde_url(ruta_mmap):
+    """
+    Test: RATE_LIMITER_BACKEND se interpreta correctamente.
+    """
+    assert crear_backend("memoria") is None
+    assert crear_backend("") is None
+    assert isinstance(crear_backend(f"mmap://{ruta_mmap}"), BackendMmap)
+    with pytest.raises(ValueError):
+        crear_backend("memcached://localhost")
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE LOTES Y COSTES PONDERADOS
+# ══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+async def test_coste_ponderado_consume_k_tokens(motor):
+    """
+    Test: Una petición con coste k consume k tokens.
+    """
+    bucket = TokenBucket(capacidad=10, tiempo_token=60.0, motor=motor)
+    
+    assert await bucket.tomar_token(1, coste=7) is True
+    assert bucket.get_tokens(1) == 7
+    assert await bucket.tomar_token(1, coste=4) is False
+    assert await bucket.tomar_token(1, coste=3) is True
+
+
+def test_coste_invalido():
+    """
+    Test: Los costes menores que 1 se rechazan.
+    """
+    bucket = TokenBucket(capacidad=10, tiempo_token=60.0)
+    
+    with pytest.raises(ValueError):
+        bucket.tomar_token_sync(1, coste=0)
+    with pytest.raises(ValueError):
+        bucket.tomar_tokens_bulk([(1, -2)])
+
+
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+def test_bulk_resultados_por_usuario(motor):
+    """
+    Test: tomar_tokens_bulk acepta IDs y pares (usuario, coste).
+    
+    Valida:
+        - Los resultados respetan el orden de entrada
+        - Un mismo usuario repetido consume su cuota dentro del lote
+        - tokens_restantes refleja el consumo
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0, motor=motor)
+    
+    resultados = bucket.tomar_tokens_bulk([1, (2, 4), (1, 3), (1, 2)])
+    
+    assert [r["usuario_id"] for r in resultados] == [1, 2, 1, 1]
+    assert [r["permitido"] for r in resultados] == [True, True, True, False]
+    assert [r["tokens_restantes"] for r in resultados] == [4, 1, 1, 1]
+    assert resultados[3]["motivo"] == "capacidad"
+
+
+def test_bulk_no_lanza_con_max_tokens_user():
+    """
+    Test: El límite absoluto se informa por usuario sin abortar el lote.
+    """
+    bucket = TokenBucket(capacidad=10, tiempo_token=60.0, max_tokens_user=2)
+    
+    resultados = bucket.tomar_tokens_bulk([1, 1, 1, 2])
+    
+    assert [r["motivo"] for r in resultados] == [None, None, "max_tokens_user", None]
+
+
+def test_bulk_usa_un_solo_lock():
+    """
+    Test: Todo el lote se evalúa adquiriendo el lock una sola vez.
+    """
+    bucket = TokenBucket(capacidad=10, tiempo_token=60.0)
+    bucket.lock = MagicMock(wraps=threading.Lock())
+    
+    bucket.tomar_tokens_bulk(list(range(50)))
+    
+    assert bucket.lock.__enter__.call_count == 1
+
+
+def test_bulk_sharded_conserva_orden():
+    """
+    Test: ShardedTokenBucket agrupa por shard y devuelve en el orden original.
+    """
+    bucket = ShardedTokenBucket(capacidad=1, tiempo_token=60.0, num_shards=4)
+    
+    resultados = bucket.tomar_tokens_bulk([3, 1, 2, 3, 0])
+    
+    assert [r["usuario_id"] for r in resultados] == [3, 1, 2, 3, 0]
+    assert [r["permitido"] for r in resultados] == [True, True, True, False, True]
+
+
+@pytest.mark.parametrize("backend", ["mmap", "redis"])
+def test_bulk_con_backend(backend, ruta_mmap, servidor_resp):
+    """
+    Test: Los backends compartidos procesan el lote de una vez.
+    """
+    if backend == "mmap":
+        estado = BackendMmap(ruta_mmap)
+    else:
+        estado = BackendRedis(port=servidor_resp.port)
+    bucket = TokenBucket(capacidad=3, tiempo_token=60.0, motor="recarga", backend=estado)
+    
+    resultados = bucket.tomar_tokens_bulk([(1, 2), (1, 2), 2])
+    
+    assert [r["permitido"] for r in resultados] == [True, False, True]
+    assert bucket.get_tokens(1) == 2
+
+
+def test_endpoint_batch():
+    """
+    Test: POST /rate-limited/batch devuelve un resultado por usuario.
+    """
+    from fastapi.testclient import TestClient
+    from rate_limiter import app, get_rate_limiter, MAX_LOTE
+    
+    bucket = AsyncTokenBucket(capacidad=2, tiempo_token=60.0)
+    app.dependency_overrides[get_rate_limiter] = lambda: bucket
+    try:
+        cliente = TestClient(app)
+        respuesta = cliente.post("/rate-limited/batch", json={"peticiones": [1, [2, 2], [1, 2]]})
+        demasiados = cliente.post("/rate-limited/batch", json={"peticiones": [1] * (MAX_LOTE + 1)})
+        coste_cero = cliente.post("/rate-limited/batch", json={"peticiones": [[1, 0]]})
+    finally:
+        app.dependency_overrides.clear()
+    
+    assert respuesta.status_code == 200
+    assert respuesta.json()["permitidos"] == 2
+    assert [r["permitido"] for r in respuesta.json()["resultados"]] == [True, True, False]
+    assert demasiados.status_code == 422
+    assert coste_cero.status_code == 422
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL MIDDLEWARE ASGI
+# ══════════════════════════════════════════════════════════════
+
+def _app_protegida(limitador, **opciones):
+    """App FastAPI mínima envuelta con RateLimitMiddleware."""
+    from fastapi import FastAPI
+    from rate_limiter import RateLimitMiddleware
+    
+    app = FastAPI()
+    
+    @app.get("/datos")
+    async def datos():
+        return {"ok": True}
+    
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+    
+    app.add_middleware(RateLimitMiddleware, limitador=limitador, **opciones)
+    return app
+
+
+def test_middleware_permite_y_añade_cabeceras():
+    """
+    Test: Las peticiones permitidas llegan a la app con X-RateLimit-*.
+    """
+    from fastapi.testclient import TestClient
+    
+    cliente = TestClient(_app_protegida(AsyncTokenBucket(capacidad=3, tiempo_token=60.0)))
+    respuesta = cliente.get("/datos", headers={"X-API-Key": "42"})
+    
+    assert respuesta.status_code == 200
+    assert respuesta.headers["x-ratelimit-limit"] == "3"
+    assert respuesta.headers["x-ratelimit-remaining"] == "2"
+
+
+@pytest.mark.parametrize("motor", ["ventana", "recarga"])
+def test_middleware_rechaza_con_retry_after(motor):
+    """
+    Test: Al agotar la cuota se responde 429 sin ejecutar la app.
+    
+    Valida:
+        - Retry-After refleja la espera hasta el siguiente token
+        - X-RateLimit-Remaining es 0
+    """
+    from fastapi.testclient import TestClient
+    
+    bucket = AsyncTokenBucket(capacidad=2, tiempo_token=60.0, motor=motor)
+    cliente = TestClient(_app_protegida(bucket))
+    
+    for _ in range(2):
+        assert cliente.get("/datos", headers={"X-API-Key": "7"}).status_code == 200
+    respuesta = cliente.get("/datos", headers={"X-API-Key": "7"})
+    
+    assert respuesta.status_code == 429
+    assert 1 <= int(respuesta.headers["retry-after"]) <= 60
+    assert respuesta.headers["x-ratelimit-remaining"] == "0"
+    assert respuesta.json()["detail"].startswith("Too Many Requests")
+    assert bucket.get_tokens(7) == 2
+
+
+def test_middleware_claves_por_cabecera_o_ip():
+    """
+    Test: Cada API key tiene su cuota; sin cabecera se usa la IP del cliente.
+    """
+    from fastapi.testclient import TestClient
+    
+    cliente = TestClient(_app_protegida(AsyncTokenBucket(capacidad=1, tiempo_token=60.0)))
+    
+    assert cliente.get("/datos", headers={"X-API-Key": "clave-a"}).status_code == 200
+    assert cliente.get("/datos", headers={"X-API-Key": "clave-b"}).status_code == 200
+    assert cliente.get("/datos").status_code == 200
+    assert cliente.get("/datos").status_code == 429
+
+
+def test_middleware_clave_numerica_enorme_con_mmap(ruta_mmap):
+    """
+    Test: Una API key numérica fuera de 64 bits no rompe el backend mmap.
+    
+    Valida:
+        - Se responde 200/429 en vez de 500
+        - Los IDs de 64 bits se siguen usando tal cual
+    """
+    from fastapi.testclient import TestClient
+    from rate_limiter import _clave_estable
+    
+    bucket = TokenBucket(capacidad=1, tiempo_token=60.0, motor="recarga", backend=BackendMmap(ruta_mmap))
+    cliente = TestClient(_app_protegida(bucket))
+    cabeceras = {"X-API-Key": "99999999999999999999999"}
+    
+    assert cliente.get("/datos", headers=cabeceras).status_code == 200
+    assert cliente.get("/datos", headers=cabeceras).status_code == 429
+    assert _clave_estable(b"9223372036854775807") == 2 ** 63 - 1
+    assert _clave_estable(b"9223372036854775808") != 2 ** 63
+
+
+def test_middleware_con_backend_comprueba_fuera_del_loop(ruta_mmap):
+    """
+    Test: El middleware no hace la E/S del backend en el hilo del event loop.
+    """
+    from fastapi.testclient import TestClient
+    
+    en_loop = []
+    backend = _backend_anotado(BackendMmap(ruta_mmap), en_loop)
+    cliente = TestClient(_app_protegida(
+        TokenBucket(capacidad=1, tiempo_token=60.0, motor="recarga", backend=backend)
+    ))
+    
+    assert cliente.get("/datos").status_code == 200
+    assert cliente.get("/datos").status_code == 429
+    assert en_loop == [False, False]
+
+
+def test_app_dashboard_429_con_cabeceras_cors(tmp_path, monkeypatch):
+    """
+    Test: En app.py el rate limiting queda dentro de CORS.
+    
+    Valida:
+        - Un 429 lleva Access-Control-Allow-Origin (el navegador puede leerlo)
+        - Los preflight OPTIONS no consumen tokens
+    """
+    import importlib.util
+    from pathlib import Path
+    from fastapi.testclient import TestClient
+    import database_manager as db
+    
+    monkeypatch.setenv("API_RATE_LIMIT", "1/60")
+    monkeypatch.setattr(db, "DATABASE_PATH", str(tmp_path / "intelligence.db"))
+    db.init_db()
+    ruta = Path(__file__).resolve().parent.parent / "app.py"
+    spec = importlib.util.spec_from_file_location("app_con_limite", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    cliente = TestClient(modulo.app)
+    origen = {"Origin": "https://panel.example.com"}
+    preflight = dict(origen, **{"Access-Control-Request-Method": "GET"})
+    
+    try:
+        for _ in range(3):
+            assert cliente.options("/api/stats", headers=preflight).status_code == 200
+        assert cliente.get("/api/stats", headers=origen).status_code == 200
+        respuesta = cliente.get("/api/stats", headers=origen)
+    finally:
+        db.close_manager()
+    
+    assert respuesta.status_code == 429
+    assert respuesta.headers["access-control-allow-origin"] in ("*", origen["Origin"])
+    assert "retry-after" in respuesta.headers
+
+
+def test_middleware_rutas_excluidas():
+    """
+    Test: Las rutas excluidas no consumen tokens.
+    """
+    from fastapi.testclient import TestClient
+    
+    bucket = AsyncTokenBucket(capacidad=1, tiempo_token=60.0)
+    cliente = TestClient(_app_protegida(bucket, excluir={"/health"}))
+    
+    for _ in range(5):
+        assert cliente.get("/health").status_code == 200
+    assert bucket.get_stats()["total_users"] == 0
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE MÉTRICAS (PROMETHEUS)
+# ══════════════════════════════════════════════════════════════
+
+def test_metricas_desactivadas_no_instrumentan():
+    """
+    Test: Sin métricas no se instala nada en el camino caliente.
+    
+    Valida: Ni _evaluar ni el lock se sustituyen en la instancia.
+    """
+    bucket = TokenBucket(capacidad=5, tiempo_token=60.0)
+    
+    assert bucket.metricas is None
+    assert "_evaluar" not in vars(bucket)
+    assert isinstance(bucket.lock, type(threading.Lock()))
+    with pytest.raises(RuntimeError):
+        bucket.exponer_metricas()
+
+
+@pytest.mark.parametrize("motor", TokenBucket.MOTORES)
+def test_metricas_cuentan_resultados(motor):
+    """
+    Test: Los contadores distinguen permitidas y motivos de rechazo.
+    """
+    bucket = TokenBucket(capacidad=2, tiempo_token=60.0, max_tokens_user=3, motor=motor, metricas=True)
+    
+    bucket.tomar_token_sync(1)
+    bucket.tomar_token_sync(1)
+    bucket.tomar_token_sync(1)  # Rechazo por capacidad
+    bucket.tomar_tokens_bulk([(2, 4)])  # Rechazo por max_tokens_user
+    
+    assert bucket.metricas.resultados == {"permitida": 2, "capacidad": 1, "max_tokens_user": 1}
+    assert bucket.metricas.comprobacion.cuenta == 4
+    assert bucket.metricas.espera_lock.cuenta >= 2
+
+
+@pytest.mark.parametrize("clase", [TokenBucket, ShardedTokenBucket])
+def test_exponer_metricas_no_mide_su_propia_espera(clase):
+    """
+    Test: Leer las métricas no añade muestras al histograma de espera del lock.
+    """
+    bucket = clase(capacidad=2, tiempo_token=60.0, metricas=True)
+    bucket.tomar_token_sync(1)
+    
+    antes = bucket.exponer_metricas()
+    
+    assert bucket.exponer_metricas() == antes
+    assert "rate_limiter_espera_lock_segundos_count 1" in antes
+
+
+def test_metricas_sin_lock_no_exportan_espera_lock(ruta_mmap):
+    """
+    Test: Sin lock que medir (asyncio o backend) no se exporta espera_lock.
+    """
+    asincrono = AsyncTokenBucket(capacidad=2, tiempo_token=60.0, metricas=True)
+    compartido = TokenBucket(capacidad=2, tiempo_token=60.0, motor="recarga",
+                             backend=BackendMmap(ruta_mmap), metricas=True)
+    
+    for bucket in (asincrono, compartido):
+        bucket.tomar_token_sync(1)
+        texto = bucket.exponer_metricas()
+        assert "rate_limiter_espera_lock_segundos" not in texto
+        assert 'rate_limiter_peticiones_total{resultado="permitida"} 1' in texto
+    assert "rate_limiter_espera_lock_segundos" in TokenBucket(2, 60.0, metricas=True).exponer_metricas()
+
+
+def test_histograma_cubetas_acumuladas():
+    """
+    Test: La exposición de un histograma es acumulada y termina en +Inf.
+    """
+    from rate_limiter import Histograma
+    
+    histograma = Histograma((1.0, 2.0))
+    for valor in (0.5, 1.0, 1.5, 5.0):
+        histograma.observar(valor)
+    
+    assert histograma.lineas("h") == [
+        'h_bucket{le="1.0"} 2',
+        'h_bucket{le="2.0"} 3',
+        'h_bucket{le="+Inf"} 4',
+        "h_sum 8.0",
+        "h_count 4",
+    ]
+
+
+def test_metricas_sharded_agregadas():
+    """
+    Test: ShardedTokenBucket suma las métricas de todos los shards.
+    """
+    bucket = ShardedTokenBucket(capacidad=1, tiempo_token=60.0, num_shards=4, metricas=True)
+    for usuario_id in range(8):
+        bucket.tomar_token_sync(usuario_id)
+    bucket.tomar_token_sync(0)
+    
+    texto = bucket.exponer_metricas()
+    
+    assert 'rate_limiter_peticiones_total{resultado="permitida"} 8' in texto
+    assert 'rate_limiter_peticiones_total{resultado="capacidad"} 1' in texto
+    assert "rate_limiter_usuarios_activos 8" in texto
+
+
+def test_endpoint_metrics():
+    """
+    Test: GET /metrics devuelve texto Prometheus, o 404 si están desactivadas.
+    """
+    from fastapi.testclient import TestClient
+    from rate_limiter import app, get_rate_limiter
+    
+    bucket = AsyncTokenBucket(capacidad=1, tiempo_token=60.0, metricas=True)
+    app.dependency_overrides[get_rate_limiter] = lambda: bucket
+    try:
+        cliente = TestClient(app)
+        cliente.post("/rate-limited", json={"id_usuario": 1})
+        cliente.post("/rate-limited", json={"id_usuario": 1})
+        metricas = cliente.get("/metrics")
+        app.dependency_overrides[get_rate_limiter] = lambda: TokenBucket(1, 60.0)
+        desactivadas = cliente.get("/metrics")
+    finally:
+        app.dependency_overrides.clear()
+    
+    assert metricas.status_code == 200
+    assert metricas.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'rate_limiter_peticiones_total{resultado="capacidad"} 1' in metricas.text
+    assert "# TYPE rate_limiter_comprobacion_segundos histogram" in metricas.text
+    assert desactivadas.status_code == 404
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE CUOTAS COMPUESTAS (MULTIVENTANA + TENANT)
+# ══════════════════════════════════════════════════════════════
+
+def _compuesto(**opciones):
+    """Por segundo y por minuto por usuario, por día por tenant (reloj inyectado)."""
+    ahora = [0.0]
+    bucket = TokenBucketCompuesto(
+        [Limite("segundo", 2, 1.0), Limite("minuto", 3, 60.0), Limite("dia", 4, 86400.0, "tenant")],
+        tenant_de=lambda usuario_id: usuario_id // 100,
+        **opciones
+    )
+    bucket._reloj = lambda: ahora[0]
+    return bucket, ahora
+
+
+def test_compuesto_aplica_todas_las_ventanas():
+    """
+    Test: Cada ventana limita por su cuenta.
+    
+    Valida: Primero frena la de 1 s; al recargarse, frena la de 1 min.
+    """
+    bucket, ahora = _compuesto()
+    
+    assert [bucket.tomar_token_sync(1) for _ in range(3)] == [True, True, False]
+    ahora[0] = 1.0
+    assert bucket.tomar_token_sync(1) is True
+    assert bucket.tomar_token_sync(1) is False
+    assert bucket.limite_vinculante(1)["nombre"] == "minuto"
+
+
+def test_compuesto_tenant_compartido_entre_usuarios():
+    """
+    Test: El límite de tenant se comparte entre sus usuarios.
+    """
+    bucket, _ = _compuesto()
+    
+    resultados = bucket.tomar_tokens_bulk([1, 2, 3, 4, 5, 201])
+    
+    assert [r["permitido"] for r in resultados] == [True, True, True, True, False, True]
+    assert resultados[4]["motivo"] == "dia"
+    assert bucket.get_stats()["total_tenants"] == 2
+
+
+def test_compuesto_rechazo_no_consume_otros_niveles():
+    """
+    Test: Todos los niveles admiten antes de que ninguno consuma.
+    
+    Valida: Una petición que rechaza el tenant no gasta cuota del usuario.
+    """
+    bucket, _ = _compuesto()
+    bucket.tomar_tokens_bulk([(10, 2), (11, 2)])  # Agota el tenant 0
+    
+    assert bucket.tomar_token_sync(1) is False
+    assert bucket.token_estado[1][:2] == [2.0, 3.0]
+    assert bucket.limite_vinculante(1)["ambito"] == "tenant"
+
+
+def test_compuesto_comprobar_espera_del_nivel_vinculante():
+    """
+    Test: comprobar devuelve la espera del nivel más lento en recargarse.
+    """
+    bucket, _ = _compuesto()
+    bucket.tomar_token_sync(1)
+    bucket.tomar_token_sync(1)
+    
+    permitido, restantes, espera = bucket.comprobar(1)
+    
+    assert permitido is False
+    assert restantes == 0
+    assert espera == pytest.approx(0.5)
+
+
+def test_compuesto_validacion():
+    """
+    Test: Configuraciones inválidas lanzan ValueError.
+    """
+    with pytest.raises(ValueError):
+        TokenBucketCompuesto([])
+    with pytest.raises(ValueError):
+        TokenBucketCompuesto([Limite("a", 1, 1.0), Limite("a", 2, 2.0)])
+    with pytest.raises(ValueError):
+        TokenBucketCompuesto([Limite("t", 1, 1.0, "tenant")])
+    with pytest.raises(ValueError):
+        TokenBucketCompuesto([Limite("x", 1, 1.0, "global")])
+
+
+def test_endpoint_tokens_informa_limite_vinculante():
+    """
+    Test: GET /user/{id}/tokens informa del límite que frena al usuario.
+    """
+    from fastapi.testclient import TestClient
+    from rate_limiter import app, get_rate_limiter
+    
+    bucket, _ = _compuesto()
+    app.dependency_overrides[get_rate_limiter] = lambda: bucket
+    try:
+        cliente = TestClient(app)
+        cliente.post("/rate-limited", json={"id_usuario": 1})
+        cliente.post("/rate-limited", json={"id_usuario": 1})
+        respuesta = cliente.get("/user/1/tokens").json()
+    finally:
+        app.dependency_overrides.clear()
+    
+    assert respuesta["limite_vinculante"]["nombre"] == "segundo"
+    assert respuesta["tokens_usados"] == 2
+    assert respuesta["tokens_disponibles"] == 0
+    assert respuesta["capacidad_total"] == 2
+
+
 # ══════════════════════════════════════════════════════════════
 # CONFIGURACIÓN DE PYTEST
 # ══════════════════════════════════════════════════════════════